@@ -17,20 +17,26 @@ Selected text:
 Please provide a clear, simplified explanation of the above text. If it's a single word or short phrase, explain what it means. If it's longer text, simplify and explain it in easy-to-understand terms.
 Do not include any question back to the user. Do not include a title. Just provide the markdown formatted short explanation between 100 and 300 characters.
 """
+# Insight prompts are split into a static part (sent first as the system prompt)
+# and the per-call student context
 INSIGHT_GENERATION_PROMPT = CLAUDE_ROLE + """
-Here is student learning objective for the current study session:
-{learning_objective}
-
-Here is the information on student screen:
-{text}
+You will be given the student learning objective for the current study session and the information on the student screen.
 
 Please analyze it and do the following instructions: {instructions}
 The output should be in the following format: {output_format}
 
 Important: consider student learning objective when generating insights
 """
+INSIGHT_CONTEXT_PROMPT = """Here is student learning objective for the current study session:
+{learning_objective}
+
+Here is the information on student screen:
+{text}
+
+Already visited urls: {visited_urls}
+"""
 SUMMARY_GENERATION_INSTRUCTION = "provide short summary of the screen content"
-LINK_GENERATION_INSTRUCTION = "provide a web page url with a short description (8 words max offering the student to visit the page) that predicts the next step in the learning process based on the screen content. Only include the most relevant link that is aligned with the learning objective. Don't include links with the same domain name twice. Already visited urls: {visited_urls}"
+LINK_GENERATION_INSTRUCTION = "provide a web page url with a short description (8 words max offering the student to visit the page) that predicts the next step in the learning process based on the screen content. Only include the most relevant link that is aligned with the learning objective. Don't include links with the same domain name twice. Don't include already visited urls."
 SUGGESTIONS_GENERATION_INSTRUCTION = "make suggestions how student can continue their learning based on the screen content and your findings"
 
 # Button settings
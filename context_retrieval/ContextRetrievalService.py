@@ -3,6 +3,10 @@ Context Retrieval Main Module
 
 This is the main entry point for the context retrieval feature.
 It captures screenshots at regular intervals and analyzes them using Claude API.
+
+A directory of recorded screenshots or a screenshot archive can be replayed through
+the same pipeline:
+python context_retrieval/ContextRetrievalService.py --replay context_retrieval/screenshots --speed 10
 """
 
 import os
@@ -10,17 +14,49 @@ import sys
 import time
 import logging
 import signal
+import argparse
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 
 # Add parent directory to path to import config
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from context_retrieval import config
-from context_retrieval.screenshot_capture import ScreenshotCapture
-from context_retrieval.claude_analyzer import ClaudeAnalyzer
+from context_retrieval.screenshot_capture import (
+    ScreenshotCapture, TileDiff, ReplayBackend, create_backend, list_screenshots
+)
+from context_retrieval.screenshot_archive import ScreenshotArchive
+from context_retrieval.claude_analyzer import ClaudeAnalyzer, AsyncClaudeAnalyzer, AsyncAnalysisRunner
+from context_retrieval.image_encoding import ImageEncoder
+from context_retrieval.analysis_cache import AnalysisCache
 from context_retrieval.context_manager import ContextManager
+from context_retrieval.frame_gate import FrameGate
+from context_retrieval.capture_scheduler import AdaptiveScheduler
+from context_retrieval.pipeline_metrics import StageTimings
+from context_retrieval.pipeline import Pipeline
+from context_retrieval.context_change import ContextChangeTrigger
+from context_retrieval.context_model import Context
+from context_retrieval.api_usage import usage_tracker
+from context_retrieval.api_client import load_api_key, close_clients
+from context_retrieval.resilience import api_circuit_breaker
+from context_retrieval.triage import triage_router
 from context_retrieval.shared_queue import links_queue
-from context_retrieval.insights_generation import generate_links, update_summary_history
+from context_retrieval.insights_generation import (
+    generate_links, update_summary_history, update_summary_and_links, get_session_store,
+    import_summary_history
+)
+
+
+@dataclass
+class FrameJob:
+    """A captured frame on its way through the pipeline"""
+    sequence: int
+    screenshot: object
+    region: tuple | None
+    previous_context: Context | None
+    frame_hash: int | None = None
+    prepared: object = None
 
 
 class ContextRetrievalService:
@@ -35,8 +71,7 @@ class ContextRetrievalService:
         self.links_queue = links_queue
         # Load API key
         try:
-            with open(config.API_KEY_PATH, 'r') as f:
-                api_key = f.read().strip()
+            api_key = load_api_key()
             self.logger.info("API key loaded successfully")
         except Exception as e:
             self.logger.error(f"Error loading API key: {e}")
@@ -45,29 +80,138 @@ class ContextRetrievalService:
         # Initialize components
         self.screenshot_capture = ScreenshotCapture(
             save_dir=config.SCREENSHOTS_DIR,
-            save_screenshots=config.SAVE_SCREENSHOTS
+            save_screenshots=config.SAVE_SCREENSHOTS,
+            backend=create_backend(
+                config.CAPTURE_BACKEND,
+                monitor=config.CAPTURE_MONITOR,
+                replay_dir=config.CAPTURE_REPLAY_DIR
+            ),
+            max_bytes=config.SCREENSHOTS_MAX_BYTES,
+            max_age=config.SCREENSHOTS_MAX_AGE,
+            write_queue_size=config.STORAGE_WRITE_QUEUE_SIZE,
+            archive=config.SCREENSHOT_ARCHIVE_ENABLED,
+            archive_keyframe_interval=config.SCREENSHOT_ARCHIVE_KEYFRAME_INTERVAL,
+            archive_segment_frames=config.SCREENSHOT_ARCHIVE_SEGMENT_FRAMES
         )
         
-        self.claude_analyzer = ClaudeAnalyzer(
+        encoder = ImageEncoder(
+            format=config.IMAGE_FORMAT,
+            token_budget=config.IMAGE_TOKEN_BUDGET,
+            grayscale=config.IMAGE_GRAYSCALE,
+            quality=config.IMAGE_QUALITY,
+            min_scale=config.IMAGE_MIN_SCALE
+        )
+        self.analysis_cache = AnalysisCache(
+            max_entries=config.ANALYSIS_CACHE_MEMORY_ENTRIES,
+            cache_dir=config.ANALYSIS_CACHE_DIR,
+            max_disk_bytes=config.ANALYSIS_CACHE_MAX_BYTES,
+            max_age=config.ANALYSIS_CACHE_MAX_AGE,
+            max_distance=config.ANALYSIS_CACHE_MAX_DISTANCE
+        ) if config.ANALYSIS_CACHE_ENABLED else None
+        analyzer_options = dict(
             api_key=api_key,
             model=config.CLAUDE_MODEL,
             max_tokens=config.MAX_TOKENS,
-            prompt=config.ANALYSIS_PROMPT
+            prompt=config.ANALYSIS_PROMPT,
+            region_prompt=config.REGION_ANALYSIS_PROMPT,
+            encoder=encoder,
+            cache=self.analysis_cache,
+            cache_key_mode=config.ANALYSIS_CACHE_KEY,
+            delta_prompt=config.DELTA_ANALYSIS_PROMPT if config.DELTA_ANALYSIS_ENABLED else None
         )
+        if config.ASYNC_ANALYSIS_ENABLED and not config.PIPELINE_ENABLED:
+            self.claude_analyzer = AsyncClaudeAnalyzer(
+                **analyzer_options,
+                max_in_flight=config.ANALYSIS_MAX_IN_FLIGHT,
+                deadline=config.ANALYSIS_DEADLINE
+            )
+            self.analysis_runner = AsyncAnalysisRunner()
+        else:
+            # The pipeline runs the sync analyzer on its own worker threads
+            self.claude_analyzer = ClaudeAnalyzer(**analyzer_options)
+            self.analysis_runner = None
+        
+        # Analyses are numbered in submission order; results older than the last
+        # applied one are dropped
+        self.analysis_sequence = 0
+        self.applied_sequence = 0
+        self.context_lock = threading.Lock()
+        
+        # Async analyses started on the event loop and not finished yet
+        self.analyses_in_flight = 0
+        self.async_stages = self.build_async_stages() if self.analysis_runner else None
         
         self.context_manager = ContextManager(
             contexts_dir=config.CONTEXTS_DIR,
-            save_contexts=config.SAVE_CONTEXTS
+            save_contexts=config.SAVE_CONTEXTS,
+            max_bytes=config.CONTEXTS_MAX_BYTES,
+            max_age=config.CONTEXTS_MAX_AGE,
+            compress=config.CONTEXT_COMPRESSION_ENABLED,
+            dictionary_samples=config.CONTEXT_DICTIONARY_SAMPLES,
+            write_queue_size=config.STORAGE_WRITE_QUEUE_SIZE
         )
         
-        # Track latest context and link generation timing
+        self.frame_gate = FrameGate(
+            threshold=config.FRAME_GATE_THRESHOLD,
+            hash_size=config.FRAME_GATE_HASH_SIZE
+        ) if config.FRAME_GATE_ENABLED else None
+        
+        grid_cols, grid_rows = config.DIRTY_REGION_GRID
+        self.tile_diff = TileDiff(
+            grid_cols=grid_cols,
+            grid_rows=grid_rows,
+            pixel_threshold=config.DIRTY_REGION_PIXEL_THRESHOLD,
+            tile_threshold=config.DIRTY_REGION_TILE_THRESHOLD
+        ) if config.DIRTY_REGION_ENABLED else None
+        # Last frame that was successfully analyzed (matches latest_context)
+        self.last_analyzed_frame = None
+        
+        if config.ADAPTIVE_INTERVAL_ENABLED:
+            self.scheduler = AdaptiveScheduler(
+                base_interval=config.SCREENSHOT_INTERVAL,
+                min_interval=config.MIN_SCREENSHOT_INTERVAL,
+                max_interval=config.MAX_SCREENSHOT_INTERVAL,
+                speedup_factor=config.INTERVAL_SPEEDUP_FACTOR,
+                backoff_factor=config.INTERVAL_BACKOFF_FACTOR
+            )
+        else:
+            self.scheduler = AdaptiveScheduler(
+                base_interval=config.SCREENSHOT_INTERVAL,
+                min_interval=config.SCREENSHOT_INTERVAL,
+                max_interval=config.SCREENSHOT_INTERVAL
+            )
+        # Whether the last captured frame differed from the last analyzed one
+        self.last_frame_changed = True
+        self.last_cursor_position = None
+        
+        # Per-stage timings of the pipeline
+        self.timings = StageTimings()
+        
+        # Track latest context; links and the summary are regenerated when it changes
         self.latest_context = None
-        self.last_link_generation = 0
-        self.link_generation_interval = 10  # Generate links every 60 seconds
+        self.change_trigger = ContextChangeTrigger(
+            threshold=config.CONTEXT_CHANGE_THRESHOLD,
+            debounce=config.CONTEXT_CHANGE_DEBOUNCE,
+            min_interval=config.CONTEXT_CHANGE_MIN_INTERVAL,
+            max_wait=config.CONTEXT_CHANGE_MAX_WAIT
+        )
+        self.link_generation_lock = threading.Lock()
+        # Wall clock for link timing; replay swaps in the recorded frame time
+        self.clock = time.time
+        
+        # In pipeline mode the summary and links are separate stages (or one combined stage)
+        self.consumer_stages = ("insights",) if config.COMBINED_INSIGHTS_ENABLED else ("summary", "links")
+        self.pipeline = self.build_pipeline() if config.PIPELINE_ENABLED else None
         
         self.logger.info("Context Retrieval Service initialized")
-        self.logger.info(f"Screenshot interval: {config.SCREENSHOT_INTERVAL} seconds")
-        self.logger.info(f"Link generation interval: {self.link_generation_interval} seconds")
+        self.logger.info(
+            f"Screenshot interval: {self.scheduler.min_interval}-{self.scheduler.max_interval} seconds "
+            f"(starting at {self.scheduler.current_interval})"
+        )
+        self.logger.info(
+            f"Link generation on context change (threshold {config.CONTEXT_CHANGE_THRESHOLD}, "
+            f"debounce {config.CONTEXT_CHANGE_DEBOUNCE} s, at most every {config.CONTEXT_CHANGE_MIN_INTERVAL} s)"
+        )
     
     def setup_logging(self):
         """Setup logging configuration"""
@@ -111,100 +255,563 @@ class ContextRetrievalService:
             self.logger.info("Starting screenshot capture and analysis...")
             
             # Capture screenshot
-            screenshot, screenshot_path = self.screenshot_capture.capture_and_save()
+            with self.timings.measure("capture"):
+                screenshot, screenshot_path = self.screenshot_capture.capture_and_save()
             
             if screenshot_path:
                 self.logger.info(f"Screenshot saved to: {screenshot_path}")
             
-            # Analyze with Claude
-            self.logger.info("Analyzing screenshot with Claude API...")
-            context_xml = self.claude_analyzer.analyze_screenshot(screenshot)
+            # Skip the API call if the screen hasn't meaningfully changed
+            self.last_frame_changed = True
+            frame_hash = None
+            if self.frame_gate:
+                with self.timings.measure("gate"), self.context_lock:
+                    self.last_frame_changed = self.frame_gate.should_analyze(
+                        screenshot, force=self.latest_context is None
+                    )
+                    frame_hash = self.frame_gate.last_hash
+            if not self.last_frame_changed:
+                stats = self.frame_gate.get_stats()
+                self.logger.info(
+                    f"Screen unchanged (distance: {self.frame_gate.last_distance}), "
+                    f"reusing latest context. Skipped {stats['skipped']} of "
+                    f"{stats['skipped'] + stats['analyzed']} API calls"
+                )
+                return self.latest_context
             
-            if context_xml:
-                # Store context for link generation
-                self.latest_context = context_xml
-                
-                # Print context to console
-                print("\n" + "=" * 60)
-                print("EXTRACTED CONTEXT:")
-                print("=" * 60)
-                print(context_xml)
-                print("=" * 60 + "\n")
-                
-                # Save context
-                context_path = self.context_manager.save_context(context_xml)
-                if context_path:
-                    self.logger.info(f"Context saved to: {context_path}")
-                    return context_xml
+            # Analyze with Claude, sending only the changed region if the change is local
+            with self.timings.measure("region"):
+                region = self.get_local_change_region(screenshot)
+            
+            # Hand the frame to the pipeline and return to capturing right away
+            if self.pipeline:
+                self.submit_to_pipeline(screenshot, region, frame_hash)
+                return None
+            
+            # Hand the frame to the async analyzer and return to capturing right away
+            if self.analysis_runner:
+                self.submit_analysis(screenshot, region, frame_hash)
+                return None
+            
+            if not self.should_extract(FrameJob(self.analysis_sequence + 1, screenshot, region,
+                                                self.latest_context, frame_hash)):
+                return self.latest_context
+            
+            self.analysis_sequence += 1
+            with self.timings.measure("analyze"):
+                if region:
+                    self.logger.info(f"Analyzing changed region {region} with Claude API...")
+                    context = self.claude_analyzer.analyze_region(screenshot, region, self.latest_context)
+                else:
+                    self.logger.info("Analyzing screenshot with Claude API...")
+                    context = self.claude_analyzer.analyze_screenshot(
+                        screenshot, previous_context=self.latest_context
+                    )
+            
+            if context:
+                self.applied_sequence = self.analysis_sequence
+                self.handle_context(context, screenshot)
             else:
-                self.logger.warning("Failed to extract context from screenshot")
+                self.handle_analysis_failure()
             
             self.logger.info("Screenshot processing completed")
             self.logger.info("=" * 60 + "\n")
+            return context
             
         except Exception as e:
             self.logger.error(f"Error processing screenshot: {e}", exc_info=True)
     
-    def generate_links_if_needed(self):
-        """Generate links every minute if we have context"""
-        current_time = time.time()
+    def should_extract(self, job: FrameJob) -> bool:
+        """
+        Decide, right before extraction, whether a changed frame still needs one.
+        
+        Runs on the analysis worker rather than the capture thread in pipeline and async
+        mode. The frame is compared again with the last extracted frame, which may have
+        moved since it was captured, and with triage enabled the small model decides
+        about small changes. The frame gate's reference only advances to frames that are
+        extracted.
+        
+        Args:
+            job: Frame to decide about
+            
+        Returns:
+            True if the frame should be extracted
+        """
+        with self.context_lock:
+            previous_context = self.latest_context
+            distance = None
+            if self.frame_gate and job.frame_hash is not None:
+                distance = self.frame_gate.distance(job.frame_hash)
+        
+        if previous_context and distance is not None and distance <= self.frame_gate.threshold:
+            self.logger.info(f"A similar frame was extracted meanwhile (distance: {distance}), skipping")
+            return False
+        
+        # Let the small model decide whether the change needs a full extraction
+        if config.TRIAGE_ENABLED:
+            with self.timings.measure("triage"):
+                needs_extraction = triage_router.needs_extraction(job.screenshot, distance, previous_context)
+            if not needs_extraction:
+                self.logger.info("Change is not relevant, reusing latest context")
+                if self.frame_gate and job.frame_hash is not None:
+                    with self.context_lock:
+                        self.frame_gate.dismiss(job.frame_hash)
+                return False
+        
+        if self.frame_gate and job.frame_hash is not None:
+            with self.context_lock:
+                self.frame_gate.accept(job.frame_hash)
+        return True
+    
+    def handle_context(self, context: Context, screenshot):
+        """
+        Store, print and save a newly extracted context.
+        
+        Args:
+            context: Context extracted from the screenshot
+            screenshot: PIL Image the context was extracted from
+        """
+        # Store context for link generation
+        with self.context_lock:
+            self.latest_context = context
+            self.last_analyzed_frame = screenshot
+        self.change_trigger.observe(context, self.clock())
+        if config.SAVE_CONTEXTS:
+            get_session_store().append("context", hash=context.content_hash, tabs=context.to_dicts())
+        
+        # Print context to console
+        print("\n" + "=" * 60)
+        print("EXTRACTED CONTEXT:")
+        print("=" * 60)
+        print(context.xml)
+        print("=" * 60 + "\n")
+        
+        # Save context
+        with self.timings.measure("save_context"):
+            context_path = self.context_manager.save_context(context.xml)
+        if context_path:
+            self.logger.info(f"Context saved to: {context_path}")
+    
+    def handle_analysis_failure(self):
+        """Make sure the next frame is analyzed in full after a failed analysis"""
+        self.logger.warning("Failed to extract context from screenshot")
+        with self.context_lock:
+            self.last_analyzed_frame = None
+        if self.frame_gate:
+            self.frame_gate.reset()
+    
+    def build_async_stages(self) -> Pipeline:
+        """
+        Build the submit -> apply stages around the async analyzer.
+        
+        The submit stage waits for a free analysis slot and starts the request on the
+        event loop. Its one-frame queue holds the newest captured frame, so a newer frame
+        replaces a waiting one while requests already on the wire are never cancelled.
+        The apply stage handles finished analyses off the event loop thread.
+        
+        Returns:
+            Pipeline (not started)
+        """
+        self.analysis_slots = threading.BoundedSemaphore(config.ANALYSIS_MAX_IN_FLIGHT)
+        stages = Pipeline()
+        stages.add_stage("submit", self.start_async_analysis, queue_size=1)
+        stages.add_stage("apply", self.finish_async_analysis, queue_size=config.ANALYSIS_MAX_IN_FLIGHT)
+        return stages
+    
+    def submit_analysis(self, screenshot, region=None, frame_hash=None):
+        """
+        Queue a screenshot for the async analyzer.
+        
+        Args:
+            screenshot: PIL Image of the frame
+            region: Bounding box of the changed region, or None to analyze the full frame
+            frame_hash: Frame gate hash of the frame (None if the gate is disabled)
+        """
+        with self.context_lock:
+            previous_context = self.latest_context
+        self.analysis_sequence += 1
+        self.async_stages.put(
+            "submit", FrameJob(self.analysis_sequence, screenshot, region, previous_context, frame_hash)
+        )
+    
+    def start_async_analysis(self, job: FrameJob):
+        """Submit stage: wait for a free analysis slot and start the analysis on the event loop"""
+        while not self.analysis_slots.acquire(timeout=0.5):
+            if not self.running:
+                return
+        
+        # Checked once a slot is free, so earlier analyses have moved the gate reference
+        if not self.should_extract(job):
+            self.analysis_slots.release()
+            return
+        
+        try:
+            if job.region:
+                self.logger.info(f"Submitting changed region {job.region} for analysis...")
+                coroutine = self.claude_analyzer.analyze_region_async(
+                    job.screenshot, job.region, job.previous_context
+                )
+            else:
+                self.logger.info("Submitting screenshot for analysis...")
+                coroutine = self.claude_analyzer.analyze_screenshot_async(
+                    job.screenshot, previous_context=job.previous_context
+                )
+        except Exception:
+            self.analysis_slots.release()
+            raise
+        
+        # Counted only once the analysis is actually handed to the event loop
+        with self.context_lock:
+            self.analyses_in_flight += 1
+        started = time.perf_counter()
+        try:
+            future = self.analysis_runner.submit(coroutine)
+        except Exception:
+            coroutine.close()
+            with self.context_lock:
+                self.analyses_in_flight -= 1
+            self.analysis_slots.release()
+            raise
+        
+        future.add_done_callback(lambda done: self.on_analysis_done(done, job, started))
+    
+    def on_analysis_done(self, future, job: FrameJob, started: float):
+        """
+        Hand the result of an async analysis to the apply stage (runs on the analysis thread).
+        
+        Args:
+            future: Completed future of the analysis
+            job: Frame that was analyzed
+            started: perf_counter value when the analysis was submitted
+        """
+        try:
+            if not future.cancelled():
+                self.timings.record("analyze", time.perf_counter() - started)
+                try:
+                    context = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error processing screenshot: {e}", exc_info=True)
+                    context = None
+                self.async_stages.put("apply", (job, context))
+        finally:
+            # Queued for the apply stage before the slot is released, so draining sees it
+            with self.context_lock:
+                self.analyses_in_flight -= 1
+            self.analysis_slots.release()
+    
+    def finish_async_analysis(self, result: tuple[FrameJob, Context | None]):
+        """Apply stage: apply the result of an async analysis"""
+        job, context = result
+        self.apply_analysis_result(job.sequence, job.screenshot, context)
+    
+    def apply_analysis_result(self, sequence: int, screenshot, context: Context | None) -> bool:
+        """
+        Apply the result of an analysis unless a newer frame's result was applied already.
         
-        # Check if it's time to generate links and we have context
-        if (current_time - self.last_link_generation >= self.link_generation_interval 
-            and self.latest_context):
+        Args:
+            sequence: Submission number of the analysis
+            screenshot: PIL Image that was analyzed
+            context: Extracted context, or None if the analysis failed
             
+        Returns:
+            True if a context was applied
+        """
+        with self.context_lock:
+            if sequence < self.applied_sequence:
+                self.logger.info("Dropping analysis result superseded by a newer frame")
+                return False
+            if context:
+                self.applied_sequence = sequence
+        
+        if context:
+            self.handle_context(context, screenshot)
+            return True
+        self.handle_analysis_failure()
+        return False
+    
+    def build_pipeline(self) -> Pipeline:
+        """
+        Build the encode -> analyze -> (summary, links) pipeline.
+        
+        Capturing stays on the service thread, which feeds frames into the encode stage.
+        The summary and link stages are fed by the change trigger rather than by every
+        analysis; with combined insights a single stage does both in one API call.
+        
+        Returns:
+            Pipeline (not started)
+        """
+        pipeline = Pipeline()
+        pipeline.add_stage("encode", self.encode_frame,
+                           workers=config.PIPELINE_ENCODE_WORKERS, queue_size=config.PIPELINE_QUEUE_SIZE)
+        pipeline.add_stage("analyze", self.analyze_frame, after=["encode"],
+                           workers=config.PIPELINE_ANALYZE_WORKERS, queue_size=config.PIPELINE_QUEUE_SIZE)
+        if config.COMBINED_INSIGHTS_ENABLED:
+            pipeline.add_stage("insights", self.insights_stage)
+        else:
+            pipeline.add_stage("summary", self.summary_stage)
+            pipeline.add_stage("links", self.links_stage)
+        return pipeline
+    
+    def submit_to_pipeline(self, screenshot, region=None, frame_hash=None):
+        """
+        Queue a captured frame for encoding and analysis.
+        
+        Args:
+            screenshot: PIL Image of the frame
+            region: Bounding box of the changed region, or None to analyze the full frame
+            frame_hash: Frame gate hash of the frame (None if the gate is disabled)
+        """
+        with self.context_lock:
+            previous_context = self.latest_context
+        self.analysis_sequence += 1
+        self.pipeline.put(
+            "encode", FrameJob(self.analysis_sequence, screenshot, region, previous_context, frame_hash)
+        )
+    
+    def encode_frame(self, job: FrameJob) -> FrameJob:
+        """Pipeline stage: encode a frame and look it up in the analysis cache"""
+        with self.timings.measure("encode"):
+            if job.region:
+                job.prepared = self.claude_analyzer.prepare_region(job.screenshot, job.region, job.previous_context)
+            else:
+                job.prepared = self.claude_analyzer.prepare_screenshot(job.screenshot, job.previous_context)
+        return job
+    
+    def analyze_frame(self, job: FrameJob):
+        """Pipeline stage: analyze an encoded frame and apply the result"""
+        if not self.should_extract(job):
+            return
+        with self.timings.measure("analyze"):
+            context = self.claude_analyzer.analyze_prepared(job.prepared)
+        if self.apply_analysis_result(job.sequence, job.screenshot, context):
+            self.dispatch_context_change()
+    
+    def summary_stage(self, context: Context):
+        """Pipeline stage: merge a changed context into the summary history"""
+        learning_objective = self.get_learning_objective()
+        if learning_objective:
+            self.update_summary(learning_objective, context)
+    
+    def links_stage(self, context: Context):
+        """Pipeline stage: generate links for a changed context"""
+        learning_objective = self.get_learning_objective()
+        if learning_objective:
+            self.update_links(learning_objective, context)
+    
+    def insights_stage(self, context: Context):
+        """Pipeline stage: update the summary and generate links in one call for a changed context"""
+        learning_objective = self.get_learning_objective()
+        if learning_objective:
+            self.update_insights(learning_objective, context)
+    
+    def dispatch_context_change(self, flush: bool = False):
+        """
+        Start summary and link generation if the change trigger has a context due.
+        
+        Args:
+            flush: Take a pending context even if its debounce window or the rate
+                limit hasn't passed yet
+        """
+        context = self.change_trigger.flush() if flush else self.change_trigger.poll(self.clock())
+        if not context:
+            return
+        
+        self.logger.info("Context changed, updating summary and links...")
+        if self.pipeline:
+            for stage in self.consumer_stages:
+                self.pipeline.put(stage, context)
+        else:
+            self.generate_links_for_context(context)
+    
+    def get_learning_objective(self) -> str | None:
+        """Read the learning objective from the environment, warning if it is not set"""
+        learning_objective = os.getenv("LEARNING_OBJECTIVE")
+        if not learning_objective:
+            self.logger.warning("Learning objective environment variable is not set")
+        return learning_objective
+    
+    def wait_for_pending_analyses(self, timeout: float = None):
+        """
+        Block until all submitted async or pipelined analyses have finished.
+        
+        Args:
+            timeout: Maximum seconds to wait (None to wait indefinitely)
+        """
+        if self.pipeline:
+            self.pipeline.drain(timeout)
+        if self.async_stages:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self.analyses_in_flight or not self.async_stages.drain(0):
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+                time.sleep(0.05)
+    
+    def is_user_idle(self) -> bool:
+        """
+        Check whether the user has been idle since the previous check.
+        
+        A still cursor doesn't mean the user stopped reading or scrolling, so this only
+        speeds up the backoff of a static screen and never slows down a changing one.
+        
+        Returns:
+            True if the mouse cursor hasn't moved since the previous check
+        """
+        position = self.screenshot_capture.get_cursor_position()
+        idle = position is not None and position == self.last_cursor_position
+        self.last_cursor_position = position
+        return idle
+    
+    def get_local_change_region(self, screenshot):
+        """
+        Get the changed region of the screen if the change is small enough to
+        analyze on its own.
+        
+        Args:
+            screenshot: PIL Image of the new frame
+            
+        Returns:
+            Bounding box (left, top, right, bottom) of the changed region, or None if
+            the whole screen should be analyzed
+        """
+        with self.context_lock:
+            latest_context = self.latest_context
+            last_analyzed_frame = self.last_analyzed_frame
+        if not self.tile_diff or not latest_context or last_analyzed_frame is None:
+            return None
+        
+        region = self.tile_diff.changed_region(last_analyzed_frame, screenshot)
+        if not region:
+            return None
+        
+        left, top, right, bottom = region
+        area = (right - left) * (bottom - top) / (screenshot.width * screenshot.height)
+        if area > config.DIRTY_REGION_MAX_AREA:
+            self.logger.debug(f"Changed region covers {area:.0%} of the screen, analyzing full frame")
+            return None
+        
+        self.logger.info(f"Local change detected, covering {area:.0%} of the screen")
+        return region
+    
+    def generate_links_for_context(self, context: Context):
+        """
+        Update the summary and generate links for a changed context.
+        
+        Args:
+            context: Context to generate links from
+        """
+        # Only one link generation runs at a time
+        with self.link_generation_lock:
             try:
                 self.logger.info("Generating links from context...")
                 
                 # Use the environment variable for learning objective
-                learning_objective = os.getenv("LEARNING_OBJECTIVE")
-                if not learning_objective:
-                    self.logger.warning("Learning objective environment variable is not set")
-                    return
-                
-                # Update the summary history with new context
-                self.logger.info("Updating summary history...")
-                updated_summary = update_summary_history(learning_objective, self.latest_context)
-                
-                if updated_summary:
-                    self.logger.info("Summary history updated successfully")
-                    
-                    # Print summary to console
-                    print("\n" + "=" * 60)
-                    print("UPDATED LEARNING SUMMARY:")
-                    print("=" * 60)
-                    print(updated_summary)
-                    print("=" * 60 + "\n")
-                else:
-                    self.logger.warning("Failed to update summary history")
-                
-                # Generate links using the function from insights_generation.py
-                insights = generate_links(learning_objective, self.latest_context)
-                print(insights)
-                if insights and insights.links:
-                    # Put links in the queue (overwrites old entry if full)
-                    self.links_queue.put(insights.links)
-                    self.logger.info(f"Generated {len(insights.links)} links and added to queue")
-                    
-                    # Print links to console
-                    print("\n" + "=" * 60)
-                    print("GENERATED LINKS:")
-                    print("=" * 60)
-                    for i, link in enumerate(insights.links, 1):
-                        print(f"{i}. {link.summary}")
-                        print(f"   URL: {link.url}")
-                    print("=" * 60 + "\n")
-                else:
-                    self.logger.warning("Failed to generate links")
-                
-                self.last_link_generation = current_time
+                learning_objective = self.get_learning_objective()
+                if learning_objective:
+                    self.update_insights(learning_objective, context)
                 
             except Exception as e:
                 self.logger.error(f"Error generating links: {e}", exc_info=True)
     
+    def update_insights(self, learning_objective: str, context: Context):
+        """
+        Update the summary history and generate links, in one combined API call if
+        COMBINED_INSIGHTS_ENABLED is set.
+        
+        Args:
+            learning_objective: The student's learning objective
+            context: Extracted screen context
+        """
+        if not config.COMBINED_INSIGHTS_ENABLED:
+            self.update_summary(learning_objective, context)
+            self.update_links(learning_objective, context)
+            return
+        
+        self.logger.info("Updating summary history and generating links...")
+        with self.timings.measure("insights"):
+            updated_summary, insights = update_summary_and_links(learning_objective, context)
+        self.report_summary(updated_summary)
+        self.publish_links(insights)
+    
+    def update_summary(self, learning_objective: str, context: Context):
+        """
+        Merge a context into the summary history and print the updated summary.
+        
+        Args:
+            learning_objective: The student's learning objective
+            context: Extracted screen context
+        """
+        self.logger.info("Updating summary history...")
+        with self.timings.measure("summary"):
+            updated_summary = update_summary_history(learning_objective, context)
+        self.report_summary(updated_summary)
+    
+    def report_summary(self, updated_summary: str | None):
+        """
+        Print an updated summary.
+        
+        Args:
+            updated_summary: The updated summary, or None if the update failed
+        """
+        if updated_summary:
+            self.logger.info("Summary history updated successfully")
+            
+            # Print summary to console
+            print("\n" + "=" * 60)
+            print("UPDATED LEARNING SUMMARY:")
+            print("=" * 60)
+            print(updated_summary)
+            print("=" * 60 + "\n")
+        else:
+            self.logger.warning("Failed to update summary history")
+    
+    def update_links(self, learning_objective: str, context: Context):
+        """
+        Generate links for a context and put them in the links queue.
+        
+        Args:
+            learning_objective: The student's learning objective
+            context: Extracted screen context
+        """
+        # Generate links using the function from insights_generation.py
+        with self.timings.measure("links"):
+            insights = generate_links(learning_objective, context)
+        self.publish_links(insights)
+    
+    def publish_links(self, insights):
+        """
+        Put generated links in the links queue and print them.
+        
+        Args:
+            insights: Insights with the generated links, or None if generation failed
+        """
+        print(insights)
+        if insights and insights.links:
+            # Put links in the queue (overwrites old entry if full)
+            self.links_queue.put(insights.links)
+            self.logger.info(f"Generated {len(insights.links)} links and added to queue")
+            get_session_store().append(
+                "links", links=[{"url": link.url, "summary": link.summary} for link in insights.links]
+            )
+            
+            # Print links to console
+            print("\n" + "=" * 60)
+            print("GENERATED LINKS:")
+            print("=" * 60)
+            for i, link in enumerate(insights.links, 1):
+                print(f"{i}. {link.summary}")
+                print(f"   URL: {link.url}")
+            print("=" * 60 + "\n")
+        else:
+            self.logger.warning("Failed to generate links")
+    
     def run(self):
         """Run the context retrieval service"""
         self.running = True
+        if self.analysis_runner:
+            self.analysis_runner.start()
+            self.async_stages.start()
+        if self.pipeline:
+            self.pipeline.start()
         self.logger.info("Context Retrieval Service started")
         self.logger.info(f"Press Ctrl+C to stop")
         
@@ -212,25 +819,169 @@ class ContextRetrievalService:
             iteration = 0
             while self.running:
                 iteration += 1
-                self.logger.info(f"\n[Iteration {iteration}] Next capture in {config.SCREENSHOT_INTERVAL} seconds...")
+                self.logger.info(
+                    f"\n[Iteration {iteration}] Next capture in {self.scheduler.current_interval:.1f} seconds "
+                    f"(effective rate: {self.scheduler.effective_rate:.1f} captures/min)..."
+                )
                 
-                # Wait for the interval
-                time.sleep(config.SCREENSHOT_INTERVAL)
+                # Wait until the next capture is due
+                if not self.scheduler.wait():
+                    break
                 
                 # Process screenshot
                 self.process_screenshot()
                 
-                # Check if we should generate links
-                self.generate_links_if_needed()
+                # Adapt the interval to how much the screen and user are changing
+                self.scheduler.record_activity(self.last_frame_changed, idle=self.is_user_idle())
+                
+                # Generate links if the context changed and has settled
+                self.dispatch_context_change()
+                
+                # Pause capturing while the API is unavailable, frames couldn't be analyzed anyway
+                if api_circuit_breaker.is_open():
+                    pause = api_circuit_breaker.seconds_until_retry()
+                    self.logger.warning(f"API unavailable, pausing capture for {pause:.0f} seconds")
+                    self.scheduler.defer(pause)
                 
         except KeyboardInterrupt:
             self.logger.info("\nReceived shutdown signal")
         finally:
             self.stop()
     
+    def replay(self, directory: str, speed: float = 0.0):
+        """
+        Run the pipeline over a directory of recorded screenshots instead of the screen.
+        
+        Frames go through gating, analysis, summary and link generation exactly as
+        they would live. Point ANTHROPIC_BASE_URL at a local stand-in API to benchmark
+        the pipeline offline.
+        
+        Args:
+            directory: Directory of screenshots or screenshot archive saved by ScreenshotCapture
+            speed: Playback speed relative to the recorded timestamps (e.g. 10 for 10x);
+                0 processes frames as fast as possible
+        """
+        # Feed recorded frames through the capture stage, and don't save them again
+        archive = ScreenshotArchive(directory)
+        if len(archive):
+            frames = [(f"{entry.segment}@{entry.offset}", entry.timestamp) for entry in archive.entries]
+            backend = ReplayBackend(archive=archive, loop=False)
+        else:
+            frames = list_screenshots(directory)
+            backend = ReplayBackend(directory=directory, paths=[path for path, _ in frames], loop=False)
+        if not frames:
+            self.logger.warning(f"No screenshots found in {directory}")
+            return
+        
+        self.screenshot_capture.backend = backend
+        self.screenshot_capture.save_screenshots = False
+        self.timings.reset()
+        usage_tracker.reset()
+        triage_router.reset()
+        self.change_trigger.reset()
+        
+        self.running = True
+        if self.analysis_runner:
+            self.analysis_runner.start()
+            self.async_stages.start()
+        if self.pipeline:
+            self.pipeline.start()
+        self.logger.info(f"Replaying {len(frames)} screenshots from {directory} (speed: {speed or 'max'})")
+        
+        # Link generation timing follows the recorded frame times
+        replay_time = frames[0][1]
+        self.clock = lambda: replay_time
+        
+        first_timestamp = frames[0][1]
+        replay_start = time.monotonic()
+        total_start = time.perf_counter()
+        index = 0
+        try:
+            for index, (path, timestamp) in enumerate(frames, 1):
+                if not self.running:
+                    break
+                
+                # Pace frames like the recording, sped up by the given factor
+                if speed > 0:
+                    due = replay_start + (timestamp - first_timestamp) / speed
+                    time.sleep(max(0.0, due - time.monotonic()))
+                
+                self.logger.info(f"[Replay {index}/{len(frames)}] {os.path.basename(path)}")
+                replay_time = timestamp
+                with self.timings.measure("frame"):
+                    self.process_screenshot()
+                    self.dispatch_context_change()
+            
+            # Let the last async analyses finish before reporting
+            self.wait_for_pending_analyses(timeout=config.ANALYSIS_DEADLINE)
+            # The recording ends before the last change's debounce window
+            self.dispatch_context_change(flush=True)
+            if self.pipeline:
+                self.pipeline.drain(config.ANALYSIS_DEADLINE)
+        except KeyboardInterrupt:
+            self.logger.info("\nReceived shutdown signal")
+        finally:
+            elapsed = time.perf_counter() - total_start
+            print("\n" + "=" * 74)
+            print(f"REPLAY TIMINGS ({index} frames in {elapsed:.1f} s, {index / elapsed if elapsed else 0:.2f} frames/s):")
+            print("=" * 74)
+            print(self.timings.format_report())
+            if self.pipeline:
+                print("=" * 74)
+                print("PIPELINE STAGES:")
+                print("=" * 74)
+                print(self.pipeline.format_report())
+            print("=" * 74)
+            print("API TOKEN USAGE:")
+            print("=" * 74)
+            print(usage_tracker.format_report())
+            if config.TRIAGE_ENABLED:
+                print("=" * 74)
+                print("TRIAGE ROUTING:")
+                print("=" * 74)
+                print(triage_router.format_report())
+            print("=" * 74 + "\n")
+            self.stop()
+    
     def stop(self):
         """Stop the service"""
         self.running = False
+        self.scheduler.stop()
+        if self.analysis_runner:
+            self.async_stages.stages["submit"].stop()
+            self.analysis_runner.stop()
+            self.async_stages.stop()
+        if self.pipeline:
+            self.pipeline.stop()
+            self.logger.info(f"Pipeline stages:\n{self.pipeline.format_report()}")
+        get_session_store().sync()
+        close_clients()
+        self.screenshot_capture.close()
+        self.context_manager.close()
+        if self.frame_gate:
+            stats = self.frame_gate.get_stats()
+            self.logger.info(
+                f"Frame gate: analyzed {stats['analyzed']} frames, "
+                f"skipped {stats['skipped']} API calls ({stats['skip_ratio']:.0%})"
+            )
+        if self.analysis_cache:
+            stats = self.analysis_cache.get_stats()
+            self.logger.info(
+                f"Analysis cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+                f"{stats['misses']} misses ({stats['hit_ratio']:.0%} hit ratio)"
+            )
+        stats = self.change_trigger.get_stats()
+        self.logger.info(
+            f"Context changes: {stats['material_changes']} material changes in {stats['observed']} contexts, "
+            f"{stats['fired']} summary/link updates"
+        )
+        self.logger.info(f"API token usage:\n{usage_tracker.format_report()}")
+        self.logger.info(
+            f"API token usage of the session so far:\n"
+            f"{usage_tracker.format_report(get_session_store().usage_by_call_site())}"
+        )
+        if config.TRIAGE_ENABLED:
+            self.logger.info(f"Triage routing:\n{triage_router.format_report()}")
         self.logger.info("Context Retrieval Service stopped")
 
 
@@ -242,13 +993,24 @@ def signal_handler(signum, frame):
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Context Retrieval Service")
+    parser.add_argument("--replay", metavar="DIRECTORY",
+                        help="Replay a directory of recorded screenshots instead of capturing the screen")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Replay speed relative to the recording (0 = as fast as possible)")
+    args = parser.parse_args()
+    
     # Set up signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
     try:
+        import_summary_history(config.SUMMARY_HISTORY_FILE)
         service = ContextRetrievalService()
-        service.run()
+        if args.replay:
+            service.replay(args.replay, speed=args.speed)
+        else:
+            service.run()
     except Exception as e:
         logging.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
@@ -7,15 +7,20 @@ and analyzing them using Claude AI to extract contextual information.
 
 __version__ = "1.0.0"
 
-from context_retrieval.screenshot_capture import ScreenshotCapture
+from context_retrieval.screenshot_capture import ScreenshotCapture, create_backend
 from context_retrieval.claude_analyzer import ClaudeAnalyzer
 from context_retrieval.context_manager import ContextManager
+from context_retrieval.frame_gate import FrameGate
+from context_retrieval.capture_scheduler import AdaptiveScheduler
 from context_retrieval.ContextRetrievalService import ContextRetrievalService
 
 __all__ = [
     "ScreenshotCapture",
+    "create_backend",
     "ClaudeAnalyzer",
     "ContextManager",
+    "FrameGate",
+    "AdaptiveScheduler",
     "ContextRetrievalService",
 ]
 
@@ -0,0 +1,298 @@
+"""
+Analysis Cache Module
+
+This module stores extracted contexts keyed by a hash of the analyzed image and the
+prompt/model, so screens that were seen before (e.g. flipping back and forth between
+two tabs) are answered without an API call. Perceptual keys tolerate small changes such
+as a ticking clock; each entry keeps a small thumbnail signature of its screen, and a
+hit is only returned if the new screen's signature is within a distance of it, so two
+screens that happen to share a hash don't share a context.
+
+The on-disk layer keeps extracted screen content across runs, for up to max_age.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+from PIL import Image, ImageChops
+import logging
+
+
+# Size of the grayscale thumbnail signatures entries are verified with
+SIGNATURE_SIZE = (96, 54)
+
+# Minimum grayscale difference for a signature pixel to count as changed
+SIGNATURE_PIXEL_THRESHOLD = 24
+
+# First line of an on-disk entry, followed by the hex signature (empty for none)
+SIGNATURE_HEADER = "signature:"
+
+
+def image_signature(image: Image.Image) -> bytes:
+    """
+    Compute the thumbnail signature of an image.
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        Grayscale thumbnail pixels
+    """
+    return image.convert("L").resize(SIGNATURE_SIZE, Image.Resampling.BOX).tobytes()
+
+
+def signature_distance(signature_a: bytes, signature_b: bytes) -> float:
+    """
+    Compare two thumbnail signatures.
+
+    Args:
+        signature_a: First signature
+        signature_b: Second signature
+
+    Returns:
+        Fraction of thumbnail pixels that differ (1.0 if the signatures can't be compared)
+    """
+    if len(signature_a) != len(signature_b):
+        return 1.0
+    diff = ImageChops.difference(
+        Image.frombytes("L", SIGNATURE_SIZE, signature_a),
+        Image.frombytes("L", SIGNATURE_SIZE, signature_b)
+    )
+    changed = sum(diff.histogram()[SIGNATURE_PIXEL_THRESHOLD + 1:])
+    return changed / len(signature_a)
+
+
+class AnalysisCache:
+    """LRU memory cache backed by a size- and age-bounded on-disk cache"""
+
+    def __init__(self, max_entries: int = 128, cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = 50 * 1024 * 1024, max_age: Optional[float] = 24 * 3600,
+                 max_distance: float = 0.005):
+        """
+        Initialize analysis cache.
+
+        Args:
+            max_entries: Maximum number of contexts kept in memory
+            cache_dir: Directory for the on-disk cache (memory only if None)
+            max_disk_bytes: Maximum total size of the on-disk cache in bytes
+            max_age: Seconds after which an entry expires (None to never expire)
+            max_distance: Largest fraction of signature pixels that may differ for a hit
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+        self.max_distance = max_distance
+        self.logger = logging.getLogger(__name__)
+
+        # key -> (created timestamp, context, signature)
+        self._memory: OrderedDict[str, tuple[float, str, Optional[bytes]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+        # Running total of the on-disk cache size, recomputed on eviction
+        self._disk_bytes = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._evict_disk()
+            self.logger.info(f"Analysis cache directory: {self.cache_dir}")
+
+    @staticmethod
+    def make_key(image_key: bytes | str, prompt: str, model: str) -> str:
+        """
+        Build a cache key.
+
+        Args:
+            image_key: Encoded image bytes or a perceptual hash of the image
+            prompt: Prompt the image is analyzed with
+            model: Model the image is analyzed with
+
+        Returns:
+            Hex digest identifying the image/prompt/model combination
+        """
+        digest = hashlib.sha256()
+        for part in (model, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(image_key if isinstance(image_key, bytes) else image_key.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _is_expired(self, created: float) -> bool:
+        return self.max_age is not None and time.time() - created > self.max_age
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.xml")
+
+    def get(self, key: str, signature: Optional[bytes] = None) -> Optional[str]:
+        """
+        Look up a cached context.
+
+        Args:
+            key: Cache key from make_key
+            signature: Thumbnail signature of the image; an entry stored with a signature
+                is only returned if it is within max_distance of this one
+
+        Returns:
+            Cached context, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            from_disk = False
+            if entry is not None and self._is_expired(entry[0]):
+                del self._memory[key]
+                entry = None
+            if entry is None:
+                entry = self._read_disk(key)
+                from_disk = entry is not None
+
+            if entry is not None:
+                created, context, stored_signature = entry
+                if self._matches(stored_signature, signature):
+                    if from_disk:
+                        self._store_memory(key, time.time(), context, stored_signature)
+                        self.disk_hits += 1
+                    else:
+                        self._memory.move_to_end(key)
+                    self.hits += 1
+                    return context
+                self.rejected += 1
+                self.logger.debug("Analysis cache entry has the same key but a different screen, ignoring it")
+
+            self.misses += 1
+            return None
+
+    def _matches(self, stored: Optional[bytes], signature: Optional[bytes]) -> bool:
+        """Whether an entry's signature is close enough to the looked up one"""
+        if stored is None or signature is None:
+            return stored is None and signature is None
+        return signature_distance(stored, signature) <= self.max_distance
+
+    def put(self, key: str, context: str, signature: Optional[bytes] = None):
+        """
+        Store a context.
+
+        Args:
+            key: Cache key from make_key
+            context: Extracted context to store
+            signature: Thumbnail signature of the image, to verify hits with
+        """
+        with self._lock:
+            self._store_memory(key, time.time(), context, signature)
+            self._write_disk(key, context, signature)
+
+    def _store_memory(self, key: str, created: float, context: str, signature: Optional[bytes]):
+        self._memory[key] = (created, context, signature)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[tuple[float, str, Optional[bytes]]]:
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            created = os.path.getmtime(path)
+            if self._is_expired(created):
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                header = f.readline()
+                context = f.read()
+            # The access time orders LRU eviction on disk, the modification time is the entry's age
+            os.utime(path, (time.time(), created))
+            if not header.startswith(SIGNATURE_HEADER):
+                # Entries written before signatures were stored can't be verified
+                return None
+            signature = header[len(SIGNATURE_HEADER):].strip()
+            return created, context, bytes.fromhex(signature) if signature else None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Error reading analysis cache entry: {e}")
+            return None
+
+    def _write_disk(self, key: str, context: str, signature: Optional[bytes]):
+        if not self.cache_dir:
+            return
+
+        try:
+            path = self._disk_path(key)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(f"{SIGNATURE_HEADER}{signature.hex() if signature else ''}\n")
+                f.write(context)
+            os.replace(temp_path, path)
+            self._disk_bytes += os.path.getsize(path)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+        except Exception as e:
+            self.logger.error(f"Error writing analysis cache entry: {e}")
+
+    def _evict_disk(self):
+        """Remove expired entries, then least recently used ones until under the size limit"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".xml"):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self._is_expired(stat.st_mtime):
+                self._remove(path)
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        # Evict down to 90% of the limit so eviction doesn't run on every write
+        while entries and total > self.max_disk_bytes * 0.9:
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+        self._disk_bytes = total
+
+    def _remove(self, path: str):
+        """Remove a cache file that another process or eviction may have removed already"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Remove all entries from memory and disk"""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir:
+                for filename in os.listdir(self.cache_dir):
+                    if filename.endswith(".xml"):
+                        self._remove(os.path.join(self.cache_dir, filename))
+                self._disk_bytes = 0
+
+    def get_stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hit, disk hit, miss and rejected counts, the hit ratio and the
+            number of entries in memory
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,135 @@
+"""
+API Client Module
+
+This module provides the process-wide Anthropic clients shared by every API call site
+(analysis, summaries, links and the overlay explanations), so HTTP connections are kept
+alive and reused instead of paying TLS and client setup on every call.
+The SDK's own retries are disabled; retries are handled by the resilience module.
+Tests and benchmarks can inject fake clients with set_clients().
+"""
+
+import threading
+from typing import Optional
+import logging
+
+import httpx
+from anthropic import Anthropic, AsyncAnthropic, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+from context_retrieval import config
+
+
+_lock = threading.Lock()
+_client: Optional[Anthropic] = None
+_async_client: Optional[AsyncAnthropic] = None
+
+logger = logging.getLogger(__name__)
+
+
+def load_api_key() -> str:
+    """
+    Read the Anthropic API key from config.API_KEY_PATH.
+
+    Returns:
+        The API key
+    """
+    with open(config.API_KEY_PATH, 'r') as f:
+        return f.read().strip()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.API_POOL_SIZE,
+        max_keepalive_connections=config.API_POOL_SIZE,
+        keepalive_expiry=config.API_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.API_TIMEOUT, connect=config.API_CONNECT_TIMEOUT)
+
+
+def get_client(api_key: Optional[str] = None) -> Anthropic:
+    """
+    Get the shared Anthropic client, creating it on first use.
+
+    Args:
+        api_key: API key used if the client doesn't exist yet (read from
+            config.API_KEY_PATH if None)
+
+    Returns:
+        Shared Anthropic client
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            _client = Anthropic(
+                api_key=api_key or load_api_key(),
+                http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+                timeout=_timeout(),
+                max_retries=0,
+            )
+            logger.info(f"Anthropic client created (pool size: {config.API_POOL_SIZE})")
+        return _client
+
+
+def get_async_client(api_key: Optional[str] = None) -> AsyncAnthropic:
+    """
+    Get the shared async Anthropic client, creating it on first use.
+
+    The async client's connections belong to the event loop that first uses them, so
+    it should only be used from one event loop (the analysis runner's).
+
+    Args:
+        api_key: API key used if the client doesn't exist yet (read from
+            config.API_KEY_PATH if None)
+
+    Returns:
+        Shared AsyncAnthropic client
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncAnthropic(
+                api_key=api_key or load_api_key(),
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+                timeout=_timeout(),
+                max_retries=0,
+            )
+            logger.info(f"Async Anthropic client created (pool size: {config.API_POOL_SIZE})")
+        return _async_client
+
+
+def set_clients(client=None, async_client=None):
+    """
+    Replace the shared clients, e.g. with fakes for tests and benchmarks.
+
+    Args:
+        client: Object used in place of the Anthropic client (None to create a real
+            one on next use)
+        async_client: Object used in place of the AsyncAnthropic client (None to create
+            a real one on next use)
+    """
+    global _client, _async_client
+    with _lock:
+        _client = client
+        _async_client = async_client
+
+
+def close_clients():
+    """Close the shared sync client's connections and forget both clients"""
+    global _client, _async_client
+    with _lock:
+        if _client is not None and hasattr(_client, "close"):
+            _client.close()
+        # The async client can only be closed from its event loop, see close_async_client()
+        _client = None
+        _async_client = None
+
+
+async def close_async_client():
+    """Close the shared async client's connections and forget it (run on the event loop that used it)"""
+    global _async_client
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None and hasattr(client, "close"):
+        await client.close()
@@ -0,0 +1,132 @@
+"""
+API Usage Module
+
+This module builds prompt blocks marked for prompt caching and records the token usage
+(including cache reads and writes) reported by Claude API responses. Recorded usage can
+also be handed to a sink, e.g. the session store, to keep it beyond the process.
+"""
+
+import threading
+from typing import Callable, Optional
+import logging
+
+
+def cacheable_text_block(text: str) -> dict:
+    """
+    Build a text content block marked as a prompt caching breakpoint.
+
+    Everything up to and including this block (tool schemas first, then the system
+    prompt) is cached by the API and read back at a fraction of the cost on the next
+    call with the same prefix, so static instructions must come before any content that
+    changes between calls. Prefixes shorter than the model's minimum cacheable length
+    (1024 tokens for Sonnet) are not cached, so only mark prefixes that reach it.
+
+    Args:
+        text: Static text
+
+    Returns:
+        Text content block with cache_control set
+    """
+    return {
+        "type": "text",
+        "text": text,
+        "cache_control": {"type": "ephemeral"},
+    }
+
+
+class UsageTracker:
+    """Accumulates token usage per API call site"""
+
+    FIELDS = (
+        "input_tokens",
+        "output_tokens",
+        "cache_creation_input_tokens",
+        "cache_read_input_tokens",
+    )
+
+    def __init__(self):
+        """Initialize an empty usage tracker"""
+        self._lock = threading.Lock()
+        self._usage: dict[str, dict[str, int]] = {}
+        self._sink: Optional[Callable[[str, dict], None]] = None
+        self.logger = logging.getLogger(__name__)
+
+    def set_sink(self, sink: Optional[Callable[[str, dict], None]]):
+        """
+        Set the callback every recorded call's usage is also handed to.
+
+        Args:
+            sink: Called with the call site and the call's token counts (None to remove)
+        """
+        self._sink = sink
+
+    def record(self, call_site: str, usage) -> dict:
+        """
+        Record the usage of one API response.
+
+        Args:
+            call_site: Name of the code path that made the call (e.g. "analysis")
+            usage: The response's usage object
+
+        Returns:
+            Dictionary with the token counts of this call
+        """
+        counts = {field: getattr(usage, field, None) or 0 for field in self.FIELDS}
+
+        with self._lock:
+            totals = self._usage.setdefault(call_site, dict.fromkeys(("calls",) + self.FIELDS, 0))
+            totals["calls"] += 1
+            for field, value in counts.items():
+                totals[field] += value
+
+        self.logger.debug(
+            f"{call_site} usage: {counts['input_tokens']} input, {counts['output_tokens']} output, "
+            f"{counts['cache_read_input_tokens']} cache read, "
+            f"{counts['cache_creation_input_tokens']} cache write tokens"
+        )
+        if self._sink is not None:
+            try:
+                self._sink(call_site, counts)
+            except Exception as e:
+                self.logger.error(f"Error handing {call_site} usage to the sink: {e}")
+        return counts
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        """
+        Get accumulated usage.
+
+        Returns:
+            Dictionary mapping each call site to its call count and token totals
+        """
+        with self._lock:
+            return {call_site: dict(totals) for call_site, totals in self._usage.items()}
+
+    def reset(self):
+        """Forget all recorded usage"""
+        with self._lock:
+            self._usage.clear()
+
+    def format_report(self, stats: Optional[dict[str, dict[str, int]]] = None) -> str:
+        """
+        Format the accumulated usage as a text table.
+
+        Args:
+            stats: Usage to format in the form of get_stats() (the accumulated usage if None)
+
+        Returns:
+            Table with one row per call site
+        """
+        lines = [
+            f"{'Call site':<20}{'Calls':>7}{'Input':>10}{'Output':>10}{'Cache read':>12}{'Cache write':>13}",
+            "-" * 72,
+        ]
+        for call_site, totals in (self.get_stats() if stats is None else stats).items():
+            lines.append(
+                f"{call_site:<20}{totals['calls']:>7}{totals['input_tokens']:>10}{totals['output_tokens']:>10}"
+                f"{totals['cache_read_input_tokens']:>12}{totals['cache_creation_input_tokens']:>13}"
+            )
+        return "\n".join(lines)
+
+
+# Global usage tracker shared by all API call sites
+usage_tracker = UsageTracker()
@@ -0,0 +1,255 @@
+"""
+Benchmark script for the context retrieval pipeline.
+
+Run this script from the project root directory:
+python -m context_retrieval.benchmark encoding context_retrieval/screenshots
+python -m context_retrieval.benchmark capture --backend synthetic --frames 50
+python -m context_retrieval.benchmark combined path/to/contexts --rounds 3
+python -m context_retrieval.benchmark archive context_retrieval/screenshots
+"""
+
+import os
+import sys
+import io
+import random
+import argparse
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_retrieval import config
+from context_retrieval import insights_generation
+from context_retrieval.api_usage import usage_tracker
+from context_retrieval.image_encoding import ImageEncoder
+from context_retrieval.screenshot_capture import create_backend
+from context_retrieval.screenshot_archive import ScreenshotArchive, ScreenshotArchiveWriter
+
+
+# Encoding strategies compared by the encoding benchmark
+ENCODING_STRATEGIES = {
+    "png-native": dict(format="PNG"),
+    "png-budget": dict(format="PNG", token_budget=1600),
+    "jpeg-budget": dict(format="JPEG", token_budget=1600, quality=85),
+    "jpeg-gray-budget": dict(format="JPEG", token_budget=1600, quality=85, grayscale=True),
+    "webp-budget": dict(format="WEBP", token_budget=1600, quality=85),
+    "webp-gray-budget": dict(format="WEBP", token_budget=1600, quality=85, grayscale=True),
+}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+# Summary/link request paths compared by the combined benchmark
+INSIGHT_PATHS = {
+    "two-call": lambda objective, context: (
+        insights_generation.update_summary_history(objective, context),
+        insights_generation.generate_links(objective, context),
+    ),
+    "combined": insights_generation.update_summary_and_links,
+}
+
+
+def load_images(directory: str) -> list[Image.Image]:
+    """Load all images in a directory sorted by filename, or all frames of its screenshot archive"""
+    archive = ScreenshotArchive(directory)
+    if len(archive):
+        return [frame for _, frame in archive.frames()]
+    filenames = sorted(f for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for filename in filenames:
+        with Image.open(os.path.join(directory, filename)) as image:
+            images.append(image.convert("RGB"))
+    return images
+
+
+def benchmark_encoding(args):
+    """Report size, encode time and estimated tokens for each encoding strategy"""
+    images = load_images(args.directory)
+    if not images:
+        print(f"No images found in {args.directory}")
+        return
+
+    print(f"Encoding {len(images)} images from {args.directory}\n")
+    print(f"{'Strategy':<20}{'Avg KB':>10}{'Avg ms':>10}{'Avg tokens':>12}{'Resolution':>14}")
+    print("-" * 66)
+
+    for name, options in ENCODING_STRATEGIES.items():
+        encoder = ImageEncoder(**options)
+        results = [encoder.encode(image) for image in images]
+
+        avg_kb = statistics.mean(len(r.data) for r in results) / 1024
+        avg_ms = statistics.mean(r.encode_seconds for r in results) * 1000
+        avg_tokens = statistics.mean(r.estimated_tokens for r in results)
+        resolution = f"{results[0].width}x{results[0].height}"
+        print(f"{name:<20}{avg_kb:>10.1f}{avg_ms:>10.1f}{avg_tokens:>12.0f}{resolution:>14}")
+
+
+def benchmark_capture(args):
+    """Report grab time per frame for a capture backend"""
+    if args.frames < 1:
+        print("--frames must be at least 1")
+        return
+    backend = create_backend(args.backend, monitor=args.monitor, replay_dir=args.replay_dir)
+
+    timings = []
+    try:
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            frame = backend.grab()
+            timings.append(time.perf_counter() - start)
+    finally:
+        backend.close()
+
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95 = timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))]
+    print(f"Backend: {backend.name} ({frame.width}x{frame.height}, {len(timings_ms)} frames)")
+    print(f"Mean: {statistics.mean(timings_ms):.1f} ms  Median: {statistics.median(timings_ms):.1f} ms  "
+          f"P95: {p95:.1f} ms  Max: {timings_ms[-1]:.1f} ms")
+
+
+def benchmark_archive(args):
+    """Compare size, write and read time of a screenshot archive with one PNG per frame"""
+    images = load_images(args.directory)
+    if not images:
+        print(f"No images found in {args.directory}")
+        return
+
+    png_bytes = 0
+    png_seconds = 0.0
+    for image in images:
+        start = time.perf_counter()
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        png_seconds += time.perf_counter() - start
+        png_bytes += len(buffer.getvalue())
+
+    with tempfile.TemporaryDirectory() as archive_dir:
+        writer = ScreenshotArchiveWriter(archive_dir, keyframe_interval=args.keyframe_interval)
+        start = time.perf_counter()
+        for index, image in enumerate(images):
+            writer.append(image, float(index))
+        writer.close()
+        write_seconds = time.perf_counter() - start
+
+        archive = ScreenshotArchive(archive_dir)
+        start = time.perf_counter()
+        for _ in archive.frames():
+            pass
+        sequential_seconds = time.perf_counter() - start
+
+        # Random access starts from the nearest keyframe every time
+        positions = [random.randrange(len(archive)) for _ in range(min(len(archive), 20))]
+        random_ms = []
+        for position in positions:
+            archive = ScreenshotArchive(archive_dir)
+            start = time.perf_counter()
+            archive.read(position)
+            random_ms.append((time.perf_counter() - start) * 1000)
+
+    count = len(images)
+    print(f"{count} frames ({writer.keyframes} keyframes, {writer.deltas} deltas)\n")
+    print(f"{'Format':<10}{'Total MB':>10}{'Avg KB':>10}{'Write ms':>10}")
+    print("-" * 40)
+    print(f"{'png':<10}{png_bytes / 1024 ** 2:>10.1f}{png_bytes / count / 1024:>10.1f}"
+          f"{png_seconds / count * 1000:>10.1f}")
+    print(f"{'archive':<10}{writer.bytes_written / 1024 ** 2:>10.1f}{writer.bytes_written / count / 1024:>10.1f}"
+          f"{write_seconds / count * 1000:>10.1f}")
+    print(f"\nSequential read: {count / sequential_seconds:.1f} frames/s  "
+          f"Random read: {statistics.mean(random_ms):.1f} ms mean, {max(random_ms):.1f} ms max")
+
+
+def load_contexts(path: str) -> list[str]:
+    """Load XML contexts from a file, or from all .xml/.txt files in a directory sorted by filename"""
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith((".xml", ".txt"))]
+    contexts = []
+    for context_path in paths:
+        with open(context_path, "r", encoding="utf-8") as f:
+            contexts.append(f.read().strip())
+    return [context for context in contexts if context]
+
+
+def benchmark_combined(args):
+    """Compare latency and token use of the two-call and combined summary/link paths"""
+    contexts = load_contexts(args.contexts)
+    if not contexts:
+        print(f"No contexts found in {args.contexts}")
+        return
+
+    # Both paths must make the same decisions, so the triage is bypassed
+    config.TRIAGE_ENABLED = False
+
+    rows = []
+    for name, update in INSIGHT_PATHS.items():
+        usage_tracker.reset()
+        timings_ms = []
+        for _ in range(args.rounds):
+            # Every round starts a new session: no summary history, no visited urls
+            insights_generation.visited_urls.clear()
+            with tempfile.TemporaryDirectory() as session_dir:
+                config.SESSION_STORE_FILE = os.path.join(session_dir, "session_store.db")
+                for context in contexts:
+                    start = time.perf_counter()
+                    update(args.objective, context)
+                    timings_ms.append((time.perf_counter() - start) * 1000)
+                insights_generation.get_session_store().close()
+
+        totals = dict.fromkeys(("calls", "input_tokens", "output_tokens", "cache_read_input_tokens"), 0)
+        for call_site in usage_tracker.get_stats().values():
+            for field in totals:
+                totals[field] += call_site[field]
+        timings_ms.sort()
+        p95 = timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))]
+        rows.append((name, totals, statistics.mean(timings_ms), p95))
+
+    print(f"\n{len(contexts)} contexts x {args.rounds} rounds per path\n")
+    print(f"{'Path':<12}{'Calls':>7}{'Mean ms':>10}{'P95 ms':>10}{'Input':>10}{'Output':>10}{'Cache read':>12}")
+    print("-" * 71)
+    for name, totals, mean_ms, p95 in rows:
+        print(f"{name:<12}{totals['calls']:>7}{mean_ms:>10.0f}{p95:>10.0f}"
+              f"{totals['input_tokens']:>10}{totals['output_tokens']:>10}{totals['cache_read_input_tokens']:>12}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the context retrieval pipeline")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    encoding_parser = subparsers.add_parser("encoding", help="Compare image encoding strategies")
+    encoding_parser.add_argument("directory", help="Directory of sample screenshots")
+    encoding_parser.set_defaults(func=benchmark_encoding)
+
+    capture_parser = subparsers.add_parser("capture", help="Measure screen capture cost")
+    capture_parser.add_argument("--backend", default="auto",
+                                help="Capture backend (auto, mss, pyautogui, replay, synthetic)")
+    capture_parser.add_argument("--frames", type=int, default=30, help="Number of frames to grab")
+    capture_parser.add_argument("--monitor", type=int, default=1, help="Monitor index for mss")
+    capture_parser.add_argument("--replay-dir", help="Directory of frames for the replay backend")
+    capture_parser.set_defaults(func=benchmark_capture)
+
+    combined_parser = subparsers.add_parser("combined",
+                                            help="Compare the two-call and combined summary/link paths")
+    combined_parser.add_argument("contexts", help="XML context file, or directory of context files")
+    combined_parser.add_argument("--rounds", type=int, default=3, help="Sessions to run per path")
+    combined_parser.add_argument("--objective", default=os.getenv("LEARNING_OBJECTIVE", "Learn about the topic on screen"),
+                                 help="Learning objective (defaults to LEARNING_OBJECTIVE)")
+    combined_parser.set_defaults(func=benchmark_combined)
+
+    archive_parser = subparsers.add_parser("archive",
+                                           help="Compare the screenshot archive with one PNG per frame")
+    archive_parser.add_argument("directory", help="Directory of sample screenshots or a screenshot archive")
+    archive_parser.add_argument("--keyframe-interval", type=int, default=config.SCREENSHOT_ARCHIVE_KEYFRAME_INTERVAL,
+                                help="Frames between two keyframes")
+    archive_parser.set_defaults(func=benchmark_archive)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Capture Scheduler Module
+
+This module decides when the next screenshot is taken. The interval shrinks while the
+screen is changing and backs off exponentially while it is static, faster if the user
+is idle as well. A changed screen never backs off, whatever the input activity.
+Deadlines are kept on the monotonic clock so time spent on analysis counts towards
+the interval instead of being added to it.
+"""
+
+import time
+import threading
+from collections import deque
+import logging
+
+
+class AdaptiveScheduler:
+    """Schedules screenshot captures with an adaptive, drift-free interval"""
+
+    def __init__(self, base_interval: float, min_interval: float, max_interval: float,
+                 speedup_factor: float = 0.5, backoff_factor: float = 2.0,
+                 rate_window: int = 10):
+        """
+        Initialize scheduler.
+
+        Args:
+            base_interval: Interval in seconds to start with and to return to after a
+                static period ends
+            min_interval: Shortest allowed interval in seconds
+            max_interval: Longest allowed interval in seconds
+            speedup_factor: Factor applied to the interval while the screen is changing
+            backoff_factor: Factor applied to the interval while the screen is static
+                (applied twice while the user is idle as well)
+            rate_window: Number of recent captures used to measure the effective rate
+        """
+        self.base_interval = min(max(base_interval, min_interval), max_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup_factor = speedup_factor
+        self.backoff_factor = backoff_factor
+        self.logger = logging.getLogger(__name__)
+
+        self.interval = self.base_interval
+        self.next_deadline = None
+        self.last_tick = None
+        self.tick_times = deque(maxlen=rate_window)
+        self._stop_event = threading.Event()
+
+    def wait(self) -> bool:
+        """
+        Block until the next capture is due.
+
+        Returns:
+            True when a capture is due, False if the scheduler was stopped while waiting
+        """
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now + self.interval
+
+        if self._stop_event.wait(max(0.0, self.next_deadline - now)):
+            return False
+
+        self.last_tick = time.monotonic()
+        self.tick_times.append(self.last_tick)
+        return True
+
+    def record_activity(self, changed: bool, idle: bool = False):
+        """
+        Adapt the interval to the last capture and schedule the next one.
+
+        Args:
+            changed: Whether the screen changed since the last analyzed frame
+            idle: Whether the user was idle since the last capture; only speeds up the
+                backoff of a static screen, since reading and scrolling don't move the cursor
+        """
+        if changed:
+            # Coming out of a static period, start from the base interval again
+            self.interval = max(self.min_interval, min(self.interval, self.base_interval) * self.speedup_factor)
+        else:
+            backoff = self.backoff_factor ** 2 if idle else self.backoff_factor
+            self.interval = min(self.max_interval, self.interval * backoff)
+
+        # Measure the next deadline from the start of this capture, so slow analysis
+        # shortens the wait instead of delaying every following capture
+        now = time.monotonic()
+        start = self.last_tick if self.last_tick is not None else now
+        self.next_deadline = max(now, start + self.interval)
+
+        self.logger.debug(
+            f"Screen {'changed' if changed else 'static'}{' (user idle)' if idle else ''}, "
+            f"next capture in {self.next_deadline - now:.1f} seconds"
+        )
+
+    def defer(self, seconds: float):
+        """
+        Postpone the next capture, e.g. while the API is unavailable.
+
+        Args:
+            seconds: Minimum number of seconds from now until the next capture
+        """
+        self.next_deadline = max(self.next_deadline or 0.0, time.monotonic() + seconds)
+
+    def stop(self):
+        """Wake up a pending wait and stop scheduling"""
+        self._stop_event.set()
+
+    @property
+    def current_interval(self) -> float:
+        """Current target interval between captures in seconds"""
+        return self.interval
+
+    @property
+    def effective_rate(self) -> float:
+        """Measured capture rate over the recent window, in captures per minute"""
+        if len(self.tick_times) < 2:
+            return 60.0 / self.interval
+        elapsed = self.tick_times[-1] - self.tick_times[0]
+        if elapsed <= 0:
+            return 0.0
+        return (len(self.tick_times) - 1) * 60.0 / elapsed
+
+    def get_stats(self) -> dict:
+        """
+        Get scheduler statistics.
+
+        Returns:
+            Dictionary with the interval bounds, current interval and effective rate
+        """
+        return {
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "current_interval": self.current_interval,
+            "effective_rate": self.effective_rate,
+        }
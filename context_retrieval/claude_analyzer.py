@@ -2,20 +2,62 @@
 Claude Analyzer Module
 
 This module handles sending screenshots to Claude API for analysis and context extraction.
+AsyncClaudeAnalyzer does the same on an asyncio event loop, so analyses don't block the
+service thread. In delta mode the model is given the previous tabs and only returns the tabs that were added, removed or
+modified, which are merged into the previous context locally. Results are returned as
+Context objects, so the tabs are parsed once and not re-read from XML by every consumer.
 """
 
-import base64
-import io
+import asyncio
+import concurrent.futures
+import threading
+from dataclasses import dataclass
 from typing import Optional
 from PIL import Image
 import logging
-from anthropic import Anthropic
+
+from context_retrieval.api_client import get_client, get_async_client, close_async_client
+from context_retrieval.image_encoding import ImageEncoder, EncodedImage
+from context_retrieval.analysis_cache import AnalysisCache, image_signature
+from context_retrieval.frame_gate import FrameGate
+from context_retrieval.api_usage import cacheable_text_block, usage_tracker
+from context_retrieval.context_model import (
+    Tab, Context, RECORD_TABS_TOOL, RECORD_TAB_CHANGES_TOOL,
+    tabs_from_tool_input, format_tab_listing, apply_tab_changes
+)
+from context_retrieval.resilience import call_with_retry, call_with_retry_async, EmptyResponseError
+
+
+# Instruction sent with a full screenshot; the analysis prompt itself is the cached system prompt
+FULL_SCREEN_INSTRUCTION = "Analyze this screenshot."
+
+# What the image shows, filled into the delta prompt
+FULL_SCREEN_DESCRIPTION = "the whole screen"
+REGION_DESCRIPTION = (
+    "only the region of the screen that changed since the last analysis: x={x}, y={y}, "
+    "{width}x{height} pixels of a {screen_width}x{screen_height} screen. "
+    "Everything outside this region is unchanged"
+)
+
+
+@dataclass
+class PreparedAnalysis:
+    """An encoded image with its prompt and cache lookup, ready to be sent to the API"""
+    encoded: Optional[EncodedImage]  # None if the screen was answered from the cache
+    prompt: str
+    previous_tabs: Optional[tuple[Tab, ...]]
+    cache_key: Optional[str]
+    cache_signature: Optional[bytes]
+    cached: Optional[Context]
 
 
 class ClaudeAnalyzer:
     """Handles Claude API interactions for image analysis"""
     
-    def __init__(self, api_key: str, model: str, max_tokens: int, prompt: str):
+    def __init__(self, api_key: str, model: str, max_tokens: int, prompt: str,
+                 region_prompt: Optional[str] = None, encoder: Optional[ImageEncoder] = None,
+                 cache: Optional[AnalysisCache] = None, cache_key_mode: str = "perceptual",
+                 delta_prompt: Optional[str] = None):
         """
         Initialize Claude analyzer.
         
@@ -23,82 +65,530 @@ class ClaudeAnalyzer:
             api_key: Anthropic API key
             model: Claude model to use
             max_tokens: Maximum tokens for API response
-            prompt: Prompt template for analysis
+            prompt: Static analysis instructions, sent as a cached system prompt
+            region_prompt: Prompt template for analyzing a changed region of the screen
+                together with the previous context
+            encoder: Image encoder used to prepare screenshots (lossless PNG at native
+                resolution if None)
+            cache: Cache of previous analyses to answer repeated screens from
+            cache_key_mode: "exact" to key the cache on the screen's pixels, or
+                "perceptual" to key it on a perceptual hash of the screen (hits are checked
+                against a thumbnail signature)
+            delta_prompt: Prompt template for delta extraction against the previous
+                context (full extraction every time if None)
         """
-        self.client = Anthropic(api_key=api_key)
+        self.client = get_client(api_key)
         self.model = model
         self.max_tokens = max_tokens
         self.prompt = prompt
+        self.region_prompt = region_prompt
+        self.encoder = encoder or ImageEncoder()
+        self.cache = cache
+        self.cache_key_mode = cache_key_mode
+        self.delta_prompt = delta_prompt
+        # Fine-grained perceptual hash, only used for perceptual cache keys
+        self._hasher = FrameGate(hash_size=16)
         self.logger = logging.getLogger(__name__)
         
         self.logger.info(f"Claude analyzer initialized with model: {model}")
     
-    def _image_to_base64(self, image: Image.Image, format: str = "PNG") -> str:
+    def analyze_screenshot(self, screenshot: Image.Image,
+                           previous_context: Optional[Context] = None) -> Optional[Context]:
         """
-        Convert PIL Image to base64 string.
+        Analyze a screenshot using Claude API.
         
         Args:
-            image: PIL Image object
-            format: Image format (PNG, JPEG, etc.)
+            screenshot: PIL Image object to analyze
+            previous_context: Context of the previous frame, used for delta
+                extraction if a delta prompt is configured
             
         Returns:
-            Base64 encoded image string
+            Extracted context, or None if error
         """
-        buffered = io.BytesIO()
-        image.save(buffered, format=format)
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+        return self._analyze(*self._screenshot_request(screenshot, previous_context))
     
-    def analyze_screenshot(self, screenshot: Image.Image) -> Optional[str]:
+    def analyze_region(self, screenshot: Image.Image, box: tuple[int, int, int, int],
+                       previous_context: Context) -> Optional[Context]:
         """
-        Analyze a screenshot using Claude API.
+        Analyze only the changed region of the screen using Claude API.
+        
+        The model receives the crop and the previous context and returns the
+        updated context for the whole screen.
         
         Args:
-            screenshot: PIL Image object to analyze
+            screenshot: PIL Image of the whole screen (only the region is sent)
+            box: Region bounding box (left, top, right, bottom) in screen coordinates
+            previous_context: Context extracted from the previous frame
+            
+        Returns:
+            Updated context, or None if error
+        """
+        return self._analyze(*self._region_request(screenshot, box, previous_context))
+    
+    def _screenshot_request(self, screenshot: Image.Image, previous_context: Optional[Context]):
+        """Choose the screen, image, prompt and previous tabs for analyzing a full screenshot"""
+        if self.delta_prompt and previous_context:
+            previous_tabs = previous_context.tabs
+            prompt = self._format_delta_prompt(FULL_SCREEN_DESCRIPTION, previous_tabs)
+            return screenshot, screenshot, prompt, previous_tabs
+        return screenshot, screenshot, FULL_SCREEN_INSTRUCTION, None
+    
+    def _region_request(self, screenshot: Image.Image, box: tuple[int, int, int, int],
+                        previous_context: Context):
+        """Choose the screen, image, prompt and previous tabs for analyzing a changed region"""
+        region_image = screenshot.crop(box)
+        if self.delta_prompt:
+            previous_tabs = previous_context.tabs
+            description = REGION_DESCRIPTION.format(**self._region_fields(box, screenshot.size))
+            return screenshot, region_image, self._format_delta_prompt(description, previous_tabs), previous_tabs
+        prompt = self._format_region_prompt(box, screenshot.size, previous_context)
+        return screenshot, region_image, prompt, None
+    
+    @staticmethod
+    def _region_fields(box: tuple[int, int, int, int], screen_size: tuple[int, int]) -> dict:
+        left, top, right, bottom = box
+        return dict(
+            x=left,
+            y=top,
+            width=right - left,
+            height=bottom - top,
+            screen_width=screen_size[0],
+            screen_height=screen_size[1],
+        )
+    
+    def _format_region_prompt(self, box: tuple[int, int, int, int],
+                              screen_size: tuple[int, int], previous_context: Context) -> str:
+        """Fill in the region prompt template for a changed region"""
+        if not self.region_prompt:
+            raise ValueError("No region prompt configured for region analysis")
+        
+        return self.region_prompt.format(
+            previous_context=previous_context.xml,
+            **self._region_fields(box, screen_size)
+        )
+    
+    def _format_delta_prompt(self, image_description: str, previous_tabs: tuple[Tab, ...]) -> str:
+        """Fill in the delta prompt template with the numbered previous tabs"""
+        return self.delta_prompt.format(
+            image_description=image_description,
+            previous_tabs=format_tab_listing(previous_tabs),
+        )
+    
+    def _encode(self, image: Image.Image) -> EncodedImage:
+        """Encode an image within the token budget"""
+        encoded = self.encoder.encode(image)
+        self.logger.debug(
+            f"Encoded {image.width}x{image.height} image as {encoded.media_type} "
+            f"{encoded.width}x{encoded.height}: {len(encoded.data)} bytes, "
+            f"~{encoded.estimated_tokens} tokens, {encoded.encode_seconds * 1000:.0f} ms"
+        )
+        return encoded
+    
+    def _cache_key(self, screen: Image.Image) -> tuple[Optional[str], Optional[bytes]]:
+        """
+        Build the analysis cache key and signature for a screen (None if caching is disabled).
+        
+        The key only depends on the whole screen, the analysis prompt and the model, not on
+        the per-call prompt: that embeds the previous tabs in delta mode and the changed
+        region in region mode, so a revisited screen would never match. The cached value
+        is the complete context of the screen, never a delta.
+        """
+        if not self.cache:
+            return None, None
+        signature = None
+        if self.cache_key_mode == "perceptual":
+            image_key = f"{self._hasher.compute_hash(screen):064x}"
+            signature = image_signature(screen)
+        else:
+            image_key = f"{screen.mode}:{screen.width}x{screen.height}:".encode("ascii") + screen.tobytes()
+        return self.cache.make_key(image_key, self.prompt, self.model), signature
+    
+    def _cached_response(self, cache_key: Optional[str], signature: Optional[bytes]) -> Optional[Context]:
+        """Look up a previous analysis in the cache (stored as XML, parsed once here)"""
+        if cache_key is None:
+            return None
+        response = self.cache.get(cache_key, signature)
+        if response is None:
+            return None
+        stats = self.cache.get_stats()
+        self.logger.info(
+            f"Analysis cache hit, skipping API call "
+            f"({stats['hits']} hits, {stats['misses']} misses)"
+        )
+        return Context.from_xml(response)
+    
+    def _build_request(self, encoded: EncodedImage, prompt: str, delta: bool = False) -> dict:
+        """
+        Build the Messages API request for an encoded image.
+        
+        The static analysis prompt goes first as a cached system prompt, followed by
+        the image and the per-call instruction. The model is forced to answer with a
+        record_tabs (or, for delta extraction, record_tab_changes) tool call, so the
+        tabs arrive as schema-checked JSON. Both tools are always declared so the
+        cached prefix is the same for full and delta requests. The tool schemas, the
+        tool use instructions the API adds and the system prompt together are longer
+        than the minimum cacheable prefix, which the system prompt alone is not.
+        
+        Args:
+            encoded: Encoded image
+            prompt: Text prompt sent along with the image
+            delta: Whether to ask for the changes since the previous context only
             
         Returns:
-            XML string containing analysis results, or None if error
+            Keyword arguments for messages.create
+        """
+        tool = RECORD_TAB_CHANGES_TOOL if delta else RECORD_TABS_TOOL
+        return dict(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            tools=[RECORD_TABS_TOOL, RECORD_TAB_CHANGES_TOOL],
+            tool_choice={"type": "tool", "name": tool["name"]},
+            system=[cacheable_text_block(self.prompt)],
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": encoded.media_type,
+                                "data": encoded.to_base64(),
+                            },
+                        },
+                        {
+                            "type": "text",
+                            "text": prompt
+                        }
+                    ],
+                }
+            ],
+        )
+    
+    def _request(self, request: dict, previous_tabs: Optional[tuple[Tab, ...]] = None) -> Context:
+        """Send a request with the sync client"""
+        message = self.client.messages.create(**request)
+        if previous_tabs is not None:
+            return self._merge_changes(message, previous_tabs)
+        return self._parse_response(message)
+    
+    def _parse_response(self, message) -> Context:
+        """
+        Extract the tabs from a Messages API response's record_tabs call.
+        
+        Returns:
+            Context of the recorded tabs
+        
+        Raises:
+            EmptyResponseError: If the response has no record_tabs call, so the request is retried
+        """
+        usage_tracker.record("analysis", message.usage)
+        tool_input = next((block.input for block in message.content
+                           if block.type == "tool_use" and block.name == RECORD_TABS_TOOL["name"]), None)
+        if tool_input is None:
+            raise EmptyResponseError("No record_tabs call in analysis response")
+        context = Context(tabs_from_tool_input(tool_input))
+        self.logger.info(f"Successfully received analysis of {len(context)} tabs from Claude API")
+        return context
+    
+    def _merge_changes(self, message, previous_tabs: tuple[Tab, ...]) -> Context:
+        """
+        Merge a response's record_tab_changes call into the previous tabs.
+        
+        Returns:
+            Context of the merged tabs
+        
+        Raises:
+            EmptyResponseError: If the response has no record_tab_changes call
+        """
+        usage_tracker.record("analysis", message.usage)
+        changes = next((block.input for block in message.content
+                        if block.type == "tool_use" and block.name == RECORD_TAB_CHANGES_TOOL["name"]), None)
+        if changes is None:
+            raise EmptyResponseError("No record_tab_changes call in analysis response")
+        tabs = apply_tab_changes(previous_tabs, changes)
+        self.logger.info(
+            f"Successfully received tab changes from Claude API: {len(changes.get('added') or [])} added, "
+            f"{len(changes.get('removed') or [])} removed, {len(changes.get('modified') or [])} modified"
+        )
+        return Context(tabs)
+    
+    def _analyze(self, screen: Image.Image, image: Image.Image, prompt: str,
+                 previous_tabs: Optional[tuple[Tab, ...]] = None) -> Optional[Context]:
+        """
+        Send an image and prompt to Claude API.
+        
+        Args:
+            screen: PIL Image of the whole screen, used for the cache lookup
+            image: PIL Image object to analyze
+            prompt: Text prompt sent along with the image
+            previous_tabs: Tabs the response's changes are merged into (full
+                extraction if None)
+            
+        Returns:
+            Extracted context, or None if error
         """
         try:
-            # Convert image to base64
-            self.logger.debug("Converting screenshot to base64...")
-            image_b64 = self._image_to_base64(screenshot)
+            prepared = self._prepare(screen, image, prompt, previous_tabs)
+        except Exception as e:
+            self.logger.error(f"Error preparing screenshot for analysis: {e}")
+            return None
+        return self.analyze_prepared(prepared)
+    
+    def prepare_screenshot(self, screenshot: Image.Image,
+                           previous_context: Optional[Context] = None) -> PreparedAnalysis:
+        """
+        Encode a screenshot and look it up in the cache, without calling the API.
+        
+        Args:
+            screenshot: PIL Image object to analyze
+            previous_context: Context of the previous frame, used for delta
+                extraction if a delta prompt is configured
             
-            self.logger.info("Sending screenshot to Claude API for analysis...")
+        Returns:
+            Prepared analysis for analyze_prepared
+        """
+        return self._prepare(*self._screenshot_request(screenshot, previous_context))
+    
+    def prepare_region(self, screenshot: Image.Image, box: tuple[int, int, int, int],
+                       previous_context: Context) -> PreparedAnalysis:
+        """
+        Encode a changed region and look the screen up in the cache, without calling the API.
+        
+        Args:
+            screenshot: PIL Image of the whole screen (only the region is sent)
+            box: Region bounding box (left, top, right, bottom) in screen coordinates
+            previous_context: Context extracted from the previous frame
             
-            # Create message with image
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/png",
-                                    "data": image_b64,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": self.prompt
-                            }
-                        ],
-                    }
-                ],
-            )
+        Returns:
+            Prepared analysis for analyze_prepared
+        """
+        return self._prepare(*self._region_request(screenshot, box, previous_context))
+    
+    def _prepare(self, screen: Image.Image, image: Image.Image, prompt: str,
+                 previous_tabs: Optional[tuple[Tab, ...]] = None) -> PreparedAnalysis:
+        """Look up the screen's analysis in the cache, and encode the image if it isn't cached"""
+        cache_key, signature = self._cache_key(screen)
+        cached = self._cached_response(cache_key, signature)
+        return PreparedAnalysis(
+            encoded=self._encode(image) if cached is None else None,
+            prompt=prompt,
+            previous_tabs=previous_tabs,
+            cache_key=cache_key,
+            cache_signature=signature,
+            cached=cached,
+        )
+    
+    def analyze_prepared(self, prepared: PreparedAnalysis) -> Optional[Context]:
+        """
+        Analyze a prepared image using Claude API (or answer it from the cache).
+        
+        Args:
+            prepared: Result of prepare_screenshot or prepare_region
             
-            # Extract response text
-            response = message.content[0].text
-            self.logger.info("Successfully received analysis from Claude API")
-            self.logger.debug(f"Response length: {len(response)} characters")
+        Returns:
+            Extracted context, or None if error
+        """
+        if prepared.cached is not None:
+            return prepared.cached
+        
+        try:
+            encoded = prepared.encoded
+            self.logger.info(f"Sending {encoded.width}x{encoded.height} image to Claude API for analysis...")
+            request = self._build_request(encoded, prepared.prompt, delta=prepared.previous_tabs is not None)
+            response = call_with_retry(self._request, request, prepared.previous_tabs, call_site="analysis")
             
+            # The response is the complete context (deltas are already merged)
+            if prepared.cache_key is not None:
+                self.cache.put(prepared.cache_key, response.xml, prepared.cache_signature)
             return response
             
         except Exception as e:
             self.logger.error(f"Error analyzing screenshot with Claude API: {e}")
             return None
 
+
+class AsyncClaudeAnalyzer(ClaudeAnalyzer):
+    """Analyzes images with the async Claude API client, with a bound on in-flight requests"""
+    
+    def __init__(self, api_key: str, model: str, max_tokens: int, prompt: str,
+                 region_prompt: Optional[str] = None, encoder: Optional[ImageEncoder] = None,
+                 cache: Optional[AnalysisCache] = None, cache_key_mode: str = "perceptual",
+                 delta_prompt: Optional[str] = None, max_in_flight: int = 2, deadline: Optional[float] = 30.0):
+        """
+        Initialize async Claude analyzer.
+        
+        Args:
+            api_key: Anthropic API key
+            model: Claude model to use
+            max_tokens: Maximum tokens for API response
+            prompt: Static analysis instructions, sent as a cached system prompt
+            region_prompt: Prompt template for analyzing a changed region of the screen
+            encoder: Image encoder used to prepare screenshots
+            cache: Cache of previous analyses to answer repeated screens from
+            cache_key_mode: "exact" or "perceptual" cache keys
+            delta_prompt: Prompt template for delta extraction against the previous context
+            max_in_flight: Maximum number of concurrent API requests
+            deadline: Seconds after which a request is abandoned (None for no deadline)
+        """
+        super().__init__(api_key, model, max_tokens, prompt,
+                         region_prompt=region_prompt, encoder=encoder,
+                         cache=cache, cache_key_mode=cache_key_mode,
+                         delta_prompt=delta_prompt)
+        self.async_client = get_async_client(api_key)
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline
+        self.in_flight = 0
+        self._semaphore = None
+    
+    async def analyze_screenshot_async(self, screenshot: Image.Image,
+                                       previous_context: Optional[Context] = None) -> Optional[Context]:
+        """
+        Analyze a screenshot using the async Claude API client.
+        
+        Args:
+            screenshot: PIL Image object to analyze
+            previous_context: Context of the previous frame, used for delta
+                extraction if a delta prompt is configured
+            
+        Returns:
+            Extracted context, or None if error or deadline exceeded
+        """
+        return await self._analyze_async(*self._screenshot_request(screenshot, previous_context))
+    
+    async def analyze_region_async(self, screenshot: Image.Image, box: tuple[int, int, int, int],
+                                   previous_context: Context) -> Optional[Context]:
+        """
+        Analyze only the changed region of the screen using the async Claude API client.
+        
+        Args:
+            screenshot: PIL Image of the whole screen (only the region is sent)
+            box: Region bounding box (left, top, right, bottom) in screen coordinates
+            previous_context: Context extracted from the previous frame
+            
+        Returns:
+            Updated context, or None if error or deadline exceeded
+        """
+        return await self._analyze_async(*self._region_request(screenshot, box, previous_context))
+    
+    async def _request_async(self, request: dict, previous_tabs: Optional[tuple[Tab, ...]] = None) -> Context:
+        """Send a request with the async client"""
+        message = await self.async_client.messages.create(**request)
+        if previous_tabs is not None:
+            return self._merge_changes(message, previous_tabs)
+        return self._parse_response(message)
+    
+    async def _analyze_async(self, screen: Image.Image, image: Image.Image, prompt: str,
+                             previous_tabs: Optional[tuple[Tab, ...]] = None) -> Optional[Context]:
+        """
+        Send an image and prompt to Claude API without blocking the event loop.
+        
+        Cancelling the calling task aborts the request.
+        
+        Args:
+            screen: PIL Image of the whole screen, used for the cache lookup
+            image: PIL Image object to analyze
+            prompt: Text prompt sent along with the image
+            previous_tabs: Tabs the response's changes are merged into (full
+                extraction if None)
+            
+        Returns:
+            Extracted context, or None if error or deadline exceeded
+        """
+        # Created here so it belongs to the loop the analyzer runs on
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                # Hashing and encoding are CPU bound, keep them off the event loop
+                cache_key, signature = await asyncio.to_thread(self._cache_key, screen)
+                cached = await asyncio.to_thread(self._cached_response, cache_key, signature)
+                if cached is not None:
+                    return cached
+                encoded = await asyncio.to_thread(self._encode, image)
+                
+                self.logger.info(f"Sending {encoded.width}x{encoded.height} image to Claude API for analysis...")
+                request = self._build_request(encoded, prompt, delta=previous_tabs is not None)
+                response = await asyncio.wait_for(
+                    call_with_retry_async(self._request_async, request, previous_tabs, call_site="analysis"),
+                    timeout=self.deadline
+                )
+                
+                # The response is the complete context (deltas are already merged)
+                if cache_key is not None:
+                    await asyncio.to_thread(self.cache.put, cache_key, response.xml, signature)
+                return response
+                
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Analysis abandoned after the {self.deadline} second deadline")
+                return None
+            except asyncio.CancelledError:
+                self.logger.info("Analysis cancelled")
+                raise
+            except Exception as e:
+                self.logger.error(f"Error analyzing screenshot with Claude API: {e}")
+                return None
+            finally:
+                self.in_flight -= 1
+
+
+class AsyncAnalysisRunner:
+    """Runs an asyncio event loop on a background thread for submitting analyses"""
+    
+    def __init__(self):
+        """Initialize the runner (call start() before submitting)"""
+        self.loop = None
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+    
+    def start(self):
+        """Start the event loop thread"""
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True,
+                                       name="AsyncAnalysisRunner")
+        self.thread.start()
+    
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on the event loop.
+        
+        Args:
+            coroutine: Coroutine to run
+            
+        Returns:
+            Future for the coroutine result; cancelling it cancels the coroutine
+        """
+        if self.loop is None:
+            raise RuntimeError("AsyncAnalysisRunner is not started")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+    
+    def stop(self, timeout: float = 5.0):
+        """
+        Cancel all pending work, close the async client and stop the event loop thread.
+        
+        Args:
+            timeout: Seconds to wait for the thread to finish
+        """
+        if self.loop is None:
+            return
+        
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # The async client's connections belong to this loop, so they are closed on it
+            await close_async_client()
+        
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout)
+        except Exception as e:
+            self.logger.warning(f"Error shutting down the analysis event loop: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.loop = None
+        self.thread = None
@@ -3,6 +3,44 @@
 # Screenshot capture settings
 SCREENSHOT_INTERVAL = 10  # Interval between screenshots in seconds
 
+# Adaptive interval settings
+# The interval shrinks while the screen keeps changing and backs off exponentially
+# while it is static (faster while the user is idle too), within the min/max bounds
+ADAPTIVE_INTERVAL_ENABLED = True  # If False, screenshots are taken every SCREENSHOT_INTERVAL seconds
+MIN_SCREENSHOT_INTERVAL = 3  # Shortest interval between screenshots in seconds
+MAX_SCREENSHOT_INTERVAL = 60  # Longest interval between screenshots in seconds
+INTERVAL_SPEEDUP_FACTOR = 0.5  # Interval multiplier while the screen is changing
+INTERVAL_BACKOFF_FACTOR = 2.0  # Interval multiplier while the screen is static (squared while the user is idle)
+
+# Capture backend settings
+CAPTURE_BACKEND = "auto"  # Options: auto (mss if installed, else pyautogui), mss, pyautogui, replay, synthetic
+CAPTURE_MONITOR = 1  # Monitor to capture with mss (0 = all monitors combined, 1 = primary)
+CAPTURE_REPLAY_DIR = None  # Directory of frames for the replay backend
+
+# Frame gate settings
+# Frames whose perceptual hash is within FRAME_GATE_THRESHOLD bits of the last analyzed
+# frame are not sent to the API; the previous context is reused instead
+FRAME_GATE_ENABLED = True  # Whether to skip analysis of unchanged frames
+FRAME_GATE_HASH_SIZE = 8  # Hash grid size (8 -> 64-bit hash)
+FRAME_GATE_THRESHOLD = 5  # Maximum Hamming distance for a frame to count as unchanged
+
+# Dirty region settings
+# When only a small part of the screen changed, only that crop is sent together with
+# the previous context instead of the whole screen
+DIRTY_REGION_ENABLED = True  # Whether to send only the changed region when the change is local
+DIRTY_REGION_GRID = (16, 9)  # Tile grid (columns, rows) used to compare frames
+DIRTY_REGION_PIXEL_THRESHOLD = 24  # Minimum grayscale difference for a pixel to count as changed
+DIRTY_REGION_TILE_THRESHOLD = 0.005  # Minimum fraction of changed pixels for a tile to count as dirty
+DIRTY_REGION_MAX_AREA = 0.35  # Largest changed area (fraction of the screen) still sent as a crop
+
+# Triage settings
+# A small, fast model first decides whether a changed frame needs a full extraction and
+# whether new content belongs in the summary; the large model only runs when it escalates
+TRIAGE_ENABLED = True  # If False, every changed frame and summary update goes to CLAUDE_MODEL
+TRIAGE_MODEL = "claude-haiku-4-5"  # Small model answering the triage questions
+TRIAGE_ESCALATE_DISTANCE = 20  # Frames at least this many hash bits from the last analyzed frame are extracted without asking
+TRIAGE_IMAGE_TOKEN_BUDGET = 300  # Token budget for the thumbnail sent to the triage model
+
 # API settings
 # The API key is loaded from the parent directory's api_key folder
 import os
@@ -11,11 +49,91 @@ API_KEY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "api_key
 # Claude model to use for image analysis
 CLAUDE_MODEL = "claude-sonnet-4-5"
 
+# API client settings
+# All API calls share one pooled client, so connections are kept alive and reused
+API_POOL_SIZE = 10  # Maximum number of pooled connections
+API_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection is kept open
+API_TIMEOUT = 60  # Seconds before an API request times out
+API_CONNECT_TIMEOUT = 5  # Seconds before connecting to the API times out
+
+# Retry and circuit breaker settings
+# Transient API errors are retried with jittered exponential backoff (honouring the
+# retry-after header); after repeated failures the circuit breaker stops API calls and
+# pauses capturing until the cool-down has passed
+API_MAX_ATTEMPTS = 4  # Maximum attempts per API call, including the first
+API_RETRY_BASE_DELAY = 1.0  # Seconds before the first retry, doubled for each retry
+API_RETRY_MAX_DELAY = 30  # Maximum seconds between attempts
+API_CALL_DEADLINE = 60  # Seconds after the first attempt when no more retries are started
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # Consecutive calls failing with transport errors (after their retries) that open the circuit
+CIRCUIT_BREAKER_RESET_TIMEOUT = 60  # Seconds before a trial call is allowed again
+
 # Maximum tokens for API response
 MAX_TOKENS = 1500
 
+# Async analysis settings
+# With async analysis the service thread hands frames to an asyncio event loop and keeps
+# capturing and generating links while the API call is in flight
+ASYNC_ANALYSIS_ENABLED = True  # Whether to analyze screenshots on a background event loop
+ANALYSIS_MAX_IN_FLIGHT = 2  # Maximum number of concurrent analysis requests
+ANALYSIS_DEADLINE = 30  # Seconds after which an analysis request is abandoned
+
+# Pipeline settings
+# The pipeline runs encode -> analyze -> (summary, links) as stages on their own worker
+# threads, connected by bounded queues that drop their oldest frame when a stage falls
+# behind. Takes precedence over async analysis.
+PIPELINE_ENABLED = True  # Whether to process frames through the staged pipeline
+PIPELINE_ENCODE_WORKERS = 1  # Worker threads encoding frames
+PIPELINE_ANALYZE_WORKERS = 2  # Worker threads waiting on analysis requests
+PIPELINE_QUEUE_SIZE = 1  # Frames waiting per stage before the oldest is dropped
+
+# Insight settings
+# The combined call updates the summary and generates links in one request, so the
+# learning objective and screen content are sent (and paid for) once per update
+COMBINED_INSIGHTS_ENABLED = True  # If False, the summary and links are separate API calls
+
+# Context change trigger settings
+# The summary and links are regenerated when the extracted tabs changed materially since
+# the last update, once the context has been stable for the debounce window
+CONTEXT_CHANGE_THRESHOLD = 0.2  # Minimum average change per tab (0-1) that triggers an update
+CONTEXT_CHANGE_DEBOUNCE = 3  # Seconds without further change before an update fires
+CONTEXT_CHANGE_MAX_WAIT = 30  # Seconds after which a pending change fires even if the context keeps changing
+CONTEXT_CHANGE_MIN_INTERVAL = 10  # Minimum seconds between two updates (maximum rate)
+
+# Delta extraction settings
+# Once there is a previous context, the model is given its tabs and only returns the tabs
+# that were added, removed or modified, which are merged locally; this keeps output tokens
+# (which dominate latency) small when only part of the screen changed
+DELTA_ANALYSIS_ENABLED = True  # If False, every analysis extracts all tabs again
+
+# Analysis cache settings
+# Complete contexts are cached by screen hash and analysis prompt/model, so screens that
+# were analyzed before (e.g. switching back to a previous tab) don't need another API call,
+# also when the screen is reached from a different previous context.
+# Exact keys only hit for identical pixels (a clock in the corner breaks them); perceptual
+# keys tolerate small changes and a hit is only used if a thumbnail of the screen is
+# within ANALYSIS_CACHE_MAX_DISTANCE of the cached one.
+# The on-disk cache stores extracted screen content for up to ANALYSIS_CACHE_MAX_AGE,
+# also when SAVE_CONTEXTS is False, so it is off unless ANALYSIS_CACHE_DIR is set
+ANALYSIS_CACHE_ENABLED = True  # Whether to reuse previous analyses of identical screens
+ANALYSIS_CACHE_KEY = "perceptual"  # Options: perceptual (perceptual hash), exact (screen pixels)
+ANALYSIS_CACHE_MAX_DISTANCE = 0.005  # Largest fraction of thumbnail pixels that may differ for a perceptual hit
+ANALYSIS_CACHE_MEMORY_ENTRIES = 128  # Maximum number of contexts kept in memory
+ANALYSIS_CACHE_DIR = None  # Directory for the on-disk cache, e.g. "context_retrieval/analysis_cache" (None for memory only)
+ANALYSIS_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Maximum size of the on-disk cache in bytes
+ANALYSIS_CACHE_MAX_AGE = 24 * 3600  # Seconds after which cached analyses expire
+
+# Image encoding settings
+# Screenshots are downscaled to fit IMAGE_TOKEN_BUDGET (about 750 pixels per token)
+# but never below IMAGE_MIN_SCALE of the native resolution, so text stays legible
+IMAGE_FORMAT = "WEBP"  # Options: PNG, JPEG, WEBP
+IMAGE_TOKEN_BUDGET = 1600  # Maximum estimated image tokens per screenshot (None for native resolution)
+IMAGE_GRAYSCALE = False  # Whether to drop colour information before encoding
+IMAGE_QUALITY = 85  # Quality for lossy formats (1-100)
+IMAGE_MIN_SCALE = 0.5  # Smallest allowed scale relative to the native resolution
+
 # Prompt template for image analysis
-ANALYSIS_PROMPT = """Analyze the provided screenshot, which contains multiple tabs (e.g., website or app interface). Generate an XML structure that organizes each tab's content, including:
+# The analyzer answers with a record_tabs tool call, which is rendered as <Tab> XML
+ANALYSIS_PROMPT = """Analyze the provided screenshot, which contains multiple tabs (e.g., website or app interface). Record each tab's content with the record_tabs tool, including:
 
 Tab Name: The main content of the tab in a few words
 
@@ -27,28 +145,29 @@ Text Content: Extract and summarize all visible text in the tab.
 
 Image Content: Describe key images or visual elements, explaining their role
 
-Return the output in the following XML format:
-
-<Tab>
-    <Name>Tab Name</Name>
-    <URL>Tab URL</URL>
-    <Context>Tab description</Context>
-    <TextContent>
-        Extracted text content
-    </TextContent>
-    <ImageContent>
-        <Image>
-            <Description>Image description</Description>
-            <Role>Image role</Role>
-        </Image>
-    </ImageContent>
-</Tab>
-
-Ensure the XML is organized by tab and clearly describes both text and images for each section of the screenshot.
-do not include other xml tags than the ones specified.
+Record one entry per tab and clearly describe both text and images for each section of the screenshot.
 Be concise and to the point. Dont provide more than 1000 tokens.
-Ignore ads and other non-content elements.
-Output well formatted xml and nothing else."""
+Ignore ads and other non-content elements."""
+
+# Prompt template for analyzing only the changed region of the screen
+# ANALYSIS_PROMPT is sent as the (cached) system prompt, this is the per-call instruction
+# {previous_context} is the XML extracted from the last analyzed frame
+REGION_ANALYSIS_PROMPT = """The provided image is NOT the whole screen. It is only the region of the screen that changed since the last analysis: x={x}, y={y}, {width}x{height} pixels of a {screen_width}x{screen_height} screen. Everything outside this region is unchanged.
+
+Here is the XML context extracted from the screen before the change:
+{previous_context}
+
+Update this context with what is visible in the changed region. Keep tabs that are not affected by the change exactly as they are, and update or add the tabs that are affected. Record the complete updated context for the whole screen with the record_tabs tool."""
+
+# Prompt template for delta extraction against the previous context
+# {image_description} says whether the image is the whole screen or a changed region,
+# {previous_tabs} is the previous context with an id attribute on each <Tab>
+DELTA_ANALYSIS_PROMPT = """The provided image shows {image_description}.
+
+Here are the tabs extracted from the screen at the last analysis, each with an id:
+{previous_tabs}
+
+Compare the image with these tabs and record only what changed with the record_tab_changes tool: tabs that are new, the ids of tabs that are no longer visible, and for tabs whose content changed, their id and only the fields that changed. Leave out tabs that did not change. If nothing relevant changed, record no changes."""
 
 # Storage settings
 SAVE_SCREENSHOTS = False  # Whether to save screenshots to disk
@@ -58,8 +177,46 @@ SCREENSHOTS_DIR = "context_retrieval/screenshots"  # Directory to save screensho
 SAVE_CONTEXTS = False  # Whether to save extracted contexts to disk
 CONTEXTS_DIR = "context_retrieval/contexts"  # Directory to save context XML files
 
+# Saved file retention settings
+# Screenshots and contexts are written by background writers; once a directory exceeds
+# its size or age limit, its oldest files are removed. Identical screenshots are stored
+# once, and contexts are compressed with a dictionary trained on the first contexts saved
+SCREENSHOTS_MAX_BYTES = 500 * 1024 * 1024  # Maximum size of the saved screenshots in bytes (None for no limit)
+SCREENSHOTS_MAX_AGE = 7 * 24 * 3600  # Seconds after which saved screenshots are removed (None to keep them)
+CONTEXTS_MAX_BYTES = 100 * 1024 * 1024  # Maximum size of the saved contexts in bytes (None for no limit)
+CONTEXTS_MAX_AGE = 30 * 24 * 3600  # Seconds after which saved contexts are removed (None to keep them)
+CONTEXT_COMPRESSION_ENABLED = True  # Whether to compress saved contexts
+CONTEXT_DICTIONARY_SAMPLES = 32  # Contexts the compression dictionary is trained on
+STORAGE_WRITE_QUEUE_SIZE = 64  # Files waiting to be written before the oldest is dropped
+
+# Screenshot archive settings
+# Saved screenshots are appended to an archive of full keyframes plus the tiles that
+# changed since the previous frame, indexed by capture time; replay reads it directly
+SCREENSHOT_ARCHIVE_ENABLED = True  # If False, every saved screenshot is a separate PNG
+SCREENSHOT_ARCHIVE_KEYFRAME_INTERVAL = 30  # Frames between two keyframes (bounds the cost of reading one frame)
+SCREENSHOT_ARCHIVE_SEGMENT_FRAMES = 1800  # Frames per archive file; retention removes whole files
+
 # Summary history settings
-SUMMARY_HISTORY_FILE = "context_retrieval/summary_history.txt"  # File to save learning summary history
+# On startup, the summary file of earlier versions is imported once into a newly created
+# session store; the file itself is left in place
+SUMMARY_HISTORY_FILE = "context_retrieval/summary_history.txt"  # Summary file of earlier versions (None to skip the import)
+
+# The summary is kept as tiers: recent entries verbatim, older entries compacted into
+# digests in the background, so prompts stay bounded however long the session runs
+SUMMARY_RECENT_ENTRIES = 8  # Entries kept verbatim before the oldest are compacted
+SUMMARY_COMPACT_BATCH = 4  # Entries compacted into one digest at a time
+SUMMARY_MAX_DIGESTS = 4  # Digests kept before the two oldest are merged into one
+SUMMARY_ENTRY_MAX_TOKENS = 300  # Maximum tokens for a new summary entry
+SUMMARY_DIGEST_MAX_TOKENS = 500  # Maximum tokens for a digest
+
+# Session store settings
+# Summary entries, links, visited urls and API usage are kept in one SQLite database
+# (WAL mode), written in batches by a background writer. Extracted frames and their tabs
+# (the full screen text) are only kept when SAVE_CONTEXTS is True
+SESSION_STORE_FILE = "context_retrieval/session_store.db"  # SQLite database of all sessions
+SESSION_STORE_WRITE_BATCH = 64  # Maximum records committed in one transaction
+SESSION_STORE_WRITE_INTERVAL = 1.0  # Maximum seconds a record waits before it is committed
+SESSION_STORE_MAX_AGE = 30 * 24 * 3600  # Seconds after which frames and earlier sessions are removed (None to keep them)
 
 # Logging settings
 LOG_FILE = "context_retrieval/context_retrieval.log"
@@ -0,0 +1,198 @@
+"""
+Context Change Module
+
+This module decides when the summary and links are regenerated. Instead of a fixed
+timer, each extracted context is compared with the one the last update was made for;
+an update fires once the content changed materially, has been stable for a debounce
+window, and the previous update is long enough ago. Contexts and tabs are compared by
+their content hashes first, so unchanged tabs cost no word comparison.
+"""
+
+import re
+import threading
+from typing import Optional
+import logging
+
+from context_retrieval.context_model import Tab, Context
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _tab_key(tab: Tab) -> str:
+    """Identify a tab across contexts by its URL, or its name if it has none"""
+    return tab.url or tab.name
+
+
+def _tab_words(tab: Tab) -> set[str]:
+    """Lower-cased words of a tab's name, context and text content"""
+    return set(WORD_PATTERN.findall(f"{tab.name} {tab.context} {tab.text_content}".lower()))
+
+
+def context_change(previous: tuple[Tab, ...], current: tuple[Tab, ...]) -> float:
+    """
+    Measure how much the content changed between two lists of tabs.
+
+    Tabs are matched by URL (or name). Tabs that were added or removed count as fully
+    changed, matched tabs by one minus the Jaccard similarity of their words.
+
+    Args:
+        previous: Tabs of the earlier context
+        current: Tabs of the later context
+
+    Returns:
+        Average change per tab, from 0.0 (identical) to 1.0 (nothing in common)
+    """
+    previous_by_key = {_tab_key(tab): tab for tab in previous}
+    current_by_key = {_tab_key(tab): tab for tab in current}
+    keys = previous_by_key.keys() | current_by_key.keys()
+    if not keys:
+        return 0.0
+
+    total = 0.0
+    for key in keys:
+        before, after = previous_by_key.get(key), current_by_key.get(key)
+        if before is None or after is None:
+            total += 1.0
+            continue
+        if before.content_hash == after.content_hash:
+            continue
+        words_before, words_after = _tab_words(before), _tab_words(after)
+        union = words_before | words_after
+        if union:
+            total += 1.0 - len(words_before & words_after) / len(union)
+    return total / len(keys)
+
+
+class ContextChangeTrigger:
+    """Fires summary/link updates on material, debounced, rate-limited context changes"""
+
+    def __init__(self, threshold: float, debounce: float, min_interval: float, max_wait: float):
+        """
+        Initialize trigger.
+
+        Args:
+            threshold: Minimum context_change() from the last update's context that
+                counts as a material change
+            debounce: Seconds without further material change before an update fires
+            min_interval: Minimum seconds between two updates (the maximum rate)
+            max_wait: Seconds after which a pending change fires even if the context
+                keeps changing
+        """
+        self.threshold = threshold
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, context: Context, now: float) -> bool:
+        """
+        Compare a new context with the context of the last update.
+
+        Args:
+            context: Newly extracted context
+            now: Current time in seconds
+
+        Returns:
+            True if the context materially changed and an update is pending
+        """
+        tabs = context.tabs
+        with self._lock:
+            self.observed += 1
+            if context.content_hash == self._baseline_hash:
+                change = 0.0
+            else:
+                change = context_change(self._baseline_tabs, tabs)
+            if change < self.threshold:
+                if self._pending is not None:
+                    self.logger.info(f"Context returned to the last update's content (change {change:.2f})")
+                self._pending = None
+                self._pending_tabs = None
+                return False
+
+            # Only a change to the pending context restarts the debounce window
+            if self._pending_tabs is None or context_change(self._pending_tabs, tabs) >= self.threshold:
+                self.material_changes += 1
+                self._last_change_at = now
+                if self._pending is None:
+                    self._first_change_at = now
+                self.logger.info(f"Material context change ({change:.2f} >= {self.threshold})")
+            self._pending = context
+            self._pending_tabs = tabs
+            return True
+
+    def poll(self, now: float) -> Optional[Context]:
+        """
+        Take the pending context if its update is due.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            The context to update the summary and links for, or None if nothing is due
+        """
+        with self._lock:
+            if self._pending is None:
+                return None
+            settled = now - self._last_change_at >= self.debounce
+            overdue = now - self._first_change_at >= self.max_wait
+            if not (settled or overdue):
+                return None
+            if self._last_fired is not None and now - self._last_fired < self.min_interval:
+                return None
+            self._last_fired = now
+            return self._take_pending()
+
+    def flush(self) -> Optional[Context]:
+        """
+        Take the pending context regardless of the debounce window and rate limit,
+        e.g. when a replay ends.
+
+        Returns:
+            The pending context, or None if there is none
+        """
+        with self._lock:
+            if self._pending is None:
+                return None
+            return self._take_pending()
+
+    def _take_pending(self) -> Context:
+        """Make the pending context the new baseline and return it (lock held)"""
+        context = self._pending
+        self._baseline_tabs = self._pending_tabs
+        self._baseline_hash = context.content_hash
+        self._pending = None
+        self._pending_tabs = None
+        self.fired += 1
+        return context
+
+    def get_stats(self) -> dict:
+        """
+        Get trigger statistics.
+
+        Returns:
+            Dictionary with observed contexts, material changes and fired updates
+        """
+        with self._lock:
+            return {
+                "observed": self.observed,
+                "material_changes": self.material_changes,
+                "fired": self.fired,
+            }
+
+    def reset(self):
+        """Forget the last update and all statistics"""
+        with self._lock:
+            self._baseline_tabs = ()
+            self._baseline_hash = None
+            self._pending = None
+            self._pending_tabs = None
+            self._first_change_at = 0.0
+            self._last_change_at = 0.0
+            self._last_fired = None
+            self.observed = 0
+            self.material_changes = 0
+            self.fired = 0
@@ -1,94 +1,335 @@
 """
 Context Manager Module
 
-This module handles saving and managing extracted contexts.
+This module handles saving and managing extracted contexts. Every saved context gets a
+monotonic ID and a line in an append-only manifest, which is read once when the manager
+starts; the newest context is then served from memory and time ranges are looked up by
+binary search, without listing or sorting the contexts directory. When retention
+rewrites the manifest, its first line records the last ID given out, so IDs keep
+increasing even after all contexts were removed.
+Files are compressed and written by a background writer, and the oldest contexts are
+removed once the directory exceeds its size or age limit.
 """
 
 import os
+import json
+import time
+import zlib
+import bisect
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 import logging
 
+from context_retrieval.file_storage import (
+    BackgroundWriter, BoundedDirectory, ContextCompressor, COMPRESSED_EXTENSION
+)
+
+
+# Manifest of the saved contexts, one JSON line per context
+MANIFEST_FILENAME = "manifest.jsonl"
+
+
+@dataclass(frozen=True)
+class ContextEntry:
+    """A saved context in the manifest"""
+    id: int
+    time: float
+    filename: str
+
 
 class ContextManager:
     """Handles context storage and management"""
     
-    def __init__(self, contexts_dir: Optional[str] = None, save_contexts: bool = True):
+    def __init__(self, contexts_dir: Optional[str] = None, save_contexts: bool = True,
+                 max_bytes: Optional[int] = None, max_age: Optional[float] = None,
+                 compress: bool = True, dictionary_samples: int = 32,
+                 write_queue_size: int = 64):
         """
         Initialize context manager.
         
         Args:
             contexts_dir: Directory to save context files
             save_contexts: Whether to save contexts to disk
+            max_bytes: Maximum total size of the saved contexts (None for no limit)
+            max_age: Seconds after which a saved context is removed (None to keep them)
+            compress: Whether to compress saved contexts
+            dictionary_samples: Contexts the compression dictionary is trained on
+            write_queue_size: Maximum number of contexts waiting to be written
         """
         self.contexts_dir = contexts_dir
         self.save_contexts = save_contexts
         self.logger = logging.getLogger(__name__)
         
+        self._lock = threading.Lock()
+        # Manifest entries in ID order; their times never decrease, so they can be bisected
+        self._entries: list[ContextEntry] = []
+        self._times: list[float] = []
+        # Newest context, kept in memory so get_latest_context doesn't read the file
+        self._head: Optional[str] = None
+        # Last ID given out, also kept when the entries are removed
+        self._last_id = 0
+        self._manifest_loaded = False
+        
+        self.compress = compress
+        self.writer = None
+        self.files = None
+        self.compressor = None
+        
         # Create contexts directory if it doesn't exist and we're saving
         if self.save_contexts and self.contexts_dir:
             os.makedirs(self.contexts_dir, exist_ok=True)
+            self.files = BoundedDirectory(
+                self.contexts_dir, "context_", max_bytes=max_bytes, max_age=max_age,
+                on_remove=self._on_remove
+            )
+            self.writer = BackgroundWriter("ContextWriter", queue_size=write_queue_size)
             self.logger.info(f"Context save directory: {self.contexts_dir}")
+        # Dictionaries are also needed to read compressed contexts when not saving
+        if self.contexts_dir and os.path.isdir(self.contexts_dir):
+            self.compressor = ContextCompressor(self.contexts_dir, training_samples=dictionary_samples)
+    
+    @property
+    def manifest_path(self) -> Optional[str]:
+        """Path of the manifest, or None without a contexts directory"""
+        return os.path.join(self.contexts_dir, MANIFEST_FILENAME) if self.contexts_dir else None
+    
+    def _load_manifest(self):
+        """Read the manifest once (lock held), building it from the directory if there is none"""
+        if self._manifest_loaded:
+            return
+        self._manifest_loaded = True
+        if not self.contexts_dir or not os.path.exists(self.contexts_dir):
+            return
+        
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r+b") as f:
+                valid_size = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A line torn by a crash is dropped, so the next entry starts on its own line
+                        self.logger.warning(f"Dropping incomplete entry at the end of {self.manifest_path}")
+                        f.truncate(valid_size)
+                        break
+                    valid_size += len(line)
+                    try:
+                        data = json.loads(line)
+                        if "last_id" in data:
+                            self._last_id = max(self._last_id, int(data["last_id"]))
+                            continue
+                        entry = ContextEntry(int(data["id"]), float(data["time"]), data["filename"])
+                    except (ValueError, KeyError, TypeError):
+                        self.logger.warning(f"Skipping invalid entry in {self.manifest_path}")
+                        continue
+                    self._add_entry(entry)
+            self.logger.debug(f"Loaded {len(self._entries)} contexts from {self.manifest_path}")
+            return
+        
+        # Contexts saved before there was a manifest are indexed once, oldest first
+        legacy_files = sorted(
+            f for f in os.listdir(self.contexts_dir)
+            if f.startswith("context_") and f.endswith(".xml")
+        )
+        if not legacy_files:
+            return
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            for filename in legacy_files:
+                modified = os.path.getmtime(os.path.join(self.contexts_dir, filename))
+                entry = self._next_entry(modified, filename)
+                f.write(self._manifest_line(entry))
+                self._add_entry(entry)
+        self.logger.info(f"Indexed {len(legacy_files)} existing contexts in {self.manifest_path}")
+    
+    def _add_entry(self, entry: ContextEntry):
+        """Append an entry to the in-memory index (lock held)"""
+        self._entries.append(entry)
+        self._times.append(entry.time)
+        self._last_id = max(self._last_id, entry.id)
+    
+    def _next_entry(self, timestamp: float, filename: Optional[str] = None) -> ContextEntry:
+        """Create the entry after the newest one (lock held)"""
+        entry_id = self._last_id + 1
+        # Clamp so the times stay sorted even if the clock goes backwards
+        timestamp = max(timestamp, self._times[-1]) if self._times else timestamp
+        if filename is None:
+            stamp = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S")
+            extension = ".xml" + (COMPRESSED_EXTENSION if self.compress else "")
+            filename = f"context_{stamp}_{entry_id:06d}{extension}"
+        return ContextEntry(entry_id, timestamp, filename)
+    
+    @staticmethod
+    def _manifest_line(entry: ContextEntry) -> str:
+        """Manifest line of an entry"""
+        return json.dumps({"id": entry.id, "time": entry.time, "filename": entry.filename}) + "\n"
     
     def save_context(self, context_xml: str) -> Optional[str]:
         """
-        Save context XML to disk with timestamp.
+        Save context XML to disk under the next context ID.
+        
+        The context is indexed immediately and written on a background thread, so the
+        file may not exist yet when this returns.
         
         Args:
             context_xml: XML string containing extracted context
-            
+        
         Returns:
             Path to saved context file, or None if not saved
         """
-        if not self.save_contexts or not self.contexts_dir:
+        if not self.save_contexts or not self.writer:
             return None
         
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"context_{timestamp}.xml"
-            filepath = os.path.join(self.contexts_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(context_xml)
-            
-            self.logger.info(f"Context saved: {filepath}")
-            return filepath
+            with self._lock:
+                self._load_manifest()
+                entry = self._next_entry(time.time())
+                self._add_entry(entry)
+                self._head = context_xml
             
+            self.writer.submit(
+                lambda: self._write(entry, context_xml),
+                on_drop=lambda: self._forget({entry.filename})
+            )
+            return os.path.join(self.contexts_dir, entry.filename)
+        
         except Exception as e:
             self.logger.error(f"Error saving context: {e}")
             return None
     
+    def _write(self, entry: ContextEntry, context_xml: str):
+        """Write a context file and its manifest line (writer thread)"""
+        filepath = os.path.join(self.contexts_dir, entry.filename)
+        if entry.filename.endswith(COMPRESSED_EXTENSION):
+            with open(filepath, 'wb') as f:
+                f.write(self.compressor.compress(context_xml))
+        else:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(context_xml)
+        # The manifest line is written after the file, so it never points to a missing context
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(self._manifest_line(entry))
+        self.logger.info(f"Context saved: {filepath}")
+        
+        self.files.add(entry.filename)
+    
+    def _forget(self, filenames: set[str]):
+        """Drop contexts from the in-memory index"""
+        with self._lock:
+            self._load_manifest()
+            if self._entries and self._entries[-1].filename in filenames:
+                # The newest context is read from the next newest entry when it is needed
+                self._head = None
+            self._entries = [entry for entry in self._entries if entry.filename not in filenames]
+            self._times = [entry.time for entry in self._entries]
+    
+    def _on_remove(self, filenames: list[str]):
+        """Drop contexts removed by the retention limits from the index and manifest (writer thread)"""
+        removed = set(filenames)
+        self._forget(removed)
+        with self._lock:
+            last_id = self._last_id
+        
+        # The manifest is only appended to on this thread, so it can be rewritten here;
+        # atomically, so a crash leaves either the old or the new manifest
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(self.manifest_path, "r", encoding="utf-8") as source, \
+                open(temp_path, "w", encoding="utf-8") as f:
+            # The old header and removed entries are dropped, the new header goes first
+            f.write(json.dumps({"last_id": last_id}) + "\n")
+            for line in source:
+                try:
+                    if json.loads(line)["filename"] in removed:
+                        continue
+                except (ValueError, KeyError, TypeError):
+                    continue
+                f.write(line)
+        os.replace(temp_path, self.manifest_path)
+    
     def get_latest_context(self) -> Optional[str]:
         """
-        Retrieve the most recent context from disk.
+        Retrieve the most recent context.
         
         Returns:
             XML string of latest context, or None if no contexts found
         """
-        if not self.contexts_dir or not os.path.exists(self.contexts_dir):
-            return None
-        
         try:
-            # Get all context files
-            context_files = [
-                f for f in os.listdir(self.contexts_dir) 
-                if f.startswith("context_") and f.endswith(".xml")
-            ]
-            
-            if not context_files:
-                return None
-            
-            # Sort by filename (which includes timestamp)
-            context_files.sort(reverse=True)
-            latest_file = os.path.join(self.contexts_dir, context_files[0])
-            
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                context = f.read()
-            
-            self.logger.debug(f"Retrieved latest context from: {latest_file}")
-            return context
-            
+            with self._lock:
+                self._load_manifest()
+                if self._head is None and self._entries:
+                    self._head = self._read(self._entries[-1])
+                return self._head
+        
         except Exception as e:
             self.logger.error(f"Error retrieving latest context: {e}")
             return None
-
+    
+    def get_context_entries(self, start: Optional[float] = None,
+                            end: Optional[float] = None) -> list[ContextEntry]:
+        """
+        Look up the contexts saved in a time range.
+        
+        Args:
+            start: Earliest save time as a Unix timestamp (None for no lower bound)
+            end: Latest save time as a Unix timestamp (None for no upper bound)
+        
+        Returns:
+            Entries in the range, oldest first
+        """
+        with self._lock:
+            self._load_manifest()
+            low = 0 if start is None else bisect.bisect_left(self._times, start)
+            high = len(self._times) if end is None else bisect.bisect_right(self._times, end)
+            return self._entries[low:high]
+    
+    def get_contexts(self, start: Optional[float] = None, end: Optional[float] = None) -> list[str]:
+        """
+        Retrieve the contexts saved in a time range.
+        
+        Args:
+            start: Earliest save time as a Unix timestamp (None for no lower bound)
+            end: Latest save time as a Unix timestamp (None for no upper bound)
+        
+        Returns:
+            XML strings of the contexts, oldest first (contexts that can't be read are skipped)
+        """
+        self.flush()
+        contexts = []
+        for entry in self.get_context_entries(start, end):
+            try:
+                contexts.append(self._read(entry))
+            except (OSError, KeyError, zlib.error) as e:
+                self.logger.error(f"Error reading context {entry.id}: {e}")
+        return contexts
+    
+    def _read(self, entry: ContextEntry) -> str:
+        """Read a saved context, decompressing it if needed"""
+        path = os.path.join(self.contexts_dir, entry.filename)
+        if entry.filename.endswith(COMPRESSED_EXTENSION):
+            if self.compressor is None:
+                self.compressor = ContextCompressor(self.contexts_dir)
+            with open(path, 'rb') as f:
+                return self.compressor.decompress(f.read())
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the queued contexts are written.
+        
+        Args:
+            timeout: Maximum seconds to wait (None to wait indefinitely)
+        
+        Returns:
+            True if all contexts are written
+        """
+        return self.writer.flush(timeout) if self.writer else True
+    
+    def close(self):
+        """Write the contexts still queued and stop the writer"""
+        if self.writer:
+            self.writer.close()
+            stats = self.writer.get_stats()
+            self.logger.info(
+                f"Contexts: {stats['written']} saved, {stats['dropped']} dropped, "
+                f"{self.files.removed} removed by retention"
+            )
@@ -0,0 +1,424 @@
+"""
+Context Model Module
+
+This module defines the Tab records extracted by the analyzer and the tool schemas the
+analyzer fills them in with: the full list of tabs, or only the changes since the
+previous context, which are merged locally. A Context holds the tabs of one screen and is
+what the rest of the pipeline passes around: tabs are compact, immutable records with a
+content hash, so deduplication and diffing compare hashes instead of re-parsing XML. The
+XML form is rendered once, when a prompt or a file needs it, and XML contexts are parsed
+back into tabs.
+"""
+
+import re
+import hashlib
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass, field, replace
+from xml.sax.saxutils import escape, unescape
+from typing import Iterable, Iterator, Optional
+import logging
+
+
+TAB_OPEN_PATTERN = re.compile(r"<Tab(?:\s[^>]*)?>")
+TAB_CLOSE = "</Tab>"
+
+logger = logging.getLogger(__name__)
+
+# Tool the analyzer is forced to call, so each tab arrives as a validated JSON object
+RECORD_TABS_TOOL = {
+    "name": "record_tabs",
+    "description": "Record the content of every tab or window visible on the screen.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "tabs": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "description": "The main content of the tab in a few words"},
+                        "url": {"type": "string", "description": "The URL of the tab if available, otherwise empty"},
+                        "context": {"type": "string", "description": "A brief description of the tab's purpose"},
+                        "text_content": {"type": "string", "description": "Summary of all visible text in the tab"},
+                        "images": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "description": {"type": "string"},
+                                    "role": {"type": "string"},
+                                },
+                                "required": ["description", "role"],
+                            },
+                        },
+                    },
+                    "required": ["name", "url", "context", "text_content"],
+                },
+            },
+        },
+        "required": ["tabs"],
+    },
+}
+
+TAB_SCHEMA = RECORD_TABS_TOOL["input_schema"]["properties"]["tabs"]["items"]
+
+# Tool for delta extraction: only the tabs that were added, removed or modified since
+# the previous context, which is sent along with numbered tab ids
+RECORD_TAB_CHANGES_TOOL = {
+    "name": "record_tab_changes",
+    "description": "Record how the tabs on the screen changed since the previous analysis.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "added": {
+                "type": "array",
+                "description": "Tabs that are new on the screen",
+                "items": TAB_SCHEMA,
+            },
+            "removed": {
+                "type": "array",
+                "description": "Ids of previous tabs that are no longer on the screen",
+                "items": {"type": "integer"},
+            },
+            "modified": {
+                "type": "array",
+                "description": "Previous tabs whose content changed, with only the changed fields",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}, **TAB_SCHEMA["properties"]},
+                    "required": ["id"],
+                },
+            },
+        },
+        "required": ["added", "removed", "modified"],
+    },
+}
+
+
+@dataclass(frozen=True, slots=True)
+class TabImage:
+    description: str = ""
+    role: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class Tab:
+    name: str = ""
+    url: str = ""
+    context: str = ""
+    text_content: str = ""
+    images: tuple[TabImage, ...] = ()
+    # Hash of all fields, so unchanged tabs are recognized without comparing their text
+    content_hash: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.images, tuple):
+            object.__setattr__(self, "images", tuple(self.images))
+        digest = hashlib.blake2b(digest_size=16)
+        for value in (self.name, self.url, self.context, self.text_content):
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+        for image in self.images:
+            digest.update(f"{image.description}\0{image.role}\0".encode("utf-8"))
+        object.__setattr__(self, "content_hash", digest.hexdigest())
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Tab":
+        """
+        Build a tab from a record_tabs tool input item.
+
+        Args:
+            data: Dictionary with name, url, context, text_content and images
+
+        Returns:
+            Tab object
+        """
+        return cls(
+            name=str(data.get("name") or ""),
+            url=str(data.get("url") or ""),
+            context=str(data.get("context") or ""),
+            text_content=str(data.get("text_content") or ""),
+            images=tuple(
+                TabImage(str(image.get("description") or ""), str(image.get("role") or ""))
+                for image in data.get("images") or []
+                if isinstance(image, dict)
+            ),
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Convert the tab to a record_tabs tool input item, e.g. for storage.
+
+        Returns:
+            Dictionary with name, url, context, text_content and images
+        """
+        data = {"name": self.name, "url": self.url, "context": self.context, "text_content": self.text_content}
+        if self.images:
+            data["images"] = [{"description": image.description, "role": image.role} for image in self.images]
+        return data
+
+    @classmethod
+    def from_xml(cls, tab_xml: str) -> "Tab":
+        """
+        Parse a <Tab> element.
+
+        Args:
+            tab_xml: <Tab>...</Tab> string
+
+        Returns:
+            Tab object (fields missing from the XML are left empty)
+        """
+        try:
+            element = ElementTree.fromstring(tab_xml)
+        except ElementTree.ParseError:
+            return cls._from_malformed_xml(tab_xml)
+
+        def text(parent, tag: str) -> str:
+            return (parent.findtext(tag) or "").strip()
+
+        return cls(
+            name=text(element, "Name"),
+            url=text(element, "URL"),
+            context=text(element, "Context"),
+            text_content=text(element, "TextContent"),
+            images=tuple(
+                TabImage(text(image, "Description"), text(image, "Role"))
+                for image in element.iter("Image")
+            ),
+        )
+
+    @classmethod
+    def _from_malformed_xml(cls, tab_xml: str) -> "Tab":
+        """Fallback for tabs that aren't well-formed XML (e.g. unescaped "&")"""
+        def text(tag: str) -> str:
+            match = re.search(rf"<{tag}>(.*?)</{tag}>", tab_xml, re.DOTALL)
+            return unescape(match.group(1).strip()) if match else ""
+
+        return cls(name=text("Name"), url=text("URL"), context=text("Context"),
+                   text_content=text("TextContent"))
+
+    def to_xml(self, tab_id: Optional[int] = None) -> str:
+        """
+        Render the tab as a <Tab> element.
+
+        Args:
+            tab_id: Id added as an attribute, so delta extraction can refer to the tab
+
+        Returns:
+            XML string in the format the analysis prompt describes
+        """
+        lines = [
+            "<Tab>" if tab_id is None else f'<Tab id="{tab_id}">',
+            f"    <Name>{escape(self.name)}</Name>",
+            f"    <URL>{escape(self.url)}</URL>",
+            f"    <Context>{escape(self.context)}</Context>",
+            f"    <TextContent>{escape(self.text_content)}</TextContent>",
+        ]
+        if self.images:
+            lines.append("    <ImageContent>")
+            for image in self.images:
+                lines.append(
+                    f"        <Image><Description>{escape(image.description)}</Description>"
+                    f"<Role>{escape(image.role)}</Role></Image>"
+                )
+            lines.append("    </ImageContent>")
+        lines.append("</Tab>")
+        return "\n".join(lines)
+
+
+class Context:
+    """The tabs extracted from one screen, with their XML form rendered on demand"""
+
+    __slots__ = ("tabs", "content_hash", "_xml")
+
+    def __init__(self, tabs: Iterable[Tab], xml: Optional[str] = None):
+        """
+        Initialize context.
+
+        Args:
+            tabs: Tabs in screen order
+            xml: XML the tabs were parsed from, kept so it isn't rendered again
+        """
+        self.tabs: tuple[Tab, ...] = tuple(tabs)
+        digest = hashlib.blake2b(digest_size=16)
+        for tab in self.tabs:
+            digest.update(tab.content_hash.encode("ascii"))
+        self.content_hash = digest.hexdigest()
+        self._xml = xml
+
+    @classmethod
+    def from_xml(cls, context_xml: str) -> "Context":
+        """
+        Parse an XML context (e.g. from the analysis cache) into tabs, once.
+
+        Args:
+            context_xml: XML context
+
+        Returns:
+            Context object
+        """
+        return cls(parse_tabs(context_xml), xml=context_xml)
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[dict]) -> "Context":
+        """
+        Build a context from stored tab dictionaries.
+
+        Args:
+            items: Dictionaries as returned by to_dicts()
+
+        Returns:
+            Context object
+        """
+        return cls(Tab.from_dict(item) for item in items if isinstance(item, dict))
+
+    @property
+    def xml(self) -> str:
+        """XML form of the context, rendered on first use"""
+        if self._xml is None:
+            self._xml = tabs_to_xml(self.tabs)
+        return self._xml
+
+    def to_dicts(self) -> list[dict]:
+        """
+        Convert the tabs to dictionaries, e.g. for storage.
+
+        Returns:
+            List of tab dictionaries
+        """
+        return [tab.to_dict() for tab in self.tabs]
+
+    def __str__(self) -> str:
+        return self.xml
+
+    def __len__(self) -> int:
+        return len(self.tabs)
+
+    def __iter__(self) -> Iterator[Tab]:
+        return iter(self.tabs)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Context) and other.content_hash == self.content_hash
+
+    def __hash__(self) -> int:
+        return hash(self.content_hash)
+
+    def __repr__(self) -> str:
+        return f"Context({len(self.tabs)} tabs, {self.content_hash[:8]})"
+
+
+def tabs_to_xml(tabs: Iterable[Tab]) -> str:
+    """
+    Render tabs as an XML context.
+
+    Args:
+        tabs: Tabs in screen order
+
+    Returns:
+        XML context with one <Tab> element per tab
+    """
+    return "\n".join(tab.to_xml() for tab in tabs)
+
+
+def tabs_from_tool_input(tool_input: dict) -> list[Tab]:
+    """
+    Build tabs from the input of a record_tabs tool call.
+
+    Args:
+        tool_input: Tool input dictionary
+
+    Returns:
+        List of Tab objects
+    """
+    return [Tab.from_dict(item) for item in tool_input.get("tabs") or [] if isinstance(item, dict)]
+
+
+def parse_tabs(context_xml: str) -> list[Tab]:
+    """
+    Parse an XML context into tabs.
+
+    Args:
+        context_xml: XML context
+
+    Returns:
+        List of Tab objects, in document order
+    """
+    return [Tab.from_xml(tab_xml) for tab_xml in split_tabs(context_xml)]
+
+
+def format_tab_listing(tabs: Iterable[Tab]) -> str:
+    """
+    Render tabs with their ids, as the previous context for delta extraction.
+
+    Args:
+        tabs: Tabs of the previous context
+
+    Returns:
+        XML context with an id attribute on each <Tab>
+    """
+    return "\n".join(tab.to_xml(tab_id) for tab_id, tab in enumerate(tabs))
+
+
+def apply_tab_changes(tabs: list[Tab] | tuple[Tab, ...], changes: dict) -> list[Tab]:
+    """
+    Merge the input of a record_tab_changes tool call into the previous tabs.
+
+    Args:
+        tabs: Tabs of the previous context, indexed by their ids
+        changes: Tool input with added, removed and modified tabs
+
+    Returns:
+        New list of tabs: unchanged and modified tabs in their previous order, followed
+        by the added tabs
+    """
+    removed = set()
+    for tab_id in changes.get("removed") or []:
+        if isinstance(tab_id, int) and 0 <= tab_id < len(tabs):
+            removed.add(tab_id)
+        else:
+            logger.warning(f"Ignoring removal of unknown tab id {tab_id!r}")
+
+    merged = list(tabs)
+    for item in changes.get("modified") or []:
+        tab_id = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(tab_id, int) or not 0 <= tab_id < len(tabs):
+            logger.warning(f"Ignoring modification of unknown tab id {tab_id!r}")
+            continue
+        updated = Tab.from_dict(item)
+        fields = {
+            name: getattr(updated, name)
+            for name in ("name", "url", "context", "text_content", "images")
+            if name in item
+        }
+        merged[tab_id] = replace(merged[tab_id], **fields)
+        removed.discard(tab_id)
+
+    merged = [tab for tab_id, tab in enumerate(merged) if tab_id not in removed]
+    merged.extend(Tab.from_dict(item) for item in changes.get("added") or [] if isinstance(item, dict))
+    return merged
+
+
+def split_tabs(context_xml: str) -> list[str]:
+    """
+    Split an XML context into its <Tab> elements.
+
+    Text outside <Tab> elements is ignored, as is a trailing tab without a closing tag.
+
+    Args:
+        context_xml: XML context from the analyzer
+
+    Returns:
+        List of <Tab>...</Tab> strings, in document order
+    """
+    tabs = []
+    position = 0
+    while True:
+        opening = TAB_OPEN_PATTERN.search(context_xml, position)
+        if not opening:
+            break
+        closing = context_xml.find(TAB_CLOSE, opening.end())
+        if closing == -1:
+            break
+        position = closing + len(TAB_CLOSE)
+        tabs.append(context_xml[opening.start():position])
+    return tabs
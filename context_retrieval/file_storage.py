@@ -0,0 +1,476 @@
+"""
+File Storage Module
+
+This module writes saved screenshots and contexts to disk on a background writer thread,
+so the capture thread never waits on disk. Each directory is kept within a size and age
+limit by removing its oldest files; hard links to the same file count once. Screenshots
+go into a keyframe/delta archive, or as PNGs where identical frames are stored once
+(later copies are hard links to the first). Contexts are compressed with zlib using a
+preset dictionary trained on earlier contexts, which holds the XML structure and
+recurring page text that a single context is too short to build up on its own.
+"""
+
+import os
+import zlib
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+from PIL import Image
+import logging
+
+from context_retrieval.pipeline import DropOldestQueue, PipelineClosed
+from context_retrieval.screenshot_archive import (
+    ScreenshotArchiveWriter, SEGMENT_PREFIX, DATA_EXTENSION, INDEX_EXTENSION
+)
+
+
+# Largest preset dictionary zlib can use (the deflate window)
+MAX_DICTIONARY_BYTES = 32 * 1024
+
+# Extension of compressed context files
+COMPRESSED_EXTENSION = ".z"
+
+
+class BackgroundWriter:
+    """Runs file writes on a worker thread, dropping the oldest write when it falls behind"""
+
+    def __init__(self, name: str, queue_size: int = 64):
+        """
+        Initialize and start the writer.
+
+        Args:
+            name: Thread name, used for logging
+            queue_size: Maximum number of writes waiting before the oldest is dropped
+        """
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+
+        self._queue = DropOldestQueue(queue_size)
+        self._condition = threading.Condition()
+        # Writes queued or in progress
+        self._pending = 0
+        self.written = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def submit(self, write: Callable[[], None], on_drop: Optional[Callable[[], None]] = None):
+        """
+        Queue a write.
+
+        Args:
+            write: Performs the write on the writer thread
+            on_drop: Called if the write is dropped because the writer fell behind
+        """
+        with self._condition:
+            self._pending += 1
+        dropped = self._queue.put((write, on_drop))
+        if dropped is not None:
+            self.logger.warning(f"{self.name} is falling behind, dropped the oldest write")
+            _, dropped_callback = dropped
+            try:
+                if dropped_callback:
+                    dropped_callback()
+            finally:
+                self._done()
+
+    def _run(self):
+        """Perform queued writes until the writer is closed"""
+        while True:
+            try:
+                write, _ = self._queue.get()
+            except PipelineClosed:
+                return
+            try:
+                write()
+                self.written += 1
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Error in {self.name}: {e}", exc_info=True)
+            finally:
+                self._done()
+
+    def _done(self):
+        with self._condition:
+            self._pending -= 1
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued writes are done.
+
+        Args:
+            timeout: Maximum seconds to wait (None to wait indefinitely)
+
+        Returns:
+            True if all writes are done
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Finish the queued writes and stop the writer thread.
+
+        Args:
+            timeout: Maximum seconds to wait for the queued writes
+        """
+        self._queue.close()
+        self._thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        """
+        Get writer statistics.
+
+        Returns:
+            Dictionary with written, dropped and failed write counts
+        """
+        return {"written": self.written, "dropped": self._queue.dropped, "errors": self.errors}
+
+
+class BoundedDirectory:
+    """Tracks the files of a directory oldest first and removes the oldest beyond a size or age"""
+
+    def __init__(self, directory: str, prefix: str, max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 on_remove: Optional[Callable[[list[str]], None]] = None, suffix: str = ""):
+        """
+        Initialize from the files already in the directory.
+
+        Args:
+            directory: Directory to keep bounded
+            prefix: Only files whose name starts with this prefix are managed
+            max_bytes: Maximum total size of the files (None for no size limit)
+            max_age: Seconds after which a file is removed (None to keep files forever)
+            on_remove: Called with the names of the files removed by enforce()
+            suffix: Only files whose name ends with this suffix are managed
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.on_remove = on_remove
+        self.logger = logging.getLogger(__name__)
+
+        # (modification time, size, filename, inode), oldest first
+        self._files: list[tuple[float, int, str, int]] = []
+        # inode -> number of tracked hard links; its size counts once, until the last link is removed
+        self._links: dict[int, int] = {}
+        self.total_bytes = 0
+        for filename in os.listdir(directory):
+            if filename.startswith(prefix) and filename.endswith(suffix) and not filename.endswith(".tmp"):
+                stat = os.stat(os.path.join(directory, filename))
+                self._files.append((stat.st_mtime, stat.st_size, filename, stat.st_ino))
+                self._link(stat.st_ino, stat.st_size)
+        self._files.sort()
+        self.removed = 0
+
+    def _link(self, inode: int, size: int):
+        """Count a tracked link; only the first link of an inode adds its size"""
+        if not self._links.get(inode):
+            self.total_bytes += size
+        self._links[inode] = self._links.get(inode, 0) + 1
+
+    def _unlink(self, inode: int, size: int):
+        """Forget a tracked link; the size is freed with the last link of an inode"""
+        self._links[inode] -= 1
+        if not self._links[inode]:
+            del self._links[inode]
+            self.total_bytes -= size
+
+    def add(self, filename: str):
+        """
+        Track a newly written file and remove old files if a limit is exceeded.
+
+        Args:
+            filename: Name of the file in the directory
+        """
+        # A file written again under the same name replaces the tracked one
+        for index in range(len(self._files) - 1, -1, -1):
+            _, size, tracked, inode = self._files[index]
+            if tracked == filename:
+                del self._files[index]
+                self._unlink(inode, size)
+                break
+        stat = os.stat(os.path.join(self.directory, filename))
+        # Tracked by the time it was added: a hard link shares the modification time of its original
+        self._files.append((time.time(), stat.st_size, filename, stat.st_ino))
+        self._link(stat.st_ino, stat.st_size)
+        self.enforce()
+
+    def enforce(self) -> list[str]:
+        """
+        Remove expired files, then the oldest files until under the size limit.
+
+        Returns:
+            Names of the removed files
+        """
+        now = time.time()
+        # Remove down to 90% of the size limit so this doesn't run on every write
+        target = self.max_bytes * 0.9 if self.max_bytes is not None else None
+        over_limit = self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+        removed = []
+        while self._files:
+            modified, size, filename, inode = self._files[0]
+            expired = self.max_age is not None and now - modified > self.max_age
+            if not expired and not (over_limit and self.total_bytes > target):
+                break
+            self._files.pop(0)
+            self._unlink(inode, size)
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            removed.append(filename)
+
+        if removed:
+            self.removed += len(removed)
+            self.logger.info(
+                f"Removed {len(removed)} old files from {self.directory} "
+                f"({self.total_bytes / (1024 * 1024):.1f} MB kept)"
+            )
+            if self.on_remove:
+                self.on_remove(removed)
+        return removed
+
+
+def train_dictionary(samples: list[str], size: int = MAX_DICTIONARY_BYTES) -> bytes:
+    """
+    Train a zlib preset dictionary from sample texts.
+
+    Lines that occur in more than one sample (the XML structure, tab names, urls and page
+    text that stays on screen) are kept, the most frequent ones last, since deflate
+    reaches the end of the dictionary with the shortest distances.
+
+    Args:
+        samples: Sample texts
+        size: Maximum dictionary size in bytes
+
+    Returns:
+        Dictionary bytes (empty if the samples have nothing in common)
+    """
+    counts = Counter(line for sample in samples for line in set(sample.splitlines()))
+    common = sorted((line for line, count in counts.items() if count > 1),
+                    key=lambda line: (counts[line], len(line)))
+    return "\n".join(common).encode("utf-8")[-size:]
+
+
+class ContextCompressor:
+    """zlib compression of contexts with a preset dictionary trained on earlier contexts"""
+
+    def __init__(self, directory: str, training_samples: int = 32, level: int = 9):
+        """
+        Initialize compressor and load the dictionaries trained before.
+
+        Args:
+            directory: Directory the dictionaries are stored in
+            training_samples: Number of contexts the dictionary is trained on
+            level: zlib compression level
+        """
+        self.directory = directory
+        self.training_samples = training_samples
+        self.level = level
+        self.logger = logging.getLogger(__name__)
+
+        # Dictionary ID -> dictionary; files compressed with any of them stay readable
+        self._dictionaries: dict[str, bytes] = {}
+        self._current: Optional[str] = None
+        self._samples: list[str] = []
+
+        newest = None
+        for filename in os.listdir(directory):
+            if filename.startswith("zdict_") and filename.endswith(".bin"):
+                path = os.path.join(directory, filename)
+                with open(path, "rb") as f:
+                    dictionary_id = filename[len("zdict_"):-len(".bin")]
+                    self._dictionaries[dictionary_id] = f.read()
+                modified = os.path.getmtime(path)
+                if newest is None or modified > newest:
+                    newest, self._current = modified, dictionary_id
+
+    def compress(self, text: str) -> bytes:
+        """
+        Compress a context, training the dictionary once enough contexts were seen.
+
+        Args:
+            text: Context to compress
+
+        Returns:
+            Header line with the dictionary ID ("-" for none) followed by the zlib stream
+        """
+        if self._current is None:
+            self._samples.append(text)
+            if len(self._samples) >= self.training_samples:
+                self._train()
+
+        dictionary_id = self._current or "-"
+        if self._current:
+            compressor = zlib.compressobj(self.level, zdict=self._dictionaries[self._current])
+        else:
+            compressor = zlib.compressobj(self.level)
+        data = compressor.compress(text.encode("utf-8")) + compressor.flush()
+        return dictionary_id.encode("ascii") + b"\n" + data
+
+    def decompress(self, data: bytes) -> str:
+        """
+        Decompress a context written by compress().
+
+        Args:
+            data: Compressed context
+
+        Returns:
+            Context text
+
+        Raises:
+            KeyError: If the dictionary the context was compressed with is missing
+        """
+        header, _, payload = data.partition(b"\n")
+        dictionary_id = header.decode("ascii")
+        if dictionary_id == "-":
+            decompressor = zlib.decompressobj()
+        else:
+            decompressor = zlib.decompressobj(zdict=self._dictionaries[dictionary_id])
+        return (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+
+    def _train(self):
+        """Train and store a dictionary from the collected samples"""
+        dictionary = train_dictionary(self._samples)
+        self._samples = []
+        if not dictionary:
+            return
+        dictionary_id = hashlib.blake2b(dictionary, digest_size=8).hexdigest()
+        path = os.path.join(self.directory, f"zdict_{dictionary_id}.bin")
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(dictionary)
+        os.replace(f"{path}.tmp", path)
+        self._dictionaries[dictionary_id] = dictionary
+        self._current = dictionary_id
+        self.logger.info(f"Trained a {len(dictionary)} byte context compression dictionary")
+
+
+class ScreenshotStore:
+    """Saves screenshots on a background writer, as PNGs or into a keyframe/delta archive"""
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, max_age: Optional[float] = None,
+                 queue_size: int = 64, timestamp_format: str = "%Y%m%d_%H%M%S",
+                 archive: bool = False, keyframe_interval: int = 30, segment_frames: int = 1800):
+        """
+        Initialize screenshot store.
+
+        Args:
+            directory: Directory to save screenshots to
+            max_bytes: Maximum total size of the saved screenshots (None for no limit)
+            max_age: Seconds after which a screenshot is removed (None to keep them)
+            queue_size: Maximum number of screenshots waiting to be written
+            timestamp_format: strftime format of the timestamp in the filenames
+            archive: Whether to append screenshots to an archive instead of saving PNGs
+            keyframe_interval: Frames between two archive keyframes
+            segment_frames: Frames per archive segment; retention removes whole segments
+        """
+        self.directory = directory
+        self.timestamp_format = timestamp_format
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+        self.archive = None
+        if archive:
+            self.files = BoundedDirectory(
+                directory, SEGMENT_PREFIX, suffix=DATA_EXTENSION, max_bytes=max_bytes, max_age=max_age,
+                on_remove=self._remove_indexes
+            )
+            # Segments are only tracked once complete, so retention never removes the open one
+            self.archive = ScreenshotArchiveWriter(
+                directory, keyframe_interval=keyframe_interval, segment_frames=segment_frames,
+                on_segment_closed=self.files.add
+            )
+        else:
+            self.files = BoundedDirectory(directory, "screenshot_", max_bytes=max_bytes, max_age=max_age)
+        self.writer = BackgroundWriter("ScreenshotWriter", queue_size=queue_size)
+        # Pixel hash -> filename of recently written frames, for deduplication
+        self._recent: OrderedDict[str, str] = OrderedDict()
+        self.deduplicated = 0
+
+    def save(self, screenshot: Image.Image, timestamp: Optional[float] = None) -> str:
+        """
+        Queue a screenshot to be saved.
+
+        Args:
+            screenshot: PIL Image to save (must not be modified afterwards)
+            timestamp: Capture time (now if None)
+
+        Returns:
+            Path the screenshot will be written to (the archive directory when archiving)
+        """
+        timestamp = timestamp or time.time()
+        if self.archive:
+            self.writer.submit(lambda: self.archive.append(screenshot, timestamp))
+            return self.directory
+
+        stamp = datetime.fromtimestamp(timestamp).strftime(self.timestamp_format)
+        filename = f"screenshot_{stamp}.png"
+        self.writer.submit(lambda: self._write(screenshot, filename))
+        return os.path.join(self.directory, filename)
+
+    def _write(self, screenshot: Image.Image, filename: str):
+        """Write a screenshot, or link it to an identical frame written before (writer thread)"""
+        path = os.path.join(self.directory, filename)
+        digest = hashlib.blake2b(screenshot.tobytes(), digest_size=16)
+        digest.update(f"{screenshot.mode}{screenshot.size}".encode("ascii"))
+        key = digest.hexdigest()
+
+        existing = self._recent.get(key)
+        if existing is not None and existing != filename and os.path.exists(os.path.join(self.directory, existing)):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                os.link(os.path.join(self.directory, existing), path)
+                self.deduplicated += 1
+                self.logger.debug(f"Screenshot {filename} is identical to {existing}, linked")
+                self.files.add(filename)
+                return
+            except OSError as e:
+                self.logger.debug(f"Can't link identical screenshot, writing a copy: {e}")
+
+        screenshot.save(f"{path}.tmp", format="PNG")
+        os.replace(f"{path}.tmp", path)
+        self._recent[key] = filename
+        self._recent.move_to_end(key)
+        while len(self._recent) > 256:
+            self._recent.popitem(last=False)
+        self.files.add(filename)
+        self.logger.info(f"Screenshot saved: {path}")
+
+    def _remove_indexes(self, segments: list[str]):
+        """Remove the index files of archive segments removed by retention"""
+        for segment in segments:
+            try:
+                os.remove(os.path.join(self.directory, segment[:-len(DATA_EXTENSION)] + INDEX_EXTENSION))
+            except FileNotFoundError:
+                pass
+
+    def close(self, timeout: Optional[float] = None):
+        """Write the queued screenshots and stop the writer"""
+        self.writer.close(timeout)
+        if self.archive:
+            self.archive.close()
+
+    def get_stats(self) -> dict:
+        """
+        Get storage statistics.
+
+        Returns:
+            Dictionary with writer counts, deduplicated frames, removed files and total size
+        """
+        return {
+            **self.writer.get_stats(),
+            "deduplicated": self.deduplicated,
+            "keyframes": self.archive.keyframes if self.archive else 0,
+            "deltas": self.archive.deltas if self.archive else 0,
+            "removed": self.files.removed,
+            "total_bytes": self.files.total_bytes,
+        }
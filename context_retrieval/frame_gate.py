@@ -0,0 +1,171 @@
+"""
+Frame Gate Module
+
+This module decides whether a new screenshot differs enough from the last analyzed
+one to be worth sending to the Claude API, using a perceptual (difference) hash. The
+reference frame only moves once a frame is actually extracted (accept), so frames that
+were dropped or dismissed by the triage are not mistaken for the last analyzed one.
+"""
+
+from typing import Optional
+from PIL import Image
+import logging
+
+
+class FrameGate:
+    """Skips analysis of frames that are perceptually similar to the last analyzed frame"""
+
+    def __init__(self, threshold: int = 5, hash_size: int = 8):
+        """
+        Initialize frame gate.
+
+        Args:
+            threshold: Maximum Hamming distance between hashes for two frames to be
+                considered the same screen
+            hash_size: Width/height of the hash grid (hash has hash_size * hash_size bits)
+        """
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.logger = logging.getLogger(__name__)
+
+        # Hash of the last extracted frame
+        self.reference_hash: Optional[int] = None
+        # Hash of the last frame the triage found not worth extracting
+        self.dismissed_hash: Optional[int] = None
+        # Hash and distance of the last checked frame
+        self.last_hash: Optional[int] = None
+        self.last_distance: Optional[int] = None
+
+        # Counters
+        self.analyzed_count = 0
+        self.skipped_count = 0
+
+    def compute_hash(self, image: Image.Image) -> int:
+        """
+        Compute the difference hash (dHash) of an image.
+
+        The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail and
+        each bit records whether a pixel is brighter than its right-hand neighbour.
+
+        Args:
+            image: PIL Image object
+
+        Returns:
+            Hash as an integer with hash_size * hash_size bits
+        """
+        thumbnail = image.convert("L").resize(
+            (self.hash_size + 1, self.hash_size),
+            Image.Resampling.BILINEAR
+        )
+        # Grayscale pixels are one byte each, in row order
+        pixels = thumbnail.tobytes()
+        width = self.hash_size + 1
+
+        value = 0
+        for row in range(self.hash_size):
+            offset = row * width
+            for col in range(self.hash_size):
+                value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+        return value
+
+    @staticmethod
+    def hamming_distance(hash_a: int, hash_b: int) -> int:
+        """
+        Count the bits that differ between two hashes.
+
+        Args:
+            hash_a: First hash
+            hash_b: Second hash
+
+        Returns:
+            Number of differing bits
+        """
+        return bin(hash_a ^ hash_b).count("1")
+
+    def distance(self, frame_hash: int) -> Optional[int]:
+        """
+        Measure how far a frame is from the last extracted frame.
+
+        Args:
+            frame_hash: Hash from compute_hash
+
+        Returns:
+            Hamming distance to the reference frame, or None if there is none
+        """
+        if self.reference_hash is None:
+            return None
+        return self.hamming_distance(frame_hash, self.reference_hash)
+
+    def should_analyze(self, image: Image.Image, force: bool = False) -> bool:
+        """
+        Check whether a frame has changed enough to be analyzed.
+
+        Frames are compared against the last extracted frame, not the previous capture,
+        so slow gradual changes still trigger an analysis eventually. Frames close to
+        the last dismissed frame are skipped as well. The frame's hash is kept in
+        last_hash; call accept with it once the frame has been extracted.
+
+        Args:
+            image: PIL Image object of the new frame
+            force: Let the frame through regardless of similarity
+
+        Returns:
+            True if the frame should be analyzed, False if it can be skipped
+        """
+        frame_hash = self.compute_hash(image)
+        self.last_hash = frame_hash
+        self.last_distance = self.distance(frame_hash)
+        dismissed = (
+            self.dismissed_hash is not None
+            and self.hamming_distance(frame_hash, self.dismissed_hash) <= self.threshold
+        )
+
+        if force or self.last_distance is None or (self.last_distance > self.threshold and not dismissed):
+            self.logger.debug(f"Frame changed (distance: {self.last_distance})")
+            return True
+
+        self.skipped_count += 1
+        self.logger.debug(f"Frame unchanged (distance: {self.last_distance}), skipping analysis")
+        return False
+
+    def accept(self, frame_hash: int):
+        """
+        Make an extracted frame the reference later frames are compared against.
+
+        Args:
+            frame_hash: Hash of the extracted frame
+        """
+        self.reference_hash = frame_hash
+        self.dismissed_hash = None
+        self.analyzed_count += 1
+
+    def dismiss(self, frame_hash: int):
+        """
+        Remember a frame that changed but was not worth extracting, so the same screen
+        isn't checked again on every capture.
+
+        Args:
+            frame_hash: Hash of the dismissed frame
+        """
+        self.dismissed_hash = frame_hash
+
+    def reset(self):
+        """Forget the reference frame so the next frame is always analyzed"""
+        self.reference_hash = None
+        self.dismissed_hash = None
+        self.last_hash = None
+        self.last_distance = None
+
+    def get_stats(self) -> dict:
+        """
+        Get gate statistics.
+
+        Returns:
+            Dictionary with extracted (analyzed) and skipped frame counts and the skip ratio
+        """
+        total = self.analyzed_count + self.skipped_count
+        return {
+            "analyzed": self.analyzed_count,
+            "skipped": self.skipped_count,
+            "skip_ratio": self.skipped_count / total if total else 0.0,
+        }
@@ -0,0 +1,153 @@
+"""
+Image Encoding Module
+
+This module prepares screenshots for the Claude API. It picks the resolution, colour
+mode and codec so that an image stays within a target token budget while text on the
+screen remains legible.
+"""
+
+import base64
+import io
+import math
+import time
+from dataclasses import dataclass
+from PIL import Image
+import logging
+
+
+# Media types of the image formats accepted by the Claude API
+MEDIA_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+# Claude uses roughly one token per 750 pixels of an image
+PIXELS_PER_TOKEN = 750
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Estimate the number of input tokens an image costs.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Estimated token count
+    """
+    return math.ceil(width * height / PIXELS_PER_TOKEN)
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    encode_seconds: float = 0.0
+
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_image_tokens(self.width, self.height)
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+
+class ImageEncoder:
+    """Encodes images for the Claude API within a token budget"""
+
+    def __init__(self, format: str = "PNG", token_budget: int | None = None,
+                 grayscale: bool = False, quality: int = 85, min_scale: float = 0.5):
+        """
+        Initialize image encoder.
+
+        Args:
+            format: Output format (PNG, JPEG or WEBP)
+            token_budget: Maximum estimated image tokens, or None to keep native resolution
+            grayscale: Whether to drop colour information
+            quality: Encoder quality for lossy formats (1-100)
+            min_scale: Smallest allowed scale relative to the native resolution, so text
+                stays legible even if the budget can't be met
+        """
+        format = format.upper()
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported image format: {format}")
+
+        self.format = format
+        self.token_budget = token_budget
+        self.grayscale = grayscale
+        self.quality = quality
+        self.min_scale = min_scale
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def media_type(self) -> str:
+        """Media type of the encoded images"""
+        return MEDIA_TYPES[self.format]
+
+    def target_size(self, width: int, height: int) -> tuple[int, int]:
+        """
+        Compute the output resolution for an image.
+
+        Args:
+            width: Native image width in pixels
+            height: Native image height in pixels
+
+        Returns:
+            Tuple of (width, height) that fits the token budget
+        """
+        if not self.token_budget:
+            return width, height
+
+        max_pixels = self.token_budget * PIXELS_PER_TOKEN
+        if width * height <= max_pixels:
+            return width, height
+
+        scale = math.sqrt(max_pixels / (width * height))
+        if scale < self.min_scale:
+            self.logger.debug(
+                f"Token budget needs scale {scale:.2f}, keeping {self.min_scale:.2f} for legibility"
+            )
+            scale = self.min_scale
+
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def encode(self, image: Image.Image) -> EncodedImage:
+        """
+        Resize, convert and encode an image.
+
+        Args:
+            image: PIL Image object
+
+        Returns:
+            EncodedImage with the encoded bytes and their media type
+        """
+        start = time.perf_counter()
+
+        size = self.target_size(image.width, image.height)
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+
+        if self.grayscale:
+            image = image.convert("L")
+        if self.format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        elif self.format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffered = io.BytesIO()
+        if self.format == "PNG":
+            image.save(buffered, format=self.format, optimize=False)
+        else:
+            image.save(buffered, format=self.format, quality=self.quality)
+
+        return EncodedImage(
+            data=buffered.getvalue(),
+            media_type=self.media_type,
+            width=image.width,
+            height=image.height,
+            encode_seconds=time.perf_counter() - start,
+        )
@@ -1,20 +1,76 @@
-import json
 import os
 import sys
-import re
-from datetime import datetime
+import threading
 
 from dataclasses import dataclass
 
-from anthropic import Anthropic
-
 # Add parent directory to path to import main config
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config as main_config
 
-# Summary history file path (defined here to avoid import issues)
-SUMMARY_HISTORY_FILE = "context_retrieval/summary_history.txt"
+from context_retrieval.api_client import get_client
+from context_retrieval.api_usage import usage_tracker
+from context_retrieval.resilience import call_with_retry, EmptyResponseError
+from context_retrieval.triage import triage_router, content_hash
+from context_retrieval.rolling_summary import RollingSummary
+from context_retrieval.session_store import SessionStore
+from context_retrieval.context_model import Context
+from context_retrieval import config as retrieval_config
+
+# Static summary instructions, sent as system prompts ahead of the session content.
+# Updates only write a new entry; older entries are compacted into digests by the
+# rolling summary, so the summary is never rewritten as a whole
+SUMMARY_ENTRY_PROMPT = """You are helping a student track their learning progress. You will be given the student's learning objective, the summary of their learning activities so far (if any) and the new screen content from the latest screenshot.
+
+Task: Determine if the new screen content represents relevant changes or progress in the student's learning journey (new topics explored, different resources visited, progress made, etc.) that the summary doesn't cover yet. If it does, describe the new activity.
+
+The new entry should:
+1. Be one or two sentences - concise but informative
+2. Highlight key topics, resources, and facts related to the learning objective
+3. Focus on the learning journey - what has been studied, explored, or researched
+
+Output ONLY the new entry text (no extra formatting, no explanations, no titles). If no relevant changes are detected, output exactly NO_CHANGE."""
+
+SUMMARY_COMPACT_PROMPT = """You are helping a student track their learning progress. You will be given the student's learning objective and a chronological list of their learning activities.
+
+Task: Compact these activities into one short chronological digest paragraph. Keep the key topics, resources, and facts related to the learning objective, and the time range they cover; drop repetition and details that don't matter for the learning journey.
+
+Output ONLY the digest text (no extra formatting, no explanations, no titles)."""
+
+# Answer of the summary entry prompt when the screen adds nothing to the summary
+NO_CHANGE = "NO_CHANGE"
+
+FINAL_SUMMARY_PROMPT = """You are creating a final learning session summary for a student. You will be given the student's learning objective, the raw history of the session and, if they were recorded, the pages the student had on screen.
+
+Task: Transform this raw history into a beautiful, well-formatted markdown summary that the student can read to understand their progress. Include:
+
+1. **Session Overview** - When it started, main topics covered
+2. **Key Topics Explored** - List the main subjects/areas studied
+3. **Facts & Concepts Learned** - Important facts, concepts, or information discovered (only relevant to the learning objective)
+4. **Resources Used** - Websites, articles, or tools visited
+5. **Progress Made** - What was accomplished during the session
+
+Make it inspiring and encouraging. Use proper markdown formatting:
+- Use # for title, ## for sections
+- Use **bold** for emphasis
+- Use bullet points (-) for lists
+- Keep it concise but informative
+- Focus only on relevant facts related to the learning objective
+
+Output ONLY the markdown text."""
+
+SUMMARY_AND_LINKS_PROMPT = main_config.CLAUDE_ROLE + """
+You are also tracking the student's learning progress. You will be given the student's learning objective, the summary of their learning activities so far (if any), the new screen content from the latest screenshot and the urls the student already visited.
+
+Do both of the following in a single call to the record_summary_and_links tool:
+
+1. Summary: Determine if the new screen content represents relevant changes or progress in the student's learning journey (new topics explored, different resources visited, progress made, etc.) that the summary doesn't cover yet. If it does, set summary_changed to true and describe the new activity as the new_entry: one or two concise sentences highlighting key topics, resources, and facts related to the learning objective (no extra formatting, no explanations, no titles). If the content is essentially the same or not relevant, set summary_changed to false and leave new_entry empty.
+
+2. Links: """ + main_config.LINK_GENERATION_INSTRUCTION + """
+
+Important: consider student learning objective when generating the summary and links
+"""
 
 
 @dataclass
@@ -29,135 +85,270 @@ class Insights:
     links: list[Link] | None = None
     suggestions: str | None = None
 
-# Read visited URLs from environment variable (comma-separated)
-visited_urls_env = os.getenv('VISITED_URLS', '')
-visited_urls = set(url.strip() for url in visited_urls_env.split(',') if url.strip()) if visited_urls_env else set()
+
+# Tool schemas the link/insight calls are forced to answer with, so the response is
+# parsed straight into Link/Insights objects instead of stripping fences off free text
+LINK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "url": {"type": "string", "description": "Web page url"},
+        "summary": {"type": "string", "description": "Short description, 8 words max"},
+    },
+    "required": ["url", "summary"],
+}
+
+RECORD_LINKS_TOOL = {
+    "name": "record_links",
+    "description": "Record the suggested web pages.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "links": {"type": "array", "items": LINK_SCHEMA},
+        },
+        "required": ["links"],
+    },
+}
+
+RECORD_INSIGHTS_TOOL = {
+    "name": "record_insights",
+    "description": "Record the summary, suggested web pages and learning suggestions.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "links": {"type": "array", "items": LINK_SCHEMA},
+            "suggestions": {"type": "string"},
+        },
+        "required": ["summary", "links", "suggestions"],
+    },
+}
+
+RECORD_SUMMARY_AND_LINKS_TOOL = {
+    "name": "record_summary_and_links",
+    "description": "Record the updated learning summary and the suggested web pages.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "summary_changed": {
+                "type": "boolean",
+                "description": "Whether the screen content adds relevant learning progress to the summary",
+            },
+            "new_entry": {
+                "type": "string",
+                "description": "The new learning activity to add to the summary, or empty if summary_changed is false",
+            },
+            "links": {"type": "array", "items": LINK_SCHEMA},
+        },
+        "required": ["summary_changed", "new_entry", "links"],
+    },
+}
+
+# URLs visited in the current session, loaded from the session store when it is opened
+visited_urls: set[str] = set()
 
 def _add_visited_url(url: str | None) -> None:
-    """Add a URL to visited_urls set and update the VISITED_URLS environment variable."""
-    if url:
+    """Add a URL to visited_urls set and record it in the session store."""
+    if url and url not in visited_urls:
         visited_urls.add(url)
-        # Update environment variable with comma-separated URLs
-        os.environ['VISITED_URLS'] = ', '.join(sorted(visited_urls))
+        get_session_store().append("visited_url", url=url)
+
+def _insight_context_message(learning_objective: str, context: str | Context) -> dict:
+    """Build the per-call user message with the learning objective and screen content."""
+    return {
+        "role": "user",
+        "content": main_config.INSIGHT_CONTEXT_PROMPT.format(
+            learning_objective=learning_objective,
+            text=context,
+            visited_urls=", ".join(sorted(visited_urls)) if visited_urls else "none",
+        ),
+    }
+
+
+def _response_text(response) -> str | None:
+    """Return the text of the response's first non-empty text block, or None."""
+    for block in response.content or []:
+        if getattr(block, "type", None) == "text" and block.text:
+            return block.text
+    return None
+
+
+def _tool_input(response, tool: dict) -> dict | None:
+    """Return the input of the response's call to the given tool, or None."""
+    for block in response.content or []:
+        if getattr(block, "type", None) == "tool_use" and block.name == tool["name"]:
+            return block.input
+    return None
+
+
+def _create_message(call_site: str, tool: dict | None = None, **request):
+    """
+    Make an API call through the shared retry policy and circuit breaker.
+    Responses without the expected content are treated as transient failures and retried.
+
+    Args:
+        call_site: Name used for usage tracking and logging
+        tool: Tool schema the model is forced to answer with (free text if None)
+        **request: Arguments for client.messages.create
+
+    Returns:
+        The API response, or None if all attempts failed
+    """
+    client = get_client(main_config.ANTHROPIC_API_KEY)
+    if tool:
+        request.update(tools=[tool], tool_choice={"type": "tool", "name": tool["name"]})
+
+    def attempt():
+        response = client.messages.create(**request)
+        usage_tracker.record(call_site, response.usage)
+        if tool and _tool_input(response, tool) is None:
+            raise EmptyResponseError(f"{call_site}: no {tool['name']} call in response")
+        if not tool and _response_text(response) is None:
+            raise EmptyResponseError(f"{call_site}: no text content in response")
+        return response
 
-def generate_links(learning_objective: str, context: str) -> Insights | None:
-    client = Anthropic(api_key=main_config.ANTHROPIC_API_KEY)
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        print(f"Generating links... Attempt {attempt + 1} of {max_retries}")
-        response = client.messages.create(
-        model=main_config.CLAUDE_MODEL,
-        messages=[
-            {
-                "role": "user", 
-                "content": main_config.INSIGHT_GENERATION_PROMPT.format(
-                    learning_objective=learning_objective,
-                    text=context,
-                    instructions=main_config.LINK_GENERATION_INSTRUCTION.format(visited_urls=", ".join(visited_urls) if visited_urls else "none"),
-                    output_format='{"links": [{"url": "https://link.com", "summary": "link summary"}]}',
-                ),
-            }
-        ],
-            max_tokens=1000,
-        )
-        # Check if the assistant's message content is not None, break if it's valid
-        if response.content and response.content[0].text:
-            break
-        print(f"Error: {response.content[0].text}")
-    
-    # Get the assistant's message content (assume only one message and one content block)
-    raw_output = response.content[0].text if response.content else None
-    raw_output = re.sub(r'\n```\n*$', '', re.sub(r'^```json\n', '', raw_output))
-    if raw_output is None:
-        return None
     try:
-        data = json.loads(raw_output)
-        # Convert link dictionaries to Link objects
-        if 'links' in data and isinstance(data['links'], list):
-            data['links'] = [Link(**link) if isinstance(link, dict) else link for link in data['links']]
-        _add_visited_url(data['links'][0].url if data['links'] else None)
-        return Insights(**data)
-    except (json.JSONDecodeError, TypeError):
+        return call_with_retry(attempt, call_site=call_site)
+    except Exception as e:
+        print(f"Error in {call_site}: {e}")
         return None
 
-def generate_insights(learning_objective: str, context: str) -> Insights | None:
-    client = Anthropic(api_key=main_config.ANTHROPIC_API_KEY)
-
-    max_retries = 3
-    for attempt in range(max_retries):
-        print(f"Generating insights... Attempt {attempt + 1} of {max_retries}")
-        response = client.messages.create(
-            model=main_config.CLAUDE_MODEL,
-            messages=[
-                {
-                    "role": "user", 
-                    "content": main_config.INSIGHT_GENERATION_PROMPT.format(
-                        learning_objective=learning_objective,
-                        text=context,
-                        instructions="; ".join([main_config.SUMMARY_GENERATION_INSTRUCTION, main_config.LINK_GENERATION_INSTRUCTION.format(visited_urls=", ".join(visited_urls) if visited_urls else "none"), main_config.SUGGESTIONS_GENERATION_INSTRUCTION]),
-                        output_format='{"summary": "...", "links": [{"url": "https://link.com", "summary": "link summary"}], "suggestions": "..."}',
-                    ),
-                }
-            ],
-            max_tokens=1000,
-        )
-        # Check if the assistant's message content is not None, break if it's valid
-        if response.content and response.content[0].text:
-            break
-        print(f"Error: {response.content[0].text}")
-    
-    # Get the assistant's message content (assume only one message and one content block)
-    raw_output = response.content[0].text if response.content else None
-    raw_output = re.sub(r'\n```\n*$', '', re.sub(r'^```json\n', '', raw_output))
-    if raw_output is None:
-        return None
-    try:
-        data = json.loads(raw_output)
-        # Convert link dictionaries to Link objects
-        if 'links' in data and isinstance(data['links'], list):
-            data['links'] = [Link(**link) if isinstance(link, dict) else link for link in data['links']]
-        _add_visited_url(data['links'][0].url if data['links'] else None)
-        return Insights(**data)
-    except (json.JSONDecodeError, TypeError):
+
+def _parse_insights(response, tool: dict) -> Insights | None:
+    """Build Insights from the response's tool call."""
+    data = _tool_input(response, tool) if response is not None else None
+    if not isinstance(data, dict):
         return None
+    links = [
+        Link(summary=link.get("summary"), url=link.get("url"))
+        for link in data.get("links") or []
+        if isinstance(link, dict)
+    ]
+    _add_visited_url(links[0].url if links else None)
+    return Insights(summary=data.get("summary"), links=links, suggestions=data.get("suggestions"))
+
+
+def generate_links(learning_objective: str, context: str | Context) -> Insights | None:
+    print("Generating links...")
+    response = _create_message(
+        "generate_links",
+        tool=RECORD_LINKS_TOOL,
+        model=main_config.CLAUDE_MODEL,
+        system=main_config.INSIGHT_GENERATION_PROMPT.format(
+            instructions=main_config.LINK_GENERATION_INSTRUCTION,
+            output_format=f"a call to the {RECORD_LINKS_TOOL['name']} tool",
+        ),
+        messages=[_insight_context_message(learning_objective, context)],
+        max_tokens=1000,
+    )
+    return _parse_insights(response, RECORD_LINKS_TOOL)
+
+def generate_insights(learning_objective: str, context: str | Context) -> Insights | None:
+    print("Generating insights...")
+    response = _create_message(
+        "generate_insights",
+        tool=RECORD_INSIGHTS_TOOL,
+        model=main_config.CLAUDE_MODEL,
+        system=main_config.INSIGHT_GENERATION_PROMPT.format(
+            instructions="; ".join([main_config.SUMMARY_GENERATION_INSTRUCTION, main_config.LINK_GENERATION_INSTRUCTION, main_config.SUGGESTIONS_GENERATION_INSTRUCTION]),
+            output_format=f"a call to the {RECORD_INSIGHTS_TOOL['name']} tool",
+        ),
+        messages=[_insight_context_message(learning_objective, context)],
+        max_tokens=1000,
+    )
+    return _parse_insights(response, RECORD_INSIGHTS_TOOL)
 
 
 # Summary history management
-def load_summary_history() -> str:
+_rolling_summaries: dict[str, RollingSummary] = {}
+_rolling_summaries_lock = threading.Lock()
+
+
+def get_rolling_summary() -> RollingSummary:
     """
-    Load the existing summary history from file.
+    Get the rolling summary recorded in the session store at config.SESSION_STORE_FILE.
     
     Returns:
-        The existing summary history, or empty string if file doesn't exist
+        RollingSummary for the current session
     """
-    if not os.path.exists(SUMMARY_HISTORY_FILE):
-        return ""
+    with _rolling_summaries_lock:
+        summary = _rolling_summaries.get(retrieval_config.SESSION_STORE_FILE)
+        if summary is None:
+            store = SessionStore(
+                retrieval_config.SESSION_STORE_FILE,
+                write_batch=retrieval_config.SESSION_STORE_WRITE_BATCH,
+                write_interval=retrieval_config.SESSION_STORE_WRITE_INTERVAL,
+                max_age=retrieval_config.SESSION_STORE_MAX_AGE
+            )
+            summary = RollingSummary(
+                store,
+                recent_entries=retrieval_config.SUMMARY_RECENT_ENTRIES,
+                compact_batch=retrieval_config.SUMMARY_COMPACT_BATCH,
+                max_digests=retrieval_config.SUMMARY_MAX_DIGESTS,
+                compact=compact_summary_entries
+            )
+            visited_urls.clear()
+            visited_urls.update(store.visited_urls())
+            usage_tracker.set_sink(lambda call_site, counts: store.append("usage", call_site=call_site, **counts))
+            _rolling_summaries[retrieval_config.SESSION_STORE_FILE] = summary
+        return summary
+
+
+def import_summary_history(path: str | None) -> bool:
+    """
+    Import the summary file of an earlier version into a newly created session store.
     
-    try:
-        with open(SUMMARY_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return f.read().strip()
-    except Exception as e:
-        print(f"Error loading summary history: {e}")
-        return ""
+    The file is left in place; a store that already existed is never imported into,
+    so the summary is imported only once.
+    
+    Args:
+        path: Summary history file of an earlier version (None to skip the import)
+    
+    Returns:
+        True if the summary was imported, False otherwise
+    """
+    if not path or not os.path.exists(path):
+        return False
+    summary = get_rolling_summary()
+    if not summary.store.created or not summary.is_empty():
+        return False
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if not text:
+        return False
+    summary.replace(text)
+    print(f"Imported summary history from: {path}")
+    return True
+
+
+def get_session_store() -> SessionStore:
+    """
+    Get the store of the current session.
+    
+    Returns:
+        SessionStore at config.SESSION_STORE_FILE
+    """
+    return get_rolling_summary().store
+
+
+def load_summary_history() -> str:
+    """
+    Load the existing summary history from memory; the store is only read once.
+    
+    Returns:
+        The existing summary history, or empty string if there is none
+    """
+    return get_rolling_summary().render()
 
 
 def save_summary_history(summary: str):
     """
-    Save the updated summary history to file.
+    Replace the summary history with the given text.
     
     Args:
-        summary: The updated summary to save
+        summary: The summary to save; it becomes the digest of all earlier activities
     """
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(SUMMARY_HISTORY_FILE), exist_ok=True)
-    
-    try:
-        with open(SUMMARY_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            f.write(summary)
-        print(f"Summary history saved to: {SUMMARY_HISTORY_FILE}")
-    except Exception as e:
-        print(f"Error saving summary history: {e}")
+    get_rolling_summary().replace(summary)
+    print(f"Summary history saved to: {retrieval_config.SESSION_STORE_FILE}")
 
 
 def flush_summary_history():
@@ -165,109 +356,155 @@ def flush_summary_history():
     Flush/clear the summary history (start a new session).
     """
     try:
-        if os.path.exists(SUMMARY_HISTORY_FILE):
-            os.remove(SUMMARY_HISTORY_FILE)
-            print("Summary history flushed for new session")
+        get_rolling_summary().clear()
+        visited_urls.clear()
+        print("Summary history flushed for new session")
         return True
     except Exception as e:
         print(f"Error flushing summary history: {e}")
         return False
 
 
-def update_summary_history(learning_objective: str, new_context: str) -> str | None:
+def compact_summary_entries(texts: list[str]) -> str | None:
+    """
+    Compact chronological summary entries (or digests) into one digest.
+    
+    Args:
+        texts: Entries or digests, oldest first
+    
+    Returns:
+        The digest, or None if compaction failed
+    """
+    learning_objective = os.getenv("LEARNING_OBJECTIVE") or "not set"
+    activities = "\n\n".join(texts)
+    response = _create_message(
+        "compact_summary",
+        model=main_config.CLAUDE_MODEL,
+        system=SUMMARY_COMPACT_PROMPT,
+        messages=[
+            {
+                "role": "user",
+                "content": f"""Student's Learning Objective:
+{learning_objective}
+
+Learning Activities:
+{activities}"""
+            }
+        ],
+        max_tokens=retrieval_config.SUMMARY_DIGEST_MAX_TOKENS,
+    )
+    if response is None:
+        return None
+    return _response_text(response).strip()
+
+
+def update_summary_history(learning_objective: str, new_context: str | Context) -> str | None:
     """
     Update the summary history with new context from screenshot analysis.
-    This function reads the existing summary, analyzes the new context,
-    and updates the summary if relevant changes happened.
+    The model is given the bounded rolling summary and the new context, and writes
+    a new entry if relevant changes happened; older entries are compacted into
+    digests in the background.
     
     Args:
         learning_objective: The student's learning objective for the session
-        new_context: The new context extracted from the latest screenshot (XML format)
+        new_context: The new context extracted from the latest screenshot (a Context or its XML)
     
     Returns:
         The updated summary, or None if update failed
     """
-    client = Anthropic(api_key=main_config.ANTHROPIC_API_KEY)
+    rolling_summary = get_rolling_summary()
+    existing_summary = rolling_summary.prompt_view()
     
-    # Load existing summary
-    existing_summary = load_summary_history()
+    # Only ask the large model for a new entry if the triage finds relevant changes
+    if retrieval_config.TRIAGE_ENABLED and not triage_router.needs_summary_update(
+            learning_objective, existing_summary, new_context):
+        print("No relevant changes, keeping the summary unchanged")
+        return rolling_summary.render()
     
-    # Build the prompt for updating the summary
-    if existing_summary:
-        prompt = f"""You are helping a student track their learning progress. 
-
-Student's Learning Objective:
-{learning_objective}
-
-Previous Summary of Research/Learning Activities:
-{existing_summary}
+    # Static instructions first, then the session-specific content; the
+    # summary in the prompt is bounded by the rolling summary's tiers
+    prompt = _summary_context_prompt(learning_objective, existing_summary, new_context)
+    
+    print("Updating summary history...")
+    response = _create_message(
+        "update_summary",
+        model=main_config.CLAUDE_MODEL,
+        system=SUMMARY_ENTRY_PROMPT,
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        max_tokens=retrieval_config.SUMMARY_ENTRY_MAX_TOKENS,
+    )
+    if response is None:
+        return None
+    triage_router.mark_summarized(content_hash(new_context))
 
-New Screen Content (from latest screenshot):
-{new_context}
+    new_entry = _response_text(response).strip()
+    if not new_entry or new_entry.startswith(NO_CHANGE):
+        return rolling_summary.render()
+    return rolling_summary.add_entry(new_entry)
 
-Task: Analyze the new screen content and determine if it represents relevant changes or progress in the student's learning journey. If there are relevant changes (new topics explored, different resources visited, progress made, etc.), update the summary to include this new information. If the content is essentially the same or not relevant, keep the existing summary unchanged.
 
-The updated summary should:
-1. Be chronological - capture the progression of learning activities
-2. Be concise but informative - highlight key topics, resources, and activities
-3. Focus on the learning journey - what has been studied, explored, or researched
-4. Include timestamps or time references where appropriate
-5. Grow over time as new relevant activities are detected
+def update_summary_and_links(learning_objective: str, new_context: str | Context) -> tuple[str | None, Insights | None]:
+    """
+    Update the summary history and generate links with a single API call.
+    The learning objective and screen content are sent once instead of once per call,
+    and the summary update and link generation share one round trip.
+    
+    Args:
+        learning_objective: The student's learning objective for the session
+        new_context: The new context extracted from the latest screenshot (a Context or its XML)
+    
+    Returns:
+        Tuple of the updated summary (None if the update failed) and the generated
+        links (None if generation failed)
+    """
+    rolling_summary = get_rolling_summary()
+    existing_summary = rolling_summary.prompt_view()
+    
+    # If the triage finds nothing new for the summary, only the links are needed
+    if retrieval_config.TRIAGE_ENABLED and not triage_router.needs_summary_update(
+            learning_objective, existing_summary, new_context):
+        print("No relevant changes, keeping the summary unchanged")
+        return rolling_summary.render(), generate_links(learning_objective, new_context)
+    
+    prompt = _summary_context_prompt(learning_objective, existing_summary, new_context)
+    prompt += f"\n\nAlready visited urls: {', '.join(sorted(visited_urls)) if visited_urls else 'none'}"
+    
+    print("Updating summary history and generating links...")
+    response = _create_message(
+        "summary_and_links",
+        tool=RECORD_SUMMARY_AND_LINKS_TOOL,
+        model=main_config.CLAUDE_MODEL,
+        system=SUMMARY_AND_LINKS_PROMPT,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=retrieval_config.SUMMARY_ENTRY_MAX_TOKENS + 500,
+    )
+    if response is None:
+        return None, None
+    triage_router.mark_summarized(content_hash(new_context))
+    
+    data = _tool_input(response, RECORD_SUMMARY_AND_LINKS_TOOL)
+    insights = _parse_insights(response, RECORD_SUMMARY_AND_LINKS_TOOL)
+    new_entry = str(data.get("new_entry") or "").strip()
+    if (data.get("summary_changed") or rolling_summary.is_empty()) and new_entry:
+        return rolling_summary.add_entry(new_entry), insights
+    return rolling_summary.render(), insights
 
-Output ONLY the updated summary text (no extra formatting, no explanations, no titles). If no relevant changes detected, output the existing summary unchanged."""
-    else:
-        prompt = f"""You are helping a student track their learning progress. 
 
-Student's Learning Objective:
+def _summary_context_prompt(learning_objective: str, existing_summary: str, new_context: str | Context) -> str:
+    """Build the session-specific part of a summary update prompt."""
+    return f"""Student's Learning Objective:
 {learning_objective}
 
-Screen Content (from first screenshot):
-{new_context}
-
-Task: Create the initial summary of the student's learning activities based on the screen content. This is the beginning of tracking their learning journey.
+Summary of Research/Learning Activities So Far:
+{existing_summary or "None yet, this is the first screenshot of the session"}
 
-The summary should:
-1. Be concise but informative - highlight key topics, resources, and activities
-2. Focus on what the student is currently studying or researching
-3. Include a timestamp reference for this first entry
-
-Output ONLY the summary text (no extra formatting, no explanations, no titles)."""
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        print(f"Updating summary history... Attempt {attempt + 1} of {max_retries}")
-        try:
-            response = client.messages.create(
-                model=main_config.CLAUDE_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=2000,
-            )
-            
-            # Get the updated summary
-            if response.content and response.content[0].text:
-                updated_summary = response.content[0].text.strip()
-                
-                # Add timestamp to the update
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                if not existing_summary:
-                    # First entry
-                    updated_summary = f"[Session Started: {timestamp}]\n\n{updated_summary}"
-                
-                # Save the updated summary
-                save_summary_history(updated_summary)
-                
-                return updated_summary
-            else:
-                print(f"Error: No content in response")
-        except Exception as e:
-            print(f"Error in attempt {attempt + 1}: {e}")
-    
-    return None
+New Screen Content (from latest screenshot):
+{new_context}"""
 
 
 def get_current_summary() -> str:
@@ -291,59 +528,38 @@ def generate_final_summary(learning_objective: str) -> str | None:
     Returns:
         Formatted markdown summary, or None if generation failed
     """
-    client = Anthropic(api_key=main_config.ANTHROPIC_API_KEY)
-    
     # Load the raw summary history
     raw_summary = load_summary_history()
     
     if not raw_summary:
         return "# Learning Session Summary\n\nNo learning activity detected in this session yet."
     
-    prompt = f"""You are creating a final learning session summary for a student.
-
-Student's Learning Objective:
+    prompt = f"""Student's Learning Objective:
 {learning_objective}
 
 Raw Session History:
-{raw_summary}
-
-Task: Transform this raw history into a beautiful, well-formatted markdown summary that the student can read to understand their progress. Include:
-
-1. **Session Overview** - When it started, main topics covered
-2. **Key Topics Explored** - List the main subjects/areas studied
-3. **Facts & Concepts Learned** - Important facts, concepts, or information discovered (only relevant to the learning objective)
-4. **Resources Used** - Websites, articles, or tools visited
-5. **Progress Made** - What was accomplished during the session
-
-Make it inspiring and encouraging. Use proper markdown formatting:
-- Use # for title, ## for sections
-- Use **bold** for emphasis
-- Use bullet points (-) for lists
-- Keep it concise but informative
-- Focus only on relevant facts related to the learning objective
-
-Output ONLY the markdown text."""
+{raw_summary}"""
     
-    max_retries = 3
-    for attempt in range(max_retries):
-        print(f"Generating final summary... Attempt {attempt + 1} of {max_retries}")
-        try:
-            response = client.messages.create(
-                model=main_config.CLAUDE_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=2000,
-            )
-            
-            if response.content and response.content[0].text:
-                return response.content[0].text.strip()
-            else:
-                print(f"Error: No content in response")
-        except Exception as e:
-            print(f"Error in attempt {attempt + 1}: {e}")
+    # Pages come from the store's tab index, in the order they were first on screen;
+    # frames are only stored when contexts are saved
+    pages = get_session_store().visited_pages()
+    if pages:
+        page_list = "\n".join(f"- {name} ({url})" for url, name in pages)
+        prompt += f"\n\nPages On Screen:\n{page_list}"
     
-    return None
\ No newline at end of file
+    print("Generating final summary...")
+    response = _create_message(
+        "final_summary",
+        model=main_config.CLAUDE_MODEL,
+        system=FINAL_SUMMARY_PROMPT,
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        max_tokens=2000,
+    )
+    if response is None:
+        return None
+    return _response_text(response).strip()
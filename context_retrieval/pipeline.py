@@ -0,0 +1,301 @@
+"""
+Pipeline Module
+
+This module runs the context retrieval stages (encode, analyze, summarize, links) as a
+pipeline of worker threads connected by bounded queues. Each stage has its own
+parallelism, and when a stage falls behind, the oldest waiting item is dropped in favour
+of the newest one, so sustained throughput is bound by the slowest stage instead of the
+sum of all stages, and the pipeline always works on the freshest screen.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Optional, Callable, Any
+import logging
+
+from context_retrieval.pipeline_metrics import StageTimings
+
+
+class PipelineClosed(Exception):
+    """Raised when getting from a closed, empty queue"""
+
+
+class DropOldestQueue:
+    """Bounded FIFO queue that drops its oldest item when a new one doesn't fit"""
+
+    def __init__(self, maxsize: int = 1):
+        """
+        Initialize queue.
+
+        Args:
+            maxsize: Maximum number of waiting items
+        """
+        self.maxsize = maxsize
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item: Any) -> Optional[Any]:
+        """
+        Add an item, dropping the oldest one if the queue is full.
+
+        Args:
+            item: Item to add
+
+        Returns:
+            The dropped item, or None if nothing was dropped
+        """
+        with self._condition:
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+            return dropped
+
+    def get(self) -> Any:
+        """
+        Remove and return the oldest item, blocking until one is available.
+
+        Raises:
+            PipelineClosed: If the queue was closed and is empty
+        """
+        with self._condition:
+            while not self._items:
+                if self._closed:
+                    raise PipelineClosed()
+                self._condition.wait()
+            return self._items.popleft()
+
+    def close(self):
+        """Wake up all waiting getters; items already queued are still handed out"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._items)
+
+
+class Stage:
+    """One pipeline stage: a queue and the worker threads that consume it"""
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1,
+                 queue_size: int = 1):
+        """
+        Initialize stage.
+
+        Args:
+            name: Stage name, used for timings and logging
+            handler: Called with each item; its return value is passed to the downstream
+                stages unless it is None
+            workers: Number of worker threads
+            queue_size: Maximum number of items waiting for a worker
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = DropOldestQueue(queue_size)
+        self.downstream: list["Stage"] = []
+        self.logger = logging.getLogger(__name__)
+
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        # Items queued or in progress
+        self.pending = 0
+        self.processed = 0
+        self.errors = 0
+
+    def put(self, item: Any):
+        """
+        Queue an item for this stage.
+
+        Args:
+            item: Item to process
+        """
+        with self._lock:
+            self.pending += 1
+            if self.queue.put(item) is not None:
+                self.pending -= 1
+                self.logger.info(f"Stage '{self.name}' is behind, dropped its oldest item")
+
+    def start(self, timings: Optional[StageTimings] = None):
+        """
+        Start the worker threads.
+
+        Args:
+            timings: Stage timings to record handler durations in
+        """
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(timings,), daemon=True,
+                                      name=f"Pipeline-{self.name}-{index}")
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self, timings: Optional[StageTimings]):
+        while True:
+            try:
+                item = self.queue.get()
+            except PipelineClosed:
+                return
+
+            start = time.perf_counter()
+            try:
+                output = self.handler(item)
+            except Exception as e:
+                self.logger.error(f"Error in pipeline stage '{self.name}': {e}", exc_info=True)
+                output = None
+                with self._lock:
+                    self.errors += 1
+            finally:
+                if timings is not None:
+                    timings.record(self.name, time.perf_counter() - start)
+
+            if output is not None:
+                for stage in self.downstream:
+                    stage.put(output)
+            with self._lock:
+                self.pending -= 1
+                self.processed += 1
+
+    def is_idle(self) -> bool:
+        """Whether the stage has no queued items and no item in progress"""
+        with self._lock:
+            return self.pending == 0
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the workers after the queued items are processed.
+
+        Args:
+            timeout: Seconds to wait for each worker thread
+        """
+        self.queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+class Pipeline:
+    """A set of stages connected by bounded drop-oldest queues"""
+
+    def __init__(self, timings: Optional[StageTimings] = None):
+        """
+        Initialize an empty pipeline.
+
+        Args:
+            timings: Stage timings to record handler durations in
+        """
+        self.timings = timings
+        self.stages: dict[str, Stage] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def add_stage(self, name: str, handler: Callable[[Any], Any], workers: int = 1,
+                  queue_size: int = 1, after: Optional[list[str]] = None) -> Stage:
+        """
+        Add a stage.
+
+        Args:
+            name: Stage name
+            handler: Called with each item, returns the item for the downstream stages
+                (None to pass nothing on)
+            workers: Number of worker threads
+            queue_size: Maximum number of items waiting for a worker
+            after: Names of the stages whose output this stage consumes
+
+        Returns:
+            The new stage
+        """
+        stage = Stage(name, handler, workers=workers, queue_size=queue_size)
+        for upstream in after or []:
+            self.stages[upstream].downstream.append(stage)
+        self.stages[name] = stage
+        return stage
+
+    def put(self, name: str, item: Any):
+        """
+        Queue an item for a stage.
+
+        Args:
+            name: Stage name
+            item: Item to process
+        """
+        self.stages[name].put(item)
+
+    def start(self):
+        """Start all stages"""
+        for stage in self.stages.values():
+            stage.start(self.timings)
+        self.logger.info(
+            "Pipeline started: " + " | ".join(
+                f"{stage.name} x{stage.workers}" for stage in self.stages.values()
+            )
+        )
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until all stages are idle.
+
+        Args:
+            timeout: Maximum seconds to wait (None to wait indefinitely)
+
+        Returns:
+            True if the pipeline drained, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(stage.is_idle() for stage in self.stages.values()):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop all stages in order.
+
+        Args:
+            timeout: Seconds to wait for each worker thread
+        """
+        for stage in self.stages.values():
+            stage.stop(timeout)
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Get per-stage statistics.
+
+        Returns:
+            Dictionary mapping each stage to its worker count, processed, dropped and
+            error counts and current queue depth
+        """
+        return {
+            name: {
+                "workers": stage.workers,
+                "processed": stage.processed,
+                "dropped": stage.queue.dropped,
+                "errors": stage.errors,
+                "queued": len(stage.queue),
+            }
+            for name, stage in self.stages.items()
+        }
+
+    def format_report(self) -> str:
+        """
+        Format the statistics as a text table.
+
+        Returns:
+            Table with one row per stage
+        """
+        lines = [
+            f"{'Stage':<16}{'Workers':>9}{'Processed':>11}{'Dropped':>9}{'Errors':>8}",
+            "-" * 53,
+        ]
+        for name, stats in self.get_stats().items():
+            lines.append(
+                f"{name:<16}{stats['workers']:>9}{stats['processed']:>11}"
+                f"{stats['dropped']:>9}{stats['errors']:>8}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,91 @@
+"""
+Pipeline Metrics Module
+
+This module records how long each stage of the context retrieval pipeline takes
+(capture, gating, analysis, summary, links) so throughput can be measured and compared.
+"""
+
+import time
+import threading
+import statistics
+from contextlib import contextmanager
+
+
+class StageTimings:
+    """Collects per-stage durations of the context retrieval pipeline"""
+
+    def __init__(self):
+        """Initialize an empty set of stage timings"""
+        self._lock = threading.Lock()
+        self._durations: dict[str, list[float]] = {}
+
+    def record(self, stage: str, seconds: float):
+        """
+        Record one duration for a stage.
+
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Measure the duration of a block of code as one run of a stage.
+
+        Args:
+            stage: Stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        """Forget all recorded durations"""
+        with self._lock:
+            self._durations.clear()
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Summarize the recorded durations.
+
+        Returns:
+            Dictionary mapping each stage to its count, total, mean, median, p95 and max
+            duration in seconds
+        """
+        with self._lock:
+            durations = {stage: sorted(values) for stage, values in self._durations.items()}
+
+        result = {}
+        for stage, values in durations.items():
+            result[stage] = {
+                "count": len(values),
+                "total": sum(values),
+                "mean": statistics.mean(values),
+                "median": statistics.median(values),
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+            }
+        return result
+
+    def format_report(self) -> str:
+        """
+        Format the summary as a text table.
+
+        Returns:
+            Table with one row per stage, durations in milliseconds
+        """
+        lines = [
+            f"{'Stage':<16}{'Count':>7}{'Total s':>10}{'Mean ms':>10}{'Median ms':>11}{'P95 ms':>10}{'Max ms':>10}",
+            "-" * 74,
+        ]
+        for stage, stats in self.summary().items():
+            lines.append(
+                f"{stage:<16}{stats['count']:>7}{stats['total']:>10.2f}{stats['mean'] * 1000:>10.1f}"
+                f"{stats['median'] * 1000:>11.1f}{stats['p95'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,357 @@
+"""
+Resilience Module
+
+This module wraps Claude API calls with retries (jittered exponential backoff that
+honours retry-after), an overall deadline, and a circuit breaker that stops calls
+altogether during an outage so the service doesn't hammer the API.
+"""
+
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Optional, Callable, Any
+import logging
+
+import anthropic
+
+from context_retrieval import config
+
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class EmptyResponseError(Exception):
+    """Raised when the API returns a response without any text content"""
+
+
+class RetryPolicy:
+    """Jittered exponential backoff with a maximum number of attempts and an overall deadline"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: Optional[float] = 60.0):
+        """
+        Initialize retry policy.
+
+        Args:
+            max_attempts: Maximum number of attempts including the first one
+            base_delay: Delay in seconds before the first retry (doubled for each retry)
+            max_delay: Maximum delay in seconds between attempts
+            deadline: Seconds after the first attempt when no more retries are started
+                (None for no deadline)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Compute the delay before the next attempt ("full jitter").
+
+        Args:
+            attempt: Number of the attempt that just failed, starting at 1
+
+        Returns:
+            Delay in seconds
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Stops API calls after repeated failures and lets a trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failed calls after which the circuit opens
+            reset_timeout: Seconds the circuit stays open before a trial call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        """Current state: "closed", "open" or "half_open\""""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being refused"""
+        return self.state == "open"
+
+    def seconds_until_retry(self) -> float:
+        """Seconds until a trial call will be allowed (0 if the circuit isn't open)"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may be made now.
+
+        Returns:
+            True if the circuit is closed, or if it is half open and no other trial call
+            is in progress
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        """Record a successful call and close the circuit"""
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("API calls are succeeding again, circuit breaker closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        """Record a failed call and open the circuit if the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    f"Circuit breaker opened after {self._failures} failed API calls, "
+                    f"pausing API calls for {self.reset_timeout} seconds"
+                )
+
+
+def is_transport_error(error: Exception) -> bool:
+    """
+    Check whether an API error means the API itself is unavailable.
+
+    Only these errors count towards opening the circuit breaker.
+
+    Args:
+        error: Exception raised by an API call
+
+    Returns:
+        True for connection errors, timeouts, rate limits, overload and server errors
+    """
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether an API error is transient and worth retrying.
+
+    Args:
+        error: Exception raised by an API call
+
+    Returns:
+        True for transport errors and for responses without the expected content
+    """
+    return isinstance(error, EmptyResponseError) or is_transport_error(error)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the delay requested by the API in a retry-after header.
+
+    Args:
+        error: Exception raised by an API call
+
+    Returns:
+        Requested delay in seconds, or None if the error doesn't specify one
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _next_delay(error: Exception, attempt: int, policy: RetryPolicy, started: float,
+                call_site: str) -> Optional[float]:
+    """Decide whether to retry after a failed attempt, and how long to wait first"""
+    if not is_retryable(error) or attempt >= policy.max_attempts:
+        return None
+
+    delay = retry_after(error)
+    if delay is None:
+        delay = policy.backoff(attempt)
+    else:
+        delay = min(delay, policy.max_delay)
+
+    if policy.deadline is not None and time.monotonic() + delay - started > policy.deadline:
+        logger.warning(f"{call_site}: not retrying, the {policy.deadline} second deadline would be exceeded")
+        return None
+
+    logger.warning(
+        f"{call_site}: attempt {attempt} of {policy.max_attempts} failed ({error}), "
+        f"retrying in {delay:.1f} seconds"
+    )
+    return delay
+
+
+def _check_breaker(breaker: CircuitBreaker, call_site: str):
+    """Refuse a call while the circuit breaker is open"""
+    if not breaker.allow_request():
+        raise CircuitOpenError(
+            f"{call_site}: API calls paused for {breaker.seconds_until_retry():.1f} more seconds"
+        )
+
+
+def _record_failed_call(breaker: CircuitBreaker, error: Exception):
+    """Count a call that failed for good towards opening the circuit, if the API was unavailable"""
+    if is_transport_error(error):
+        breaker.record_failure()
+    else:
+        # The API answered, it rejected the request or returned unusable content
+        breaker.record_success()
+
+
+def call_with_retry(fn: Callable[..., Any], *args, call_site: str = "api",
+                    policy: Optional[RetryPolicy] = None,
+                    breaker: Optional["CircuitBreaker"] = None, **kwargs) -> Any:
+    """
+    Call an API function with retries, backoff and the circuit breaker.
+
+    Args:
+        fn: Function making the API call
+        *args: Positional arguments for fn
+        call_site: Name of the calling code path, for logging
+        policy: Retry policy (default_retry_policy if None)
+        breaker: Circuit breaker (api_circuit_breaker if None)
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        Return value of fn
+
+    Raises:
+        CircuitOpenError: If the circuit breaker is open
+        Exception: The last error if all attempts failed or the error isn't retryable
+    """
+    policy = policy or default_retry_policy
+    breaker = breaker or api_circuit_breaker
+    started = time.monotonic()
+    attempt = 0
+
+    _check_breaker(breaker, call_site)
+    while True:
+        attempt += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as error:
+            delay = _next_delay(error, attempt, policy, started, call_site)
+            if delay is None:
+                _record_failed_call(breaker, error)
+                raise
+            time.sleep(delay)
+            # Another call may have opened the circuit in the meantime
+            if breaker.is_open():
+                _check_breaker(breaker, call_site)
+            continue
+
+        breaker.record_success()
+        return result
+
+
+async def call_with_retry_async(fn: Callable[..., Any], *args, call_site: str = "api",
+                                policy: Optional[RetryPolicy] = None,
+                                breaker: Optional["CircuitBreaker"] = None, **kwargs) -> Any:
+    """
+    Async version of call_with_retry for coroutine functions.
+
+    Args:
+        fn: Coroutine function making the API call
+        *args: Positional arguments for fn
+        call_site: Name of the calling code path, for logging
+        policy: Retry policy (default_retry_policy if None)
+        breaker: Circuit breaker (api_circuit_breaker if None)
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        Return value of fn
+    """
+    policy = policy or default_retry_policy
+    breaker = breaker or api_circuit_breaker
+    started = time.monotonic()
+    attempt = 0
+
+    _check_breaker(breaker, call_site)
+    while True:
+        attempt += 1
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            delay = _next_delay(error, attempt, policy, started, call_site)
+            if delay is None:
+                _record_failed_call(breaker, error)
+                raise
+            await asyncio.sleep(delay)
+            # Another call may have opened the circuit in the meantime
+            if breaker.is_open():
+                _check_breaker(breaker, call_site)
+            continue
+
+        breaker.record_success()
+        return result
+
+
+# Shared retry policy and circuit breaker for all API call sites
+default_retry_policy = RetryPolicy(
+    max_attempts=config.API_MAX_ATTEMPTS,
+    base_delay=config.API_RETRY_BASE_DELAY,
+    max_delay=config.API_RETRY_MAX_DELAY,
+    deadline=config.API_CALL_DEADLINE,
+)
+api_circuit_breaker = CircuitBreaker(
+    failure_threshold=config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=config.CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
@@ -0,0 +1,203 @@
+"""
+Rolling Summary Module
+
+This module keeps the learning summary as tiers instead of one text that is rewritten on
+every update: the most recent entries are kept verbatim, and older entries are compacted
+into digests in the background, with the oldest digests merged again once there are too
+many. Prompts only ever contain the digests and the recent entries, so their size stays
+bounded no matter how long the session runs. Every change is appended to the session
+store, and the tiers are rebuilt from its records when the store is reopened.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+import logging
+
+from context_retrieval.session_store import SessionStore, SUMMARY_TYPES
+
+
+@dataclass
+class SummaryEntry:
+    timestamp: str
+    text: str
+
+
+class RollingSummary:
+    """Learning summary with verbatim recent entries and compacted digests of older ones"""
+
+    def __init__(self, store: SessionStore, recent_entries: int, compact_batch: int, max_digests: int,
+                 compact: Callable[[list[str]], Optional[str]], background: bool = True):
+        """
+        Initialize rolling summary from the store's summary records.
+
+        Args:
+            store: Session store the summary changes are appended to
+            recent_entries: Number of entries kept verbatim before the oldest are compacted
+            compact_batch: Number of entries compacted into one digest at a time
+            max_digests: Number of digests kept before the two oldest are merged
+            compact: Turns a chronological list of texts into one digest (None on failure)
+            background: Whether to compact on a background thread
+        """
+        self.store = store
+        self.recent_entries = recent_entries
+        self.compact_batch = compact_batch
+        self.max_digests = max_digests
+        self.compact = compact
+        self.background = background
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._compacting = False
+        # Bumped whenever the tiers are replaced, so a running compaction is discarded
+        self._generation = 0
+        self.started: Optional[str] = None
+        self.digests: list[str] = []
+        self.entries: list[SummaryEntry] = []
+        self.load()
+
+    def load(self):
+        """Rebuild the tiers from the store's summary records"""
+        with self._lock:
+            self._generation += 1
+            self.started, self.digests, self.entries = None, [], []
+            for record in self.store.records_of(*SUMMARY_TYPES):
+                self._apply(record)
+
+    def is_empty(self) -> bool:
+        """Whether the summary has no content yet"""
+        with self._lock:
+            return not self.digests and not self.entries
+
+    def prompt_view(self) -> str:
+        """
+        Render the summary for prompts: the digests followed by the recent entries.
+
+        Returns:
+            Summary text, empty if there is no summary yet
+        """
+        with self._lock:
+            return self._render_tiers()
+
+    def render(self) -> str:
+        """
+        Render the full summary as saved to the summary history file.
+
+        Returns:
+            Summary text with the session start, empty if there is no summary yet
+        """
+        with self._lock:
+            return self._render()
+
+    def add_entry(self, text: str) -> str:
+        """
+        Append a new entry, and compact older entries if there are too many.
+
+        Args:
+            text: Description of the new learning activity
+
+        Returns:
+            The rendered summary
+        """
+        with self._lock:
+            self._apply(self.store.append("summary_entry", text=text.strip()))
+            rendered = self._render()
+            due = self._compaction_due() and not self._compacting
+            if due:
+                self._compacting = True
+
+        if due:
+            if self.background:
+                threading.Thread(target=self._compact_tiers, daemon=True, name="SummaryCompaction").start()
+            else:
+                self._compact_tiers()
+        return rendered
+
+    def replace(self, text: str):
+        """
+        Replace the whole summary with one digest.
+
+        Args:
+            text: Summary of all activities so far
+        """
+        with self._lock:
+            self._generation += 1
+            self._apply(self.store.append("summary_replace", digest=text.strip()))
+
+    def clear(self):
+        """Forget the summary and start a new session in the store"""
+        with self._lock:
+            self._generation += 1
+            self.store.clear()
+            self.started, self.digests, self.entries = None, [], []
+
+    def _apply(self, record: dict):
+        """Apply a summary record to the tiers (lock held)"""
+        record_type = record.get("type")
+        if record_type == "summary_entry":
+            if self.started is None:
+                self.started = record["time"]
+            self.entries.append(SummaryEntry(record["time"], record["text"]))
+        elif record_type == "summary_compact":
+            if record["tier"] == "entries":
+                del self.entries[:record["count"]]
+                self.digests.append(record["digest"])
+            else:
+                self.digests[:record["count"]] = [record["digest"]]
+        elif record_type == "summary_replace":
+            self.started = record["time"]
+            self.digests = [record["digest"]] if record["digest"] else []
+            self.entries = []
+
+    def _compaction_due(self) -> bool:
+        """Whether there are too many entries or digests (lock held)"""
+        return len(self.entries) > self.recent_entries or len(self.digests) > self.max_digests
+
+    def _compact_tiers(self):
+        """Compact old entries into digests and merge old digests until both tiers fit"""
+        try:
+            while True:
+                with self._lock:
+                    generation = self._generation
+                    if len(self.entries) > self.recent_entries:
+                        batch = self.entries[:self.compact_batch]
+                        texts = [f"[{entry.timestamp}] {entry.text}" for entry in batch]
+                        tier = "entries"
+                    elif len(self.digests) > self.max_digests:
+                        texts = self.digests[:2]
+                        tier = "digests"
+                    else:
+                        return
+
+                # The model call runs outside the lock; the compacted items stay in the
+                # summary until their digest replaces them
+                digest = self.compact(texts)
+                if not digest:
+                    self.logger.warning(f"Summary compaction failed, keeping {len(texts)} {tier} as they are")
+                    return
+
+                with self._lock:
+                    if generation != self._generation:
+                        return
+                    self._apply(self.store.append(
+                        "summary_compact", tier=tier, count=len(texts), digest=digest.strip()
+                    ))
+                self.logger.info(f"Compacted {len(texts)} {tier} into a digest")
+        except Exception as e:
+            self.logger.error(f"Error compacting summary: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _render_tiers(self) -> str:
+        """Render the digests and entries (lock held)"""
+        parts = list(self.digests)
+        parts.extend(f"[{entry.timestamp}] {entry.text}" for entry in self.entries)
+        return "\n\n".join(parts)
+
+    def _render(self) -> str:
+        """Render the full summary (lock held)"""
+        tiers = self._render_tiers()
+        if not tiers or self.started is None:
+            return tiers
+        return f"[Session Started: {self.started}]\n\n{tiers}"
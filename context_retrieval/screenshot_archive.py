@@ -0,0 +1,397 @@
+"""
+Screenshot Archive Module
+
+This module stores screenshots as an archive of keyframes and tile deltas instead of one
+PNG per frame. A keyframe is a full PNG; the frames after it only store the tiles that
+changed since the previous frame, so consecutive screens that are mostly identical cost
+a few kilobytes. Deltas are exact, every frame is reconstructed pixel for pixel.
+
+The archive is split into segments, each a data file of frame records and an index file
+of fixed-size (timestamp, offset, length, kind) records, so any frame can be found by
+timestamp with a binary search and read with one seek.
+"""
+
+import io
+import os
+import math
+import bisect
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+from PIL import Image, ImageChops
+import logging
+
+
+# Segment files are named archive_<timestamp>.frames and archive_<timestamp>.index
+SEGMENT_PREFIX = "archive_"
+DATA_EXTENSION = ".frames"
+INDEX_EXTENSION = ".index"
+
+DATA_MAGIC = b"SCRARC1\n"
+INDEX_MAGIC = b"SCRIDX1\n"
+
+# Index record: timestamp, offset in the data file, length, kind
+INDEX_RECORD = struct.Struct("<dQIB3x")
+KEYFRAME = 0
+DELTA = 1
+
+# Delta header: tile size, number of tiles; followed by (column, row) per tile
+DELTA_HEADER = struct.Struct("<HI")
+TILE_POSITION = struct.Struct("<HH")
+
+# Changed tiles are packed into a strip image this many tiles wide
+STRIP_COLUMNS = 16
+
+
+@dataclass(frozen=True)
+class ArchiveFrame:
+    """A frame in the archive index"""
+    timestamp: float
+    segment: str
+    offset: int
+    length: int
+    keyframe: bool
+
+
+def _tile_box(column: int, row: int, tile_size: int, size: tuple[int, int]) -> tuple[int, int, int, int]:
+    """Pixel box of a tile, clipped to the frame"""
+    width, height = size
+    left, top = column * tile_size, row * tile_size
+    return (left, top, min(left + tile_size, width), min(top + tile_size, height))
+
+
+def changed_tiles(previous: Image.Image, current: Image.Image, tile_size: int) -> list[tuple[int, int]]:
+    """
+    Find the tiles that differ between two frames of the same size.
+
+    Unlike TileDiff this is exact: a single changed pixel marks its tile as changed.
+
+    Args:
+        previous: Previous frame
+        current: Current frame
+        tile_size: Tile width and height in pixels
+
+    Returns:
+        List of (column, row) of the changed tiles
+    """
+    diff = ImageChops.difference(previous, current)
+    bbox = diff.getbbox()
+    if bbox is None:
+        return []
+
+    # Only tiles inside the bounding box of all changes need to be checked
+    left, top, right, bottom = bbox
+    tiles = []
+    for row in range(top // tile_size, (bottom - 1) // tile_size + 1):
+        for column in range(left // tile_size, (right - 1) // tile_size + 1):
+            if diff.crop(_tile_box(column, row, tile_size, current.size)).getbbox():
+                tiles.append((column, row))
+    return tiles
+
+
+def _encode_png(image: Image.Image, compress_level: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+class ScreenshotArchiveWriter:
+    """Appends frames to archive segments as keyframes and tile deltas"""
+
+    def __init__(self, directory: str, keyframe_interval: int = 30, segment_frames: int = 1800,
+                 tile_size: int = 64, max_delta_fraction: float = 0.5, compress_level: int = 6,
+                 on_segment_closed: Optional[Callable[[str], None]] = None):
+        """
+        Initialize archive writer.
+
+        Args:
+            directory: Directory the segments are written to
+            keyframe_interval: Frames between two keyframes (bounds the cost of reading a frame)
+            segment_frames: Frames per segment before a new segment is started
+            tile_size: Tile width and height in pixels
+            max_delta_fraction: Fraction of changed tiles above which a keyframe is stored instead
+            compress_level: PNG compression level (0-9)
+            on_segment_closed: Called with the data filename of each segment that is complete
+        """
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.segment_frames = segment_frames
+        self.tile_size = tile_size
+        self.max_delta_fraction = max_delta_fraction
+        self.compress_level = compress_level
+        self.on_segment_closed = on_segment_closed
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._segment = None
+        self._data = None
+        self._index = None
+        self._previous: Optional[Image.Image] = None
+        self._segment_count = 0
+        self._since_keyframe = 0
+        self._last_timestamp = 0.0
+
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_written = 0
+
+    def append(self, frame: Image.Image, timestamp: float) -> str:
+        """
+        Append a frame.
+
+        Args:
+            frame: Frame to store
+            timestamp: Capture time as a Unix timestamp
+
+        Returns:
+            Data filename of the segment the frame was written to
+        """
+        frame = frame.convert("RGB")
+        if self._segment is None or self._segment_count >= self.segment_frames:
+            self._open_segment(timestamp)
+        # Frame times within a segment never decrease, so they can be bisected
+        timestamp = max(timestamp, self._last_timestamp)
+        self._last_timestamp = timestamp
+
+        payload = None
+        if (self._previous is not None and self._previous.size == frame.size
+                and self._since_keyframe < self.keyframe_interval):
+            payload = self._encode_delta(self._previous, frame)
+
+        if payload is None:
+            kind, payload = KEYFRAME, _encode_png(frame, self.compress_level)
+            self._since_keyframe = 1
+            self.keyframes += 1
+        else:
+            kind = DELTA
+            self._since_keyframe += 1
+            self.deltas += 1
+
+        # The index record is written after the data, so it never points past the data file
+        offset = self._data.tell()
+        self._data.write(payload)
+        self._data.flush()
+        self._index.write(INDEX_RECORD.pack(timestamp, offset, len(payload), kind))
+        self._index.flush()
+
+        self._previous = frame
+        self._segment_count += 1
+        self.bytes_written += len(payload)
+        return self._segment
+
+    def _encode_delta(self, previous: Image.Image, frame: Image.Image) -> Optional[bytes]:
+        """Encode the changed tiles, or None if so much changed that a keyframe is cheaper"""
+        tiles = changed_tiles(previous, frame, self.tile_size)
+        total_tiles = math.ceil(frame.width / self.tile_size) * math.ceil(frame.height / self.tile_size)
+        if len(tiles) > total_tiles * self.max_delta_fraction:
+            return None
+
+        parts = [DELTA_HEADER.pack(self.tile_size, len(tiles))]
+        parts.extend(TILE_POSITION.pack(column, row) for column, row in tiles)
+        if tiles:
+            columns = min(len(tiles), STRIP_COLUMNS)
+            rows = math.ceil(len(tiles) / columns)
+            strip = Image.new("RGB", (columns * self.tile_size, rows * self.tile_size))
+            for i, (column, row) in enumerate(tiles):
+                tile = frame.crop(_tile_box(column, row, self.tile_size, frame.size))
+                strip.paste(tile, ((i % columns) * self.tile_size, (i // columns) * self.tile_size))
+            parts.append(_encode_png(strip, self.compress_level))
+        return b"".join(parts)
+
+    def _open_segment(self, timestamp: float):
+        """Close the current segment and start a new one with a keyframe"""
+        self._close_segment()
+
+        stamp = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S")
+        name = f"{SEGMENT_PREFIX}{stamp}"
+        suffix = 1
+        while os.path.exists(os.path.join(self.directory, name + DATA_EXTENSION)):
+            suffix += 1
+            name = f"{SEGMENT_PREFIX}{stamp}_{suffix}"
+
+        self._segment = name + DATA_EXTENSION
+        self._data = open(os.path.join(self.directory, self._segment), "wb")
+        self._data.write(DATA_MAGIC)
+        self._index = open(os.path.join(self.directory, name + INDEX_EXTENSION), "wb")
+        self._index.write(INDEX_MAGIC)
+        self._previous = None
+        self._segment_count = 0
+        self._last_timestamp = timestamp
+        self.logger.debug(f"Started screenshot archive segment {self._segment}")
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        self._data.close()
+        self._index.close()
+        segment, self._segment = self._segment, None
+        if self.on_segment_closed:
+            self.on_segment_closed(segment)
+
+    def close(self):
+        """Close the current segment"""
+        self._close_segment()
+
+
+class ScreenshotArchive:
+    """Reads frames from the archive segments of a directory"""
+
+    def __init__(self, directory: str):
+        """
+        Load the index of all segments in a directory.
+
+        Frames written after loading are not seen; create a new archive to read them.
+
+        Args:
+            directory: Directory containing archive segments
+        """
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+
+        self.entries: list[ArchiveFrame] = []
+        # Position of each frame's keyframe in entries
+        self._keyframes: list[int] = []
+        # Capture times of the frames, for bisecting
+        self._times: list[float] = []
+        # Last reconstructed frame, so reading frames in order applies one delta each
+        self._cached: Optional[tuple[int, Image.Image]] = None
+
+        if not os.path.isdir(directory):
+            return
+        segments = [
+            self._load_segment(f) for f in os.listdir(directory)
+            if f.startswith(SEGMENT_PREFIX) and f.endswith(DATA_EXTENSION)
+        ]
+        # Segments are ordered by their first frame
+        for frames in sorted((frames for frames in segments if frames), key=lambda frames: frames[0].timestamp):
+            for entry in frames:
+                if entry.keyframe:
+                    keyframe = len(self.entries)
+                self.entries.append(entry)
+                self._keyframes.append(keyframe)
+                # Clamped so the times stay sorted even if the clock went backwards between segments
+                self._times.append(max(entry.timestamp, self._times[-1]) if self._times else entry.timestamp)
+
+    def _load_segment(self, segment: str) -> list[ArchiveFrame]:
+        """Read the index of a segment"""
+        base = segment[:-len(DATA_EXTENSION)]
+        index_path = os.path.join(self.directory, base + INDEX_EXTENSION)
+        try:
+            data_size = os.path.getsize(os.path.join(self.directory, segment))
+            with open(index_path, "rb") as f:
+                index = f.read()
+        except OSError as e:
+            self.logger.warning(f"Skipping screenshot archive segment {segment}: {e}")
+            return []
+        if not index.startswith(INDEX_MAGIC):
+            self.logger.warning(f"Skipping screenshot archive segment {segment}: invalid index")
+            return []
+
+        frames = []
+        # A record torn by a crash is ignored, like records pointing past the data file
+        end = len(index) - (len(index) - len(INDEX_MAGIC)) % INDEX_RECORD.size
+        for timestamp, offset, length, kind in INDEX_RECORD.iter_unpack(index[len(INDEX_MAGIC):end]):
+            if offset + length > data_size or (not frames and kind != KEYFRAME):
+                break
+            frames.append(ArchiveFrame(timestamp, segment, offset, length, kind == KEYFRAME))
+        return frames
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find(self, timestamp: float) -> Optional[int]:
+        """
+        Find the frame on screen at a time.
+
+        Args:
+            timestamp: Unix timestamp
+
+        Returns:
+            Position of the last frame captured at or before the timestamp, or None if
+            there is none
+        """
+        position = bisect.bisect_right(self._times, timestamp) - 1
+        return position if position >= 0 else None
+
+    def frame_at(self, timestamp: float) -> Optional[Image.Image]:
+        """
+        Reconstruct the frame on screen at a time.
+
+        Args:
+            timestamp: Unix timestamp
+
+        Returns:
+            PIL Image, or None if no frame was captured before the timestamp
+        """
+        position = self.find(timestamp)
+        return self.read(position) if position is not None else None
+
+    def read(self, position: int) -> Image.Image:
+        """
+        Reconstruct a frame.
+
+        Args:
+            position: Position of the frame in entries
+
+        Returns:
+            PIL Image of the frame
+        """
+        keyframe = self._keyframes[position]
+        # Continue from the cached frame if it lies between the keyframe and this frame
+        if self._cached is not None and keyframe <= self._cached[0] <= position:
+            start, frame = self._cached
+            if start == position:
+                return frame.copy()
+            frame = frame.copy()
+        else:
+            start, frame = keyframe, self._decode_keyframe(self.entries[keyframe])
+
+        for i in range(start + 1, position + 1):
+            self._apply_delta(frame, self.entries[i])
+        self._cached = (position, frame)
+        return frame.copy()
+
+    def frames(self, start: Optional[float] = None,
+               end: Optional[float] = None) -> Iterator[tuple[float, Image.Image]]:
+        """
+        Reconstruct the frames captured in a time range, in order.
+
+        Args:
+            start: Earliest capture time (None for no lower bound)
+            end: Latest capture time (None for no upper bound)
+
+        Yields:
+            Tuples of (timestamp, PIL Image)
+        """
+        low = 0 if start is None else bisect.bisect_left(self._times, start)
+        high = len(self._times) if end is None else bisect.bisect_right(self._times, end)
+        for position in range(low, high):
+            yield self._times[position], self.read(position)
+
+    def _load(self, entry: ArchiveFrame) -> bytes:
+        with open(os.path.join(self.directory, entry.segment), "rb") as f:
+            f.seek(entry.offset)
+            return f.read(entry.length)
+
+    def _decode_keyframe(self, entry: ArchiveFrame) -> Image.Image:
+        with Image.open(io.BytesIO(self._load(entry))) as image:
+            return image.convert("RGB")
+
+    def _apply_delta(self, frame: Image.Image, entry: ArchiveFrame):
+        """Paste the tiles of a delta onto the previous frame (in place)"""
+        payload = self._load(entry)
+        tile_size, count = DELTA_HEADER.unpack_from(payload)
+        if count == 0:
+            return
+        offset = DELTA_HEADER.size
+        positions = [TILE_POSITION.unpack_from(payload, offset + i * TILE_POSITION.size) for i in range(count)]
+        with Image.open(io.BytesIO(payload[offset + count * TILE_POSITION.size:])) as strip:
+            strip = strip.convert("RGB")
+
+        columns = min(count, STRIP_COLUMNS)
+        for i, (column, row) in enumerate(positions):
+            left, top, right, bottom = _tile_box(column, row, tile_size, frame.size)
+            x, y = (i % columns) * tile_size, (i // columns) * tile_size
+            frame.paste(strip.crop((x, y, x + right - left, y + bottom - top)), (left, top))
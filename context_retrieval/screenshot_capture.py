@@ -2,35 +2,333 @@
 Screenshot Capture Module
 
 This module handles capturing screenshots of the desktop at regular intervals.
+Capturing goes through a pluggable backend, so frames can come from pyautogui, a
+faster raw-buffer grabber (mss) or a deterministic synthetic/replay source.
 """
 
 import os
+import random
+import threading
 import time
 from datetime import datetime
-from typing import Optional
-import pyautogui
-from PIL import Image
+from typing import Optional, Iterable
+from PIL import Image, ImageChops, ImageDraw
 import logging
 
+from context_retrieval.file_storage import ScreenshotStore
+from context_retrieval.screenshot_archive import ScreenshotArchive
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+# Saved screenshots are named screenshot_<timestamp>.png
+SCREENSHOT_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def list_screenshots(directory: str) -> list[tuple[str, float]]:
+    """
+    List the images in a directory with their capture time.
+    
+    The capture time is read from the screenshot_<timestamp> filename written by
+    ScreenshotCapture.save_screenshot, falling back to the file modification time.
+    
+    Args:
+        directory: Directory containing screenshots
+        
+    Returns:
+        List of (path, unix timestamp), oldest first
+    """
+    screenshots = []
+    for filename in os.listdir(directory):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(directory, filename)
+        stem = os.path.splitext(filename)[0]
+        try:
+            timestamp = datetime.strptime(
+                stem.removeprefix("screenshot_"), SCREENSHOT_TIMESTAMP_FORMAT
+            ).timestamp()
+        except ValueError:
+            timestamp = os.path.getmtime(path)
+        screenshots.append((path, timestamp))
+    
+    screenshots.sort(key=lambda item: (item[1], item[0]))
+    return screenshots
+
+
+class CaptureBackend:
+    """Base class for screen capture backends"""
+    
+    name = "base"
+    
+    def grab(self) -> Image.Image:
+        """
+        Grab a frame.
+        
+        Returns:
+            PIL Image object containing the frame
+        """
+        raise NotImplementedError
+    
+    def cursor_position(self) -> Optional[tuple[int, int]]:
+        """
+        Get the current mouse cursor position.
+        
+        Returns:
+            Tuple of (x, y), or None if the backend has no cursor
+        """
+        import pyautogui
+        x, y = pyautogui.position()
+        return (x, y)
+    
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """Captures the screen with pyautogui"""
+    
+    name = "pyautogui"
+    
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+    
+    def grab(self) -> Image.Image:
+        return self._pyautogui.screenshot()
+
+
+class MssBackend(CaptureBackend):
+    """Captures the screen from the raw frame buffer with mss (XShm on Linux)"""
+    
+    name = "mss"
+    
+    def __init__(self, monitor: int = 1):
+        """
+        Initialize mss backend.
+        
+        Args:
+            monitor: mss monitor index (0 for all monitors combined, 1 for the primary monitor)
+        """
+        import mss
+        self._mss = mss
+        self.monitor = monitor
+        # mss instances are bound to the thread that created them
+        self._local = threading.local()
+    
+    def _get_grabber(self):
+        grabber = getattr(self._local, "grabber", None)
+        if grabber is None:
+            grabber = self._mss.mss()
+            self._local.grabber = grabber
+        return grabber
+    
+    def grab(self) -> Image.Image:
+        grabber = self._get_grabber()
+        shot = grabber.grab(grabber.monitors[self.monitor])
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+    
+    def close(self):
+        grabber = getattr(self._local, "grabber", None)
+        if grabber is not None:
+            grabber.close()
+            self._local.grabber = None
+
+
+class ReplayBackend(CaptureBackend):
+    """Yields frames from memory, a directory of images or a screenshot archive, in order"""
+    
+    name = "replay"
+    
+    def __init__(self, frames: Optional[Iterable[Image.Image]] = None,
+                 directory: Optional[str] = None, paths: Optional[list[str]] = None,
+                 loop: bool = True, archive: Optional[ScreenshotArchive] = None):
+        """
+        Initialize replay backend.
+        
+        Args:
+            frames: Frames to replay from memory
+            directory: Directory of image files or of a screenshot archive to replay, in
+                capture time order
+            paths: Image files to replay, in the given order (instead of directory)
+            loop: Whether to start over after the last frame
+            archive: Screenshot archive to replay (instead of directory)
+        """
+        if frames is None and directory is None and paths is None and archive is None:
+            raise ValueError("One of frames, directory, paths or archive is required")
+        
+        self.frames = list(frames) if frames is not None else None
+        self.paths = paths
+        self.archive = archive
+        if self.frames is None and self.paths is None and self.archive is None:
+            archive = ScreenshotArchive(directory)
+            if len(archive):
+                self.archive = archive
+            else:
+                self.paths = [path for path, _ in list_screenshots(directory)]
+        self.loop = loop
+        self.position = 0
+    
+    def __len__(self) -> int:
+        if self.frames is not None:
+            return len(self.frames)
+        return len(self.archive) if self.archive is not None else len(self.paths)
+    
+    def grab(self) -> Image.Image:
+        if len(self) == 0:
+            raise RuntimeError("No frames to replay")
+        if self.position >= len(self):
+            if not self.loop:
+                raise EOFError("No more frames to replay")
+            self.position = 0
+        
+        index = self.position
+        self.position += 1
+        if self.frames is not None:
+            return self.frames[index].copy()
+        if self.archive is not None:
+            # Frames are read in order, so each one only applies a delta to the previous frame
+            return self.archive.read(index)
+        with Image.open(self.paths[index]) as image:
+            return image.convert("RGB")
+    
+    def cursor_position(self) -> Optional[tuple[int, int]]:
+        return None
+
+
+class SyntheticBackend(CaptureBackend):
+    """Generates deterministic desktop-like frames without a display"""
+    
+    name = "synthetic"
+    
+    def __init__(self, width: int = 1920, height: int = 1080, seed: int = 0,
+                 change_probability: float = 0.3):
+        """
+        Initialize synthetic backend.
+        
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            seed: Random seed, the same seed always yields the same frame sequence
+            change_probability: Probability that a frame differs from the previous one
+        """
+        self.width = width
+        self.height = height
+        self.change_probability = change_probability
+        self._random = random.Random(seed)
+        self._frame = None
+    
+    def _draw_frame(self) -> Image.Image:
+        frame = Image.new("RGB", (self.width, self.height), "white")
+        draw = ImageDraw.Draw(frame)
+        
+        # Tab bar and a few text blocks
+        draw.rectangle((0, 0, self.width, 40), fill=(222, 225, 230))
+        for tab in range(self._random.randint(1, 6)):
+            draw.text((10 + tab * 200, 12), f"Tab {self._random.randint(0, 999)}", fill="black")
+        
+        line_height = 18
+        for y in range(60, self.height - line_height, line_height):
+            if self._random.random() < 0.8:
+                words = " ".join(
+                    "".join(self._random.choice("abcdefghijklmnopqrstuvwxyz")
+                            for _ in range(self._random.randint(2, 9)))
+                    for _ in range(self._random.randint(4, 20))
+                )
+                draw.text((20, y), words, fill="black")
+        return frame
+    
+    def grab(self) -> Image.Image:
+        if self._frame is None or self._random.random() < self.change_probability:
+            self._frame = self._draw_frame()
+        return self._frame.copy()
+    
+    def cursor_position(self) -> Optional[tuple[int, int]]:
+        return None
+
+
+def create_backend(name: str = "auto", monitor: int = 1,
+                   replay_dir: Optional[str] = None) -> CaptureBackend:
+    """
+    Create a capture backend by name.
+    
+    Args:
+        name: Backend name (auto, mss, pyautogui, replay or synthetic). "auto" uses mss
+            if it is installed and falls back to pyautogui
+        monitor: Monitor index for the mss backend
+        replay_dir: Directory of frames for the replay backend
+        
+    Returns:
+        CaptureBackend instance
+    """
+    logger = logging.getLogger(__name__)
+    
+    if name == "auto":
+        try:
+            return MssBackend(monitor=monitor)
+        except ImportError:
+            logger.info("mss is not installed, using pyautogui for screen capture")
+            return PyAutoGuiBackend()
+    if name == "mss":
+        return MssBackend(monitor=monitor)
+    if name == "pyautogui":
+        return PyAutoGuiBackend()
+    if name == "replay":
+        return ReplayBackend(directory=replay_dir)
+    if name == "synthetic":
+        return SyntheticBackend()
+    
+    raise ValueError(f"Unknown capture backend: {name}")
+
 
 class ScreenshotCapture:
     """Handles screenshot capture functionality"""
     
-    def __init__(self, save_dir: Optional[str] = None, save_screenshots: bool = True):
+    def __init__(self, save_dir: Optional[str] = None, save_screenshots: bool = True,
+                 backend: Optional[CaptureBackend] = None, max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None, write_queue_size: int = 64,
+                 archive: bool = False, archive_keyframe_interval: int = 30,
+                 archive_segment_frames: int = 1800):
         """
         Initialize screenshot capture.
         
         Args:
             save_dir: Directory to save screenshots (if None, uses current directory)
             save_screenshots: Whether to save screenshots to disk
+            backend: Capture backend to grab frames with (chosen automatically if None)
+            max_bytes: Maximum total size of the saved screenshots (None for no limit)
+            max_age: Seconds after which a saved screenshot is removed (None to keep them)
+            write_queue_size: Maximum number of screenshots waiting to be written
+            archive: Whether to save screenshots into a keyframe/delta archive instead of PNGs
+            archive_keyframe_interval: Frames between two archive keyframes
+            archive_segment_frames: Frames per archive segment
         """
         self.save_dir = save_dir
         self.save_screenshots = save_screenshots
+        self.backend = backend or create_backend()
         self.logger = logging.getLogger(__name__)
         
-        # Create save directory if it doesn't exist and we're saving
+        # Capture timing
+        self.capture_count = 0
+        self.total_capture_seconds = 0.0
+        self.last_capture_seconds = 0.0
+        
+        self.logger.info(f"Screen capture backend: {self.backend.name}")
+        
+        # Screenshots are written in the background, within the size and age limits
+        self.store = None
         if self.save_screenshots and self.save_dir:
-            os.makedirs(self.save_dir, exist_ok=True)
+            self.store = ScreenshotStore(
+                self.save_dir,
+                max_bytes=max_bytes,
+                max_age=max_age,
+                queue_size=write_queue_size,
+                timestamp_format=SCREENSHOT_TIMESTAMP_FORMAT,
+                archive=archive,
+                keyframe_interval=archive_keyframe_interval,
+                segment_frames=archive_segment_frames
+            )
             self.logger.info(f"Screenshot save directory: {self.save_dir}")
     
     def capture_screenshot(self) -> Image.Image:
@@ -41,34 +339,63 @@ class ScreenshotCapture:
             PIL Image object containing the screenshot
         """
         try:
-            screenshot = pyautogui.screenshot()
-            self.logger.debug("Screenshot captured successfully")
+            start = time.perf_counter()
+            screenshot = self.backend.grab()
+            self.last_capture_seconds = time.perf_counter() - start
+            self.total_capture_seconds += self.last_capture_seconds
+            self.capture_count += 1
+            self.logger.debug(f"Screenshot captured successfully in {self.last_capture_seconds * 1000:.0f} ms")
             return screenshot
         except Exception as e:
             self.logger.error(f"Error capturing screenshot: {e}")
             raise
     
+    def get_cursor_position(self) -> Optional[tuple[int, int]]:
+        """
+        Get the current mouse cursor position.
+        
+        Returns:
+            Tuple of (x, y), or None if the position can't be read
+        """
+        try:
+            return self.backend.cursor_position()
+        except Exception as e:
+            self.logger.debug(f"Error reading cursor position: {e}")
+            return None
+    
+    def get_stats(self) -> dict:
+        """
+        Get capture statistics.
+        
+        Returns:
+            Dictionary with the backend name, capture count and timings
+        """
+        return {
+            "backend": self.backend.name,
+            "captures": self.capture_count,
+            "last_capture_seconds": self.last_capture_seconds,
+            "avg_capture_seconds": (
+                self.total_capture_seconds / self.capture_count if self.capture_count else 0.0
+            ),
+        }
+    
     def save_screenshot(self, screenshot: Image.Image) -> Optional[str]:
         """
         Save screenshot to disk with timestamp.
         
+        The file is written on a background thread, so it may not exist yet when this returns.
+        
         Args:
             screenshot: PIL Image object to save
             
         Returns:
-            Path to saved screenshot file, or None if not saved
+            Path the screenshot is saved to, or None if not saved
         """
-        if not self.save_screenshots or not self.save_dir:
+        if not self.save_screenshots or not self.store:
             return None
         
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"screenshot_{timestamp}.png"
-            filepath = os.path.join(self.save_dir, filename)
-            
-            screenshot.save(filepath)
-            self.logger.info(f"Screenshot saved: {filepath}")
-            return filepath
+            return self.store.save(screenshot)
         except Exception as e:
             self.logger.error(f"Error saving screenshot: {e}")
             return None
@@ -83,4 +410,116 @@ class ScreenshotCapture:
         screenshot = self.capture_screenshot()
         filepath = self.save_screenshot(screenshot)
         return screenshot, filepath
+    
+    def close(self):
+        """Write the screenshots still queued and release the capture backend"""
+        if self.store:
+            self.store.close()
+            stats = self.store.get_stats()
+            if self.store.archive:
+                saved = f"{stats['written']} archived ({stats['keyframes']} keyframes, {stats['deltas']} deltas)"
+            else:
+                saved = f"{stats['written']} saved ({stats['deduplicated']} identical frames linked)"
+            self.logger.info(
+                f"Screenshots: {saved}, {stats['dropped']} dropped, {stats['removed']} removed by retention"
+            )
+        self.backend.close()
 
+
+
+class TileDiff:
+    """Finds the region of the screen that changed between two frames using a tile grid"""
+    
+    def __init__(self, grid_cols: int = 16, grid_rows: int = 9,
+                 pixel_threshold: int = 24, tile_threshold: float = 0.005,
+                 padding: int = 8):
+        """
+        Initialize tile diff.
+        
+        Args:
+            grid_cols: Number of tile columns the frame is split into
+            grid_rows: Number of tile rows the frame is split into
+            pixel_threshold: Minimum grayscale difference (0-255) for a pixel to count as changed
+            tile_threshold: Minimum fraction of changed pixels for a tile to count as dirty
+            padding: Extra pixels added around the changed region
+        """
+        self.grid_cols = grid_cols
+        self.grid_rows = grid_rows
+        self.pixel_threshold = pixel_threshold
+        self.tile_threshold = tile_threshold
+        self.padding = padding
+        self.logger = logging.getLogger(__name__)
+    
+    def dirty_tiles(self, previous: Image.Image, current: Image.Image) -> list[tuple[int, int]]:
+        """
+        Compare two frames tile by tile.
+        
+        Args:
+            previous: PIL Image of the previous frame
+            current: PIL Image of the new frame (same size as previous)
+            
+        Returns:
+            List of (column, row) of tiles that changed
+        """
+        threshold = self.pixel_threshold
+        diff = ImageChops.difference(previous.convert("L"), current.convert("L"))
+        changed = diff.point(lambda p: 255 if p > threshold else 0)
+        
+        # Averaging each tile down to one pixel gives the fraction of changed pixels
+        tiles = changed.resize((self.grid_cols, self.grid_rows), Image.Resampling.BOX)
+        values = tiles.tobytes()
+        
+        min_value = self.tile_threshold * 255
+        return [
+            (index % self.grid_cols, index // self.grid_cols)
+            for index, value in enumerate(values)
+            if value > min_value
+        ]
+    
+    def tiles_to_box(self, tiles: list[tuple[int, int]],
+                     size: tuple[int, int]) -> tuple[int, int, int, int]:
+        """
+        Compute the pixel bounding box covering a set of tiles.
+        
+        Args:
+            tiles: List of (column, row) tile coordinates
+            size: (width, height) of the frame
+            
+        Returns:
+            Bounding box as (left, top, right, bottom)
+        """
+        width, height = size
+        cols = [col for col, _ in tiles]
+        rows = [row for _, row in tiles]
+        
+        left = min(cols) * width // self.grid_cols - self.padding
+        top = min(rows) * height // self.grid_rows - self.padding
+        right = (max(cols) + 1) * width // self.grid_cols + self.padding
+        bottom = (max(rows) + 1) * height // self.grid_rows + self.padding
+        
+        return (max(0, left), max(0, top), min(width, right), min(height, bottom))
+    
+    def changed_region(self, previous: Optional[Image.Image],
+                       current: Image.Image) -> Optional[tuple[int, int, int, int]]:
+        """
+        Find the bounding box of everything that changed between two frames.
+        
+        Args:
+            previous: PIL Image of the previous frame, or None if there is none
+            current: PIL Image of the new frame
+            
+        Returns:
+            Bounding box (left, top, right, bottom) of the changed tiles, the full frame
+            if the frames can't be compared, or None if nothing changed
+        """
+        full_frame = (0, 0, current.width, current.height)
+        if previous is None or previous.size != current.size:
+            return full_frame
+        
+        tiles = self.dirty_tiles(previous, current)
+        if not tiles:
+            return None
+        
+        box = self.tiles_to_box(tiles, current.size)
+        self.logger.debug(f"{len(tiles)} dirty tiles, changed region: {box}")
+        return box
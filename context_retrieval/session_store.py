@@ -0,0 +1,446 @@
+"""
+Session Store Module
+
+This module keeps the study sessions in one SQLite database: extracted frames and their
+tabs, summary entries and compactions, generated links, visited URLs and API usage each
+have their own table, indexed by session, time and URL. The database runs in WAL mode
+and all writes go through a background writer that commits them in batches, so callers
+never wait on disk. Tabs are stored once per content hash and shared by every frame
+that shows them. The writer also removes frames and earlier sessions past their maximum
+age. The final summary and the usage analytics read from the indexes instead of
+scanning files.
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+
+from context_retrieval.context_model import Context
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    context_hash TEXT NOT NULL,
+    tab_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_session_time ON frames (session_id, time);
+CREATE INDEX IF NOT EXISTS frames_time ON frames (time);
+CREATE TABLE IF NOT EXISTS tabs (
+    content_hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    context TEXT NOT NULL,
+    text_content TEXT NOT NULL,
+    images TEXT NOT NULL,
+    first_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tabs_url ON tabs (url);
+CREATE TABLE IF NOT EXISTS frame_tabs (
+    frame_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (frame_id, position)
+);
+CREATE INDEX IF NOT EXISTS frame_tabs_hash ON frame_tabs (content_hash);
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    tier TEXT,
+    count INTEGER
+);
+CREATE INDEX IF NOT EXISTS summaries_session_time ON summaries (session_id, time);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    url TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS links_session_time ON links (session_id, time);
+CREATE INDEX IF NOT EXISTS links_url ON links (url);
+CREATE TABLE IF NOT EXISTS visited_urls (
+    session_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    time TEXT NOT NULL,
+    PRIMARY KEY (session_id, url)
+);
+CREATE TABLE IF NOT EXISTS api_usage (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    call_site TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS api_usage_session_time ON api_usage (session_id, time);
+"""
+
+# Record types kept in the summaries table
+SUMMARY_TYPES = ("summary_entry", "summary_compact", "summary_replace")
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+# Tables whose rows of earlier sessions are removed with the session
+SESSION_TABLES = ("summaries", "links", "visited_urls", "api_usage")
+
+# Seconds between two retention passes of the writer
+PRUNE_INTERVAL = 3600
+
+# Queued by close() to stop the writer thread
+_STOP = object()
+
+
+class SessionStore:
+    """SQLite store of study sessions with a batching background writer"""
+
+    def __init__(self, path: str, write_batch: int = 64, write_interval: float = 1.0,
+                 max_age: Optional[float] = None):
+        """
+        Open (or create) a store and continue its latest session.
+
+        Args:
+            path: SQLite database file
+            write_batch: Number of records committed in one transaction at most
+            write_interval: Maximum seconds a record waits before it is committed
+            max_age: Seconds after which frames and earlier sessions are removed (None to keep them)
+        """
+        self.path = path
+        self.write_batch = write_batch
+        self.write_interval = write_interval
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._link_batch = 0
+
+        self.session_id: Optional[int] = None
+        # Whether the database was created by this store (nothing recorded before)
+        self.created = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._load_session()
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="SessionStoreWriter")
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode"""
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load_session(self):
+        """Continue the latest session (or start the first one)"""
+        row = self._conn.execute("SELECT id FROM sessions ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            self.created = True
+            self._start_session()
+            return
+        self.session_id = row[0]
+
+        batch = self._conn.execute(
+            "SELECT MAX(batch) FROM links WHERE session_id = ?", (self.session_id,)
+        ).fetchone()[0]
+        self._link_batch = batch or 0
+
+    def _start_session(self):
+        """Insert a new session and make it the current one"""
+        with self._conn:
+            cursor = self._conn.execute("INSERT INTO sessions (started) VALUES (?)", (_now(),))
+        self.session_id = cursor.lastrowid
+        self._link_batch = 0
+
+    def append(self, record_type: str, **fields) -> dict:
+        """
+        Record something that happened in the current session.
+
+        The record is committed by the background writer with the next batch.
+
+        Args:
+            record_type: "context", "links", "visited_url", "usage" or one of the summary types
+            **fields: Record fields (e.g. tabs for a context, text for a summary entry)
+
+        Returns:
+            The record, with its type and time
+        """
+        record = {"type": record_type, "time": _now(), **fields}
+        with self._lock:
+            if self._closed:
+                self.logger.warning(f"Session store is closed, dropping {record['type']} record")
+                return record
+            if record["type"] == "links":
+                self._link_batch += 1
+                record = {**record, "batch": self._link_batch}
+            self._queue.put((self.session_id, record))
+        return record
+
+    def _write_loop(self):
+        """Commit queued records in batches until the store is closed"""
+        conn = self._connect()
+        next_prune = time.monotonic()
+        try:
+            while True:
+                if self.max_age is not None and time.monotonic() >= next_prune:
+                    self._prune(conn)
+                    next_prune = time.monotonic() + PRUNE_INTERVAL
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.write_interval
+                while len(batch) < self.write_batch and batch[-1] is not _STOP \
+                        and not isinstance(batch[-1], threading.Event):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                records = [item for item in batch if isinstance(item, tuple)]
+                if records:
+                    self._write(conn, records)
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                if batch[-1] is _STOP:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, records: list[tuple[int, dict]]):
+        """Insert a batch of records in one transaction, retrying once before dropping it"""
+        for attempt in range(2):
+            try:
+                with conn:
+                    for session_id, record in records:
+                        self._insert(conn, session_id, record)
+                self.logger.debug(f"Committed {len(records)} session records")
+                return
+            except Exception as e:
+                if attempt == 0:
+                    self.logger.warning(f"Error writing {len(records)} session records, retrying: {e}")
+                    time.sleep(self.write_interval)
+                else:
+                    self.logger.error(f"Error writing {len(records)} session records, dropping them: {e}",
+                                      exc_info=True)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Remove frames older than max_age, the tabs only they showed, and earlier sessions past max_age"""
+        cutoff = (datetime.now() - timedelta(seconds=self.max_age)).strftime("%Y-%m-%d %H:%M:%S")
+        session_id = self.session_id
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM frame_tabs WHERE frame_id IN (SELECT id FROM frames WHERE time < ?)", (cutoff,)
+                )
+                frames = conn.execute("DELETE FROM frames WHERE time < ?", (cutoff,)).rowcount
+                conn.execute(
+                    "DELETE FROM tabs WHERE first_seen < ? AND content_hash NOT IN "
+                    "(SELECT content_hash FROM frame_tabs)", (cutoff,)
+                )
+                for table in SESSION_TABLES:
+                    conn.execute(f"DELETE FROM {table} WHERE session_id != ? AND time < ?", (session_id, cutoff))
+                sessions = conn.execute(
+                    "DELETE FROM sessions WHERE id != ? AND started < ?", (session_id, cutoff)
+                ).rowcount
+            if frames or sessions:
+                self.logger.info(f"Removed {frames} frames and {sessions} sessions older than {cutoff}")
+        except Exception as e:
+            self.logger.error(f"Error removing old session records: {e}", exc_info=True)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, session_id: int, record: dict):
+        """Insert one record into its table(s)"""
+        record_type, timestamp = record["type"], record["time"]
+        if record_type == "context":
+            context = Context.from_dicts(record.get("tabs") or [])
+            frame_id = conn.execute(
+                "INSERT INTO frames (session_id, time, context_hash, tab_count) VALUES (?, ?, ?, ?)",
+                (session_id, timestamp, context.content_hash, len(context))
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO tabs (content_hash, name, url, context, text_content, images, first_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(tab.content_hash, tab.name, tab.url, tab.context, tab.text_content,
+                  json.dumps(tab.to_dict().get("images", []), ensure_ascii=False), timestamp)
+                 for tab in context]
+            )
+            conn.executemany(
+                "INSERT INTO frame_tabs (frame_id, position, content_hash) VALUES (?, ?, ?)",
+                [(frame_id, position, tab.content_hash) for position, tab in enumerate(context)]
+            )
+        elif record_type in SUMMARY_TYPES:
+            conn.execute(
+                "INSERT INTO summaries (session_id, time, type, text, tier, count) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, timestamp, record_type, record.get("text") or record.get("digest") or "",
+                 record.get("tier"), record.get("count"))
+            )
+        elif record_type == "links":
+            conn.executemany(
+                "INSERT INTO links (session_id, time, batch, url, summary) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, timestamp, record["batch"], link.get("url"), link.get("summary"))
+                 for link in record.get("links") or []]
+            )
+        elif record_type == "visited_url":
+            conn.execute(
+                "INSERT OR IGNORE INTO visited_urls (session_id, url, time) VALUES (?, ?, ?)",
+                (session_id, record["url"], timestamp)
+            )
+        elif record_type == "usage":
+            conn.execute(
+                "INSERT INTO api_usage (session_id, time, call_site, input_tokens, output_tokens, "
+                "cache_creation_input_tokens, cache_read_input_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, timestamp, record["call_site"], *(record.get(field) or 0 for field in USAGE_FIELDS))
+            )
+        else:
+            raise ValueError(f"Unknown session record type: {record_type}")
+
+    def sync(self, timeout: Optional[float] = None):
+        """
+        Wait until all records appended so far are committed.
+
+        Args:
+            timeout: Maximum seconds to wait (None to wait indefinitely)
+        """
+        with self._lock:
+            if self._closed:
+                return
+            committed = threading.Event()
+            self._queue.put(committed)
+        committed.wait(timeout)
+
+    def clear(self):
+        """Start a new session; earlier sessions stay in the store"""
+        self.sync()
+        with self._lock:
+            self._start_session()
+
+    def close(self):
+        """Commit the remaining records and close the store"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._writer.join()
+        self._conn.close()
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """Run a read query after the pending writes are committed"""
+        self.sync()
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchall()
+
+    def records_of(self, *record_types: str) -> list[dict]:
+        """
+        Get the summary records of the current session.
+
+        Args:
+            *record_types: Summary record types to include
+
+        Returns:
+            Matching records, oldest first, in the form they were appended in
+        """
+        unknown = set(record_types) - set(SUMMARY_TYPES)
+        if unknown:
+            raise ValueError(f"Only summary records can be read back, not {', '.join(sorted(unknown))}")
+        placeholders = ", ".join("?" * len(record_types))
+        rows = self._query(
+            f"SELECT type, time, text, tier, count FROM summaries "
+            f"WHERE session_id = ? AND type IN ({placeholders}) ORDER BY id",
+            (self.session_id, *record_types)
+        )
+        records = []
+        for record_type, timestamp, text, tier, count in rows:
+            record = {"type": record_type, "time": timestamp}
+            if record_type == "summary_entry":
+                record["text"] = text
+            elif record_type == "summary_compact":
+                record.update(tier=tier, count=count, digest=text)
+            else:
+                record["digest"] = text
+            records.append(record)
+        return records
+
+    def visited_pages(self, limit: int = 50) -> list[tuple[str, str]]:
+        """
+        Get the pages shown on screen during the current session.
+
+        Args:
+            limit: Maximum number of pages
+
+        Returns:
+            (url, tab name) pairs in the order the pages were first seen
+        """
+        return self._query(
+            "SELECT t.url, t.name FROM frames f "
+            "JOIN frame_tabs ft ON ft.frame_id = f.id "
+            "JOIN tabs t ON t.content_hash = ft.content_hash "
+            "WHERE f.session_id = ? AND t.url != '' "
+            "GROUP BY t.url ORDER BY MIN(f.id) LIMIT ?",
+            (self.session_id, limit)
+        )
+
+    def visited_urls(self) -> list[str]:
+        """
+        Get the URLs marked as visited in the current session.
+
+        Returns:
+            URLs in the order they were visited
+        """
+        rows = self._query(
+            "SELECT url FROM visited_urls WHERE session_id = ? ORDER BY rowid", (self.session_id,)
+        )
+        return [url for url, in rows]
+
+    def usage_by_call_site(self) -> dict[str, dict[str, int]]:
+        """
+        Get the API usage of the current session, across restarts of the service.
+
+        Returns:
+            Dictionary mapping each call site to its call count and token totals
+        """
+        rows = self._query(
+            f"SELECT call_site, COUNT(*), {', '.join(f'SUM({field})' for field in USAGE_FIELDS)} "
+            f"FROM api_usage WHERE session_id = ? GROUP BY call_site ORDER BY call_site",
+            (self.session_id,)
+        )
+        return {
+            call_site: {"calls": calls, **dict(zip(USAGE_FIELDS, totals))}
+            for call_site, calls, *totals in rows
+        }
+
+
+def _now() -> str:
+    """Current time in the format of record times"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
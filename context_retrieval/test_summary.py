@@ -22,6 +22,7 @@ from context_retrieval.insights_generation import (
     load_summary_history,
     save_summary_history
 )
+from context_retrieval import config
 
 
 def test_summary_feature():
@@ -97,7 +98,7 @@ def test_summary_feature():
     print("\n" + "=" * 60)
     print("ALL TESTS COMPLETED")
     print("=" * 60)
-    print(f"\nSummary file location: context_retrieval/summary_history.txt")
+    print(f"\nSession store location: {config.SESSION_STORE_FILE}")
 
 
 if __name__ == "__main__":
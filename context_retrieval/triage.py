@@ -0,0 +1,259 @@
+"""
+Triage Module
+
+This module routes work between a small, fast model and the large model. Before a
+changed frame gets a full extraction, and before the summary is rewritten, a local
+heuristic settles the obvious cases and the small model answers a yes/no question for
+the rest; the large model only runs when the triage escalates.
+"""
+
+import threading
+from typing import Optional
+from PIL import Image
+import logging
+
+from context_retrieval import config
+from context_retrieval.api_client import get_client
+from context_retrieval.api_usage import usage_tracker
+from context_retrieval.image_encoding import ImageEncoder
+from context_retrieval.resilience import call_with_retry, RetryPolicy
+from context_retrieval.context_model import Context
+
+
+FRAME_TRIAGE_PROMPT = """You decide whether a new screenshot needs a full content extraction. You will be given the pages/tabs extracted from the previously analyzed screenshot and a small image of the current screen.
+
+Answer YES if the user is now looking at different content: another page, document, tab, video or a substantial amount of new text.
+Answer NO if it is the same content with only minor changes, such as scrolling a few lines, cursor movement, notifications, animations or highlighting.
+
+Answer with YES or NO only."""
+
+SUMMARY_TRIAGE_PROMPT = """You decide whether a student's learning summary needs to be updated. You will be given the student's learning objective, the current summary of their learning activities and the content of their screen.
+
+Answer YES if the screen content shows relevant learning progress that is not in the summary yet: a new topic, a new resource, or new facts related to the learning objective.
+Answer NO if it is already covered by the summary or not relevant to the learning objective.
+
+Answer with YES or NO only."""
+
+# Call sites whose large-model calls the triage can save, by decision kind
+LARGE_MODEL_CALL_SITES = {"frame": "analysis", "summary": "update_summary"}
+
+
+def content_hash(context: Context | str) -> str:
+    """Content hash of a context, parsing it first if it is XML"""
+    if isinstance(context, Context):
+        return context.content_hash
+    return Context.from_xml(context).content_hash
+
+
+class TriageRouter:
+    """Decides whether frames and summary updates need the large model"""
+
+    def __init__(self, model: str, escalate_distance: int, image_token_budget: int = 300,
+                 max_tokens: int = 5):
+        """
+        Initialize triage router.
+
+        Args:
+            model: Small model answering the triage questions
+            escalate_distance: Frame hash distance from which a frame is extracted without
+                asking the small model
+            image_token_budget: Token budget for the thumbnail sent to the small model
+            max_tokens: Maximum tokens for the small model's answer
+        """
+        self.model = model
+        self.escalate_distance = escalate_distance
+        self.max_tokens = max_tokens
+        self.encoder = ImageEncoder(
+            format=config.IMAGE_FORMAT,
+            token_budget=image_token_budget,
+            grayscale=True,
+            quality=config.IMAGE_QUALITY,
+            min_scale=0.0
+        )
+        # Triage is only worth it if it's quick; on failure the work is escalated
+        self.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=2.0, deadline=10.0)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._last_summarized_hash: Optional[str] = None
+        # decision kind -> {"escalated", "skipped", "by_heuristic", "by_model"} counts
+        self._decisions: dict[str, dict[str, int]] = {}
+
+    def needs_extraction(self, image: Image.Image, distance: Optional[int],
+                         previous_context: Optional[Context]) -> bool:
+        """
+        Decide whether a frame that passed the frame gate needs a full extraction.
+
+        Args:
+            image: PIL Image of the frame
+            distance: Hash distance to the last analyzed frame (None if unknown)
+            previous_context: Context of the last analyzed frame
+
+        Returns:
+            True to run the large model on the frame, False to keep the previous context
+        """
+        if not previous_context or distance is None:
+            return self._decide("frame", True, "no previous context")
+        if distance >= self.escalate_distance:
+            return self._decide("frame", True, f"distance {distance} >= {self.escalate_distance}")
+
+        encoded = self.encoder.encode(image)
+        answer = self._ask(
+            "triage_frame",
+            FRAME_TRIAGE_PROMPT,
+            [
+                {
+                    "type": "text",
+                    "text": f"Previously extracted content:\n{previous_context.xml}"
+                },
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": encoded.media_type,
+                        "data": encoded.to_base64(),
+                    },
+                },
+            ]
+        )
+        return self._decide("frame", answer, f"distance {distance}", by_model=True)
+
+    def needs_summary_update(self, learning_objective: str, summary: str, context: Context | str) -> bool:
+        """
+        Decide whether new screen content should be merged into the summary.
+
+        Args:
+            learning_objective: The student's learning objective
+            summary: Current summary (empty if there is none yet)
+            context: New screen content
+
+        Returns:
+            True to rewrite the summary with the large model, False to keep it
+        """
+        with self._lock:
+            already_summarized = content_hash(context) == self._last_summarized_hash
+
+        if not summary:
+            return self._decide("summary", True, "no summary yet")
+        if already_summarized:
+            return self._decide("summary", False, "content already summarized")
+
+        answer = self._ask(
+            "triage_summary",
+            SUMMARY_TRIAGE_PROMPT,
+            f"""Student's Learning Objective:
+{learning_objective}
+
+Current Summary:
+{summary}
+
+Screen Content:
+{context}"""
+        )
+        return self._decide("summary", answer, "content changed", by_model=True)
+
+    def mark_summarized(self, context_hash: str):
+        """
+        Record that a context was merged into the summary, so the same content isn't
+        sent for a summary update again. Called once the update succeeded.
+
+        Args:
+            context_hash: Content hash of the summarized context
+        """
+        with self._lock:
+            self._last_summarized_hash = context_hash
+
+    def _ask(self, call_site: str, system_prompt: str, content) -> bool:
+        """
+        Ask the small model a yes/no question.
+
+        Returns:
+            True for YES, or if the call failed (so the work is escalated)
+        """
+        client = get_client()
+        try:
+            message = call_with_retry(
+                client.messages.create,
+                call_site=call_site,
+                policy=self.retry_policy,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                system=system_prompt,
+                messages=[{"role": "user", "content": content}],
+            )
+        except Exception as e:
+            self.logger.warning(f"Triage failed, escalating to the large model: {e}")
+            return True
+
+        usage_tracker.record(call_site, message.usage)
+        answer = next((block.text for block in message.content if block.type == "text"), "")
+        return not answer.strip().upper().startswith("NO")
+
+    def _decide(self, kind: str, escalate: bool, reason: str, by_model: bool = False) -> bool:
+        """Count and log a routing decision"""
+        with self._lock:
+            counts = self._decisions.setdefault(
+                kind, dict.fromkeys(("escalated", "skipped", "by_heuristic", "by_model"), 0)
+            )
+            counts["escalated" if escalate else "skipped"] += 1
+            counts["by_model" if by_model else "by_heuristic"] += 1
+
+        route = "large model" if escalate else "skipped"
+        decided_by = self.model if by_model else "heuristic"
+        self.logger.info(f"Triage ({kind}): {route}, decided by {decided_by} ({reason})")
+        return escalate
+
+    def get_stats(self) -> dict:
+        """
+        Get routing statistics and estimated savings.
+
+        Savings are estimated from the average tokens of the large-model calls that
+        were made, minus the tokens spent on triage.
+
+        Returns:
+            Dictionary mapping each decision kind ("frame", "summary") to its escalated
+            and skipped counts, how they were decided and the estimated tokens saved
+        """
+        usage = usage_tracker.get_stats()
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self._decisions.items()}
+
+        for kind, counts in stats.items():
+            large = usage.get(LARGE_MODEL_CALL_SITES[kind])
+            triage = usage.get(f"triage_{kind}")
+            average = (large["input_tokens"] + large["output_tokens"]) / large["calls"] if large else 0
+            spent = triage["input_tokens"] + triage["output_tokens"] if triage else 0
+            counts["tokens_saved"] = int(counts["skipped"] * average - spent)
+        return stats
+
+    def format_report(self) -> str:
+        """
+        Format routing statistics as a text table.
+
+        Returns:
+            Table with one row per decision kind
+        """
+        lines = [
+            f"{'Triage':<10}{'Escalated':>11}{'Skipped':>9}{'Heuristic':>11}{'Model':>7}{'Tokens saved':>14}",
+            "-" * 62,
+        ]
+        for kind, counts in self.get_stats().items():
+            lines.append(
+                f"{kind:<10}{counts['escalated']:>11}{counts['skipped']:>9}{counts['by_heuristic']:>11}"
+                f"{counts['by_model']:>7}{counts['tokens_saved']:>14}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        """Forget all routing decisions"""
+        with self._lock:
+            self._decisions.clear()
+            self._last_summarized_hash = None
+
+
+# Global triage router shared by the service and summary generation
+triage_router = TriageRouter(
+    model=config.TRIAGE_MODEL,
+    escalate_distance=config.TRIAGE_ESCALATE_DISTANCE,
+    image_token_budget=config.TRIAGE_IMAGE_TOKEN_BUDGET
+)
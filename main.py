@@ -12,13 +12,17 @@ import webbrowser
 import signal
 import sys
 import threading
-from anthropic import Anthropic
 import config
 import ctypes
 import re
 from context_retrieval.ContextRetrievalService import ContextRetrievalService
 from context_retrieval.shared_queue import links_queue
-from context_retrieval.insights_generation import flush_summary_history, generate_final_summary
+from context_retrieval.insights_generation import (
+    flush_summary_history, generate_final_summary, import_summary_history
+)
+from context_retrieval import config as retrieval_config
+from context_retrieval.api_client import get_client, close_clients
+from context_retrieval.resilience import call_with_retry
 
 def show_study_topic_dialog():
     """Show startup dialog to ask user what they're studying"""
@@ -482,7 +486,7 @@ class ELI5Overlay:
         
         # Initialize Anthropic client
         try:
-            self.client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
+            self.client = get_client(config.ANTHROPIC_API_KEY)
         except Exception as e:
             print(f"Warning: Could not initialize Anthropic client. Please check your API key. Error: {e}")
             self.client = None
@@ -1530,7 +1534,9 @@ class ELI5Overlay:
         print(prompt)
         print("="*60 + "\n")
         
-        message = self.client.messages.create(
+        message = call_with_retry(
+            self.client.messages.create,
+            call_site="eli5",
             model=config.CLAUDE_MODEL,
             max_tokens=500,
             messages=[
@@ -2101,6 +2107,9 @@ class ELI5Overlay:
             print("\nShutting down Mate Overlay...")
             self.root.quit()
             sys.exit(0)
+        finally:
+            # Close the pooled API connections shared with the context retrieval service
+            close_clients()
 
 if __name__ == "__main__":
     try:
@@ -2119,7 +2128,8 @@ if __name__ == "__main__":
         print(f"Environment variable LEARNING_OBJECTIVE = '{os.environ.get('LEARNING_OBJECTIVE', 'NOT SET')}'")
         print("")  # Empty line for readability
         
-        # Flush the summary history for new session
+        # Keep the summary of an earlier version in the store, then flush it for the new session
+        import_summary_history(retrieval_config.SUMMARY_HISTORY_FILE)
         print("Starting new learning session - flushing old summary...")
         flush_summary_history()
         
@@ -0,0 +1,103 @@
+"""Fixtures shared by the test modules"""
+from types import SimpleNamespace
+
+import pytest
+
+from context_retrieval.api_client import set_clients
+from context_retrieval.context_model import Tab
+from context_retrieval.session_store import SessionStore
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a test advances it or something sleeps"""
+
+    def __init__(self, monkeypatch, now=1000.0):
+        self.monkeypatch = monkeypatch
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def install(self, module):
+        """Replace the time module seen by `module` with this clock"""
+        self.monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=self, time=self, sleep=self.sleep))
+        return self
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+
+def fake_message(*content, input_tokens=10, output_tokens=5):
+    """Messages API response with the given content blocks"""
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                            cache_creation_input_tokens=0, cache_read_input_tokens=0)
+    return SimpleNamespace(content=list(content), usage=usage)
+
+
+class FakeMessages:
+    """Stands in for client.messages: answers with queued responses, raising queued exceptions"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = FakeMessages()
+        self.closed = False
+
+    def answer_text(self, text):
+        """Queue a response with a text block"""
+        self.messages.responses.append(fake_message(SimpleNamespace(type="text", text=text)))
+
+    def answer_tool(self, name, tool_input):
+        """Queue a response with a tool call"""
+        self.messages.responses.append(fake_message(SimpleNamespace(type="tool_use", name=name, input=tool_input)))
+
+    def fail(self, error):
+        """Queue an error raised by the next call"""
+        self.messages.responses.append(error)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_client():
+    """Shared API client replaced with a fake for the duration of a test"""
+    client = FakeClient()
+    set_clients(client)
+    yield client
+    set_clients()
+
+
+@pytest.fixture
+def tabs():
+    return [
+        Tab(name="Docs", url="https://docs.python.org", context="Reading", text_content="dict"),
+        Tab(name="Video", url="https://video.example", context="Watching", text_content="lists"),
+        Tab(name="Notes", url="", context="Writing", text_content="sets"),
+    ]
+
+
+@pytest.fixture
+def session_store(tmp_path):
+    """Session store in a temporary directory, flushing writes quickly"""
+    store = SessionStore(str(tmp_path / "session_store.db"), write_interval=0.01)
+    yield store
+    store.close()
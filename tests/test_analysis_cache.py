@@ -0,0 +1,47 @@
+from PIL import Image, ImageDraw
+
+from context_retrieval.analysis_cache import AnalysisCache, image_signature
+
+
+def text_screen(text, clock="12:00"):
+    image = Image.new("RGB", (960, 540), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(0, 500, 16):
+        draw.text((10, y), text * 8, fill="black")
+    draw.text((900, 525), clock, fill="black")
+    return image
+
+
+def test_small_change_is_a_hit():
+    cache = AnalysisCache()
+    cache.put("key", "<Tab>docs</Tab>", image_signature(text_screen("dicts map keys ")))
+
+    assert cache.get("key", image_signature(text_screen("dicts map keys ", clock="12:01"))) == "<Tab>docs</Tab>"
+
+
+def test_different_screen_with_the_same_key_is_rejected():
+    cache = AnalysisCache()
+    cache.put("key", "<Tab>docs</Tab>", image_signature(text_screen("dicts map keys ")))
+
+    assert cache.get("key", image_signature(text_screen("sets hold items "))) is None
+    assert cache.get_stats()["rejected"] == 1
+
+
+def test_entries_are_read_back_from_disk(tmp_path):
+    signature = image_signature(text_screen("dicts map keys "))
+    AnalysisCache(cache_dir=str(tmp_path)).put("key", "<Tab>docs</Tab>", signature)
+
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    assert cache.get("key", signature) == "<Tab>docs</Tab>"
+    assert cache.get_stats()["disk_hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_from_memory():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
@@ -0,0 +1,56 @@
+from PIL import Image, ImageDraw
+
+from context_retrieval import config
+from context_retrieval.analysis_cache import AnalysisCache
+from context_retrieval.claude_analyzer import ClaudeAnalyzer
+from context_retrieval.context_model import RECORD_TAB_CHANGES_TOOL, RECORD_TABS_TOOL
+
+
+def screen(box):
+    image = Image.new("RGB", (320, 180), "white")
+    ImageDraw.Draw(image).rectangle(box, fill="black")
+    return image
+
+
+DOCS_SCREEN = screen((10, 10, 150, 170))
+VIDEO_SCREEN = screen((170, 10, 310, 170))
+
+
+def make_analyzer(cache_key_mode="perceptual"):
+    return ClaudeAnalyzer(api_key="test", model="model", max_tokens=100, prompt="Analyze",
+                          cache=AnalysisCache(), cache_key_mode=cache_key_mode,
+                          delta_prompt=config.DELTA_ANALYSIS_PROMPT)
+
+
+def test_revisited_screen_hits_the_cache_from_a_different_previous_context(fake_client, tabs):
+    analyzer = make_analyzer()
+    fake_client.answer_tool(RECORD_TABS_TOOL["name"], {"tabs": [tabs[0].to_dict()]})
+    docs = analyzer.analyze_screenshot(DOCS_SCREEN)
+    fake_client.answer_tool(RECORD_TAB_CHANGES_TOOL["name"], {"removed": [0], "added": [tabs[1].to_dict()]})
+    video = analyzer.analyze_screenshot(VIDEO_SCREEN, previous_context=docs)
+
+    # The delta prompt now embeds the video tabs, the key doesn't
+    assert analyzer.analyze_screenshot(DOCS_SCREEN, previous_context=video) == docs
+    assert len(fake_client.messages.requests) == 2
+
+
+def test_merged_context_is_cached_instead_of_the_delta(fake_client, tabs):
+    analyzer = make_analyzer()
+    fake_client.answer_tool(RECORD_TABS_TOOL["name"], {"tabs": [tabs[0].to_dict()]})
+    docs = analyzer.analyze_screenshot(DOCS_SCREEN)
+    fake_client.answer_tool(RECORD_TAB_CHANGES_TOOL["name"], {"added": [tabs[1].to_dict()]})
+    analyzer.analyze_screenshot(VIDEO_SCREEN, previous_context=docs)
+
+    cached = analyzer.analyze_screenshot(VIDEO_SCREEN)
+
+    assert cached.tabs == (tabs[0], tabs[1])
+    assert len(fake_client.messages.requests) == 2
+
+
+def test_changed_region_is_looked_up_by_the_whole_screen(fake_client, tabs):
+    analyzer = make_analyzer(cache_key_mode="exact")
+    fake_client.answer_tool(RECORD_TABS_TOOL["name"], {"tabs": [tabs[0].to_dict()]})
+    docs = analyzer.analyze_screenshot(DOCS_SCREEN)
+
+    assert analyzer.analyze_region(DOCS_SCREEN, (0, 0, 100, 100), docs) == docs
+    assert len(fake_client.messages.requests) == 1
@@ -0,0 +1,35 @@
+import asyncio
+
+from context_retrieval import api_client
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_injected_client_is_shared_by_every_caller(fake_client):
+    assert api_client.get_client() is fake_client
+    assert api_client.get_client("another key") is fake_client
+
+
+def test_close_clients_closes_the_pooled_connections(fake_client):
+    api_client.close_clients()
+
+    assert fake_client.closed
+    assert api_client._client is None
+
+
+def test_async_client_is_closed_on_its_event_loop():
+    client = FakeAsyncClient()
+    api_client.set_clients(async_client=client)
+    try:
+        asyncio.run(api_client.close_async_client())
+    finally:
+        api_client.set_clients()
+
+    assert client.closed
+    assert api_client._async_client is None
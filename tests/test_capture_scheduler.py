@@ -0,0 +1,82 @@
+import pytest
+
+from context_retrieval import capture_scheduler
+from context_retrieval.capture_scheduler import AdaptiveScheduler
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock.install(capture_scheduler)
+
+
+def make_scheduler():
+    return AdaptiveScheduler(base_interval=4.0, min_interval=1.0, max_interval=30.0,
+                             speedup_factor=0.5, backoff_factor=2.0)
+
+
+def test_static_screen_backs_off_up_to_the_maximum(clock):
+    scheduler = make_scheduler()
+
+    intervals = []
+    for _ in range(5):
+        scheduler.record_activity(changed=False)
+        intervals.append(scheduler.current_interval)
+
+    assert intervals == [8.0, 16.0, 30.0, 30.0, 30.0]
+
+
+def test_idle_user_speeds_up_backoff_of_a_static_screen(clock):
+    scheduler = make_scheduler()
+
+    scheduler.record_activity(changed=False, idle=True)
+
+    assert scheduler.current_interval == 16.0
+
+
+def test_changed_screen_never_backs_off_even_when_idle(clock):
+    scheduler = make_scheduler()
+
+    scheduler.record_activity(changed=True, idle=True)
+    assert scheduler.current_interval == 2.0
+    scheduler.record_activity(changed=True, idle=True)
+    assert scheduler.current_interval == 1.0
+
+
+def test_change_after_static_period_restarts_from_base_interval(clock):
+    scheduler = make_scheduler()
+    for _ in range(3):
+        scheduler.record_activity(changed=False)
+
+    scheduler.record_activity(changed=True)
+
+    assert scheduler.current_interval == 2.0
+
+
+def test_next_deadline_is_measured_from_the_capture(clock):
+    scheduler = make_scheduler()
+    scheduler.last_tick = clock.now
+
+    # Analysis took 3 of the 8 seconds
+    clock.now += 3.0
+    scheduler.record_activity(changed=False)
+
+    assert scheduler.next_deadline == pytest.approx(scheduler.last_tick + 8.0)
+
+
+def test_slow_analysis_schedules_the_next_capture_right_away(clock):
+    scheduler = make_scheduler()
+    scheduler.last_tick = clock.now
+
+    clock.now += 10.0
+    scheduler.record_activity(changed=True)
+
+    assert scheduler.next_deadline == clock.now
+
+
+def test_defer_postpones_the_next_capture(clock):
+    scheduler = make_scheduler()
+    scheduler.record_activity(changed=True)
+
+    scheduler.defer(20.0)
+
+    assert scheduler.next_deadline == clock.now + 20.0
@@ -0,0 +1,92 @@
+import pytest
+
+from context_retrieval.context_change import ContextChangeTrigger, context_change
+from context_retrieval.context_model import Context, Tab
+
+
+def page(url, text):
+    return Tab(name=url, url=url, text_content=text)
+
+
+DOCS = Context([page("https://docs.example", "python dictionaries map keys to values")])
+DOCS_SCROLLED = Context([page("https://docs.example", "python dictionaries map keys to values quickly")])
+VIDEO = Context([page("https://video.example", "a lecture about sorting algorithms")])
+VIDEO_LATER = Context([page("https://video.example", "merge sort splits the list in halves")])
+
+
+@pytest.fixture
+def trigger():
+    return ContextChangeTrigger(threshold=0.3, debounce=5.0, min_interval=20.0, max_wait=30.0)
+
+
+def test_context_change_is_zero_for_identical_and_one_for_disjoint_tabs():
+    assert context_change(DOCS.tabs, DOCS.tabs) == 0.0
+    assert context_change(DOCS.tabs, VIDEO.tabs) == 1.0
+    assert 0.0 < context_change(DOCS.tabs, DOCS_SCROLLED.tabs) < 0.3
+
+
+def test_update_fires_once_the_change_settled(trigger):
+    assert trigger.observe(DOCS, now=0.0)
+
+    assert trigger.poll(now=4.9) is None
+    assert trigger.poll(now=5.0) is DOCS
+    # Fired contexts become the baseline
+    assert trigger.poll(now=100.0) is None
+    assert not trigger.observe(DOCS, now=100.0)
+
+
+def test_small_change_is_not_material(trigger):
+    trigger.observe(DOCS, now=0.0)
+    trigger.poll(now=5.0)
+
+    assert not trigger.observe(DOCS_SCROLLED, now=10.0)
+    assert trigger.poll(now=100.0) is None
+
+
+def test_further_material_change_restarts_the_debounce_window(trigger):
+    trigger.observe(DOCS, now=0.0)
+    trigger.observe(VIDEO, now=4.0)
+
+    assert trigger.poll(now=5.0) is None
+    assert trigger.poll(now=9.0) is VIDEO
+
+
+def test_max_wait_fires_while_the_context_keeps_changing(trigger):
+    contexts = [DOCS, VIDEO, VIDEO_LATER]
+    fired = None
+    now = 0.0
+    while fired is None and now < 60.0:
+        trigger.observe(contexts[int(now) % 3], now=now)
+        fired = trigger.poll(now=now)
+        now += 1.0
+
+    assert fired is not None
+    assert now - 1.0 == 30.0
+
+
+def test_min_interval_limits_the_update_rate(trigger):
+    trigger.observe(DOCS, now=0.0)
+    assert trigger.poll(now=5.0) is DOCS
+
+    trigger.observe(VIDEO, now=6.0)
+    assert trigger.poll(now=11.0) is None
+    assert trigger.poll(now=24.9) is None
+    assert trigger.poll(now=25.0) is VIDEO
+
+
+def test_returning_to_the_baseline_cancels_the_pending_update(trigger):
+    trigger.observe(DOCS, now=0.0)
+    trigger.poll(now=5.0)
+
+    trigger.observe(VIDEO, now=10.0)
+    trigger.observe(DOCS, now=11.0)
+
+    assert trigger.poll(now=100.0) is None
+
+
+def test_flush_takes_the_pending_context_immediately(trigger):
+    trigger.observe(DOCS, now=0.0)
+
+    assert trigger.flush() is DOCS
+    assert trigger.flush() is None
+    assert trigger.get_stats() == {"observed": 1, "material_changes": 1, "fired": 1}
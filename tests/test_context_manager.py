@@ -0,0 +1,83 @@
+import json
+import os
+
+from context_retrieval.context_manager import MANIFEST_FILENAME, ContextManager
+
+
+def save(manager, *contexts):
+    for context in contexts:
+        manager.save_context(context)
+    manager.flush()
+
+
+def manifest_lines(directory):
+    with open(os.path.join(directory, MANIFEST_FILENAME), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_contexts_are_read_back_after_reopening(tmp_path):
+    manager = ContextManager(str(tmp_path))
+    save(manager, "<Tab>one</Tab>", "<Tab>two</Tab>")
+    manager.close()
+
+    reopened = ContextManager(str(tmp_path))
+    assert reopened.get_contexts() == ["<Tab>one</Tab>", "<Tab>two</Tab>"]
+    assert reopened.get_latest_context() == "<Tab>two</Tab>"
+    assert [entry.id for entry in reopened.get_context_entries()] == [1, 2]
+
+
+def test_torn_manifest_line_is_dropped_and_appending_continues(tmp_path):
+    manager = ContextManager(str(tmp_path))
+    save(manager, "<Tab>one</Tab>", "<Tab>two</Tab>")
+    manager.close()
+
+    # A crash in the middle of writing the last line
+    manifest = os.path.join(str(tmp_path), MANIFEST_FILENAME)
+    with open(manifest, "rb") as f:
+        content = f.read()
+    with open(manifest, "wb") as f:
+        f.write(content[:-10])
+
+    reopened = ContextManager(str(tmp_path))
+    assert reopened.get_contexts() == ["<Tab>one</Tab>"]
+    save(reopened, "<Tab>three</Tab>")
+    reopened.close()
+
+    assert [line["id"] for line in manifest_lines(str(tmp_path))] == [1, 2]
+    assert ContextManager(str(tmp_path)).get_contexts() == ["<Tab>one</Tab>", "<Tab>three</Tab>"]
+
+
+def test_contexts_saved_before_the_manifest_are_indexed(tmp_path):
+    for index, name in enumerate(["context_20250101_100000.xml", "context_20250101_110000.xml"]):
+        with open(tmp_path / name, "w", encoding="utf-8") as f:
+            f.write(f"<Tab>{index}</Tab>")
+
+    manager = ContextManager(str(tmp_path))
+
+    assert manager.get_contexts() == ["<Tab>0</Tab>", "<Tab>1</Tab>"]
+    assert len(manifest_lines(str(tmp_path))) == 2
+
+
+def test_time_range_lookup(tmp_path):
+    manager = ContextManager(str(tmp_path))
+    save(manager, "<Tab>one</Tab>", "<Tab>two</Tab>")
+    first, second = manager.get_context_entries()
+
+    assert manager.get_contexts(start=second.time) == ["<Tab>two</Tab>"]
+    assert manager.get_contexts(end=first.time) == ["<Tab>one</Tab>"]
+    manager.close()
+
+
+def test_ids_keep_increasing_after_retention_removed_every_context(tmp_path):
+    manager = ContextManager(str(tmp_path), max_bytes=1, compress=False)
+    save(manager, "<Tab>one</Tab>", "<Tab>two</Tab>")
+
+    assert manager.get_context_entries() == []
+    assert manager.get_latest_context() is None
+    manager.close()
+
+    reopened = ContextManager(str(tmp_path), compress=False)
+    save(reopened, "<Tab>three</Tab>")
+    assert [entry.id for entry in reopened.get_context_entries()] == [3]
+    assert reopened.get_latest_context() == "<Tab>three</Tab>"
+    reopened.close()
@@ -0,0 +1,52 @@
+import os
+
+from context_retrieval.file_storage import BoundedDirectory
+
+
+def write(directory, name, size):
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(b"x" * size)
+
+
+def test_oldest_files_are_removed_beyond_the_size_limit(tmp_path):
+    removed = []
+    files = BoundedDirectory(str(tmp_path), "f_", max_bytes=2500, on_remove=removed.extend)
+
+    for index in range(3):
+        write(str(tmp_path), f"f_{index}", 1000)
+        files.add(f"f_{index}")
+
+    # Removed down to 90% of the limit
+    assert removed == ["f_0"]
+    assert files.total_bytes == 2000
+    assert sorted(os.listdir(tmp_path)) == ["f_1", "f_2"]
+
+
+def test_hard_links_count_once(tmp_path):
+    directory = str(tmp_path)
+    files = BoundedDirectory(directory, "f_", max_bytes=2500)
+    write(directory, "f_0", 1000)
+    files.add("f_0")
+    for index in range(1, 5):
+        os.link(os.path.join(directory, "f_0"), os.path.join(directory, f"f_{index}"))
+        files.add(f"f_{index}")
+
+    assert files.total_bytes == 1000
+    assert len(os.listdir(directory)) == 5
+    assert BoundedDirectory(directory, "f_").total_bytes == 1000
+
+
+def test_linked_size_is_freed_with_the_last_link(tmp_path):
+    directory = str(tmp_path)
+    files = BoundedDirectory(directory, "f_", max_bytes=2500)
+    write(directory, "f_0", 1000)
+    files.add("f_0")
+    os.link(os.path.join(directory, "f_0"), os.path.join(directory, "f_1"))
+    files.add("f_1")
+
+    for index in range(2, 4):
+        write(directory, f"f_{index}", 1000)
+        files.add(f"f_{index}")
+
+    assert sorted(os.listdir(directory)) == ["f_2", "f_3"]
+    assert files.total_bytes == 2000
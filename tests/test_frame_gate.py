@@ -0,0 +1,77 @@
+from PIL import Image
+
+from context_retrieval.frame_gate import FrameGate
+
+
+def gradient(width=320, height=180, reverse=False):
+    """Horizontal grayscale gradient, so the difference hash has distinct bits"""
+    image = Image.new("L", (width, height))
+    image.putdata([
+        (255 - x * 255 // width) if reverse else x * 255 // width
+        for y in range(height) for x in range(width)
+    ])
+    return image.convert("RGB")
+
+
+def test_identical_frames_have_distance_zero():
+    gate = FrameGate()
+    frame = gradient()
+
+    assert gate.hamming_distance(gate.compute_hash(frame), gate.compute_hash(frame.copy())) == 0
+
+
+def test_first_frame_passes_and_similar_frames_are_skipped():
+    gate = FrameGate(threshold=5)
+    frame = gradient()
+
+    assert gate.should_analyze(frame)
+    gate.accept(gate.last_hash)
+
+    assert not gate.should_analyze(frame.copy())
+    assert gate.last_distance == 0
+    assert gate.get_stats() == {"analyzed": 1, "skipped": 1, "skip_ratio": 0.5}
+
+
+def test_changed_frame_passes_threshold():
+    gate = FrameGate(threshold=5)
+    gate.should_analyze(gradient())
+    gate.accept(gate.last_hash)
+
+    assert gate.should_analyze(gradient(reverse=True))
+    assert gate.last_distance > gate.threshold
+
+
+def test_force_lets_an_unchanged_frame_through():
+    gate = FrameGate()
+    frame = gradient()
+    gate.should_analyze(frame)
+    gate.accept(gate.last_hash)
+
+    assert gate.should_analyze(frame, force=True)
+
+
+def test_reference_only_moves_when_a_frame_is_accepted():
+    gate = FrameGate(threshold=5)
+    gate.should_analyze(gradient())
+    gate.accept(gate.last_hash)
+
+    # A changed frame that is never extracted doesn't become the reference
+    assert gate.should_analyze(gradient(reverse=True))
+    assert gate.should_analyze(gradient(reverse=True))
+    assert gate.get_stats()["analyzed"] == 1
+
+    gate.accept(gate.last_hash)
+    assert not gate.should_analyze(gradient(reverse=True))
+
+
+def test_dismissed_frame_is_skipped_until_the_next_accept():
+    gate = FrameGate(threshold=5)
+    gate.should_analyze(gradient())
+    gate.accept(gate.last_hash)
+
+    assert gate.should_analyze(gradient(reverse=True))
+    gate.dismiss(gate.last_hash)
+    assert not gate.should_analyze(gradient(reverse=True))
+
+    gate.reset()
+    assert gate.should_analyze(gradient(reverse=True))
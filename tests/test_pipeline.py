@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from context_retrieval.pipeline import DropOldestQueue, Pipeline, PipelineClosed, Stage
+
+
+def test_queue_drops_oldest_item_when_full():
+    queue = DropOldestQueue(maxsize=2)
+
+    assert queue.put("a") is None
+    assert queue.put("b") is None
+    assert queue.put("c") == "a"
+
+    assert queue.dropped == 1
+    assert len(queue) == 2
+    assert queue.get() == "b"
+    assert queue.get() == "c"
+
+
+def test_closed_queue_hands_out_remaining_items_then_raises():
+    queue = DropOldestQueue(maxsize=2)
+    queue.put("a")
+    queue.close()
+
+    assert queue.get() == "a"
+    with pytest.raises(PipelineClosed):
+        queue.get()
+
+
+def test_close_wakes_up_waiting_getter():
+    queue = DropOldestQueue()
+    raised = threading.Event()
+
+    def get():
+        try:
+            queue.get()
+        except PipelineClosed:
+            raised.set()
+
+    getter = threading.Thread(target=get)
+    getter.start()
+    queue.close()
+    getter.join(timeout=2)
+
+    assert raised.is_set()
+
+
+def test_stage_pending_counts_queued_items_until_processed():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(item):
+        started.set()
+        release.wait(timeout=2)
+
+    stage = Stage("slow", handler, queue_size=1)
+    stage.start()
+    stage.put(1)
+    assert started.wait(timeout=2)
+
+    # One item in progress, one queued; a third replaces the queued one
+    stage.put(2)
+    stage.put(3)
+    assert stage.pending == 2
+    assert stage.queue.dropped == 1
+    assert not stage.is_idle()
+
+    release.set()
+    stage.stop()
+    assert stage.is_idle()
+    assert stage.processed == 2
+
+
+def test_stage_counts_handler_errors():
+    def handler(item):
+        raise ValueError(item)
+
+    stage = Stage("failing", handler)
+    stage.start()
+    stage.put(1)
+    stage.stop()
+
+    assert stage.errors == 1
+    assert stage.processed == 1
+    assert stage.is_idle()
+
+
+def test_pipeline_drains_through_downstream_stages():
+    results = []
+    pipeline = Pipeline()
+    pipeline.add_stage("double", lambda item: item * 2, queue_size=10)
+    pipeline.add_stage("collect", results.append, after=["double"], queue_size=10)
+    pipeline.start()
+
+    for item in range(5):
+        pipeline.put("double", item)
+
+    assert pipeline.drain(timeout=5)
+    assert sorted(results) == [0, 2, 4, 6, 8]
+    pipeline.stop()
+
+
+def test_pipeline_drain_times_out_while_busy():
+    release = threading.Event()
+    pipeline = Pipeline()
+    pipeline.add_stage("blocked", lambda item: release.wait(timeout=5))
+    pipeline.start()
+    pipeline.put("blocked", 1)
+
+    assert not pipeline.drain(timeout=0.1)
+
+    release.set()
+    assert pipeline.drain(timeout=5)
+    pipeline.stop()
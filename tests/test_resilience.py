@@ -0,0 +1,98 @@
+import asyncio
+
+import anthropic
+import httpx
+import pytest
+
+from context_retrieval import resilience
+from context_retrieval.resilience import (
+    CircuitBreaker, CircuitOpenError, EmptyResponseError, RetryPolicy, call_with_retry, call_with_retry_async
+)
+
+
+@pytest.fixture
+def clock(fake_clock, monkeypatch):
+    fake_clock.install(resilience)
+
+    async def sleep(seconds):
+        fake_clock.sleep(seconds)
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", sleep)
+    return fake_clock
+
+
+def connection_error():
+    return anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.example/v1/messages"))
+
+
+def failing(*errors, result="ok"):
+    """Function raising the given errors in turn, then returning result"""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+POLICY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=8.0, deadline=None)
+
+
+def test_transient_errors_are_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    assert call_with_retry(failing(connection_error(), connection_error()), policy=POLICY, breaker=breaker) == "ok"
+    assert len(clock.sleeps) == 2
+    assert breaker.state == "closed"
+
+
+def test_retries_of_one_call_count_as_one_failure(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    for _ in range(2):
+        with pytest.raises(anthropic.APIConnectionError):
+            call_with_retry(failing(*[connection_error() for _ in range(4)]), policy=POLICY, breaker=breaker)
+        assert breaker.state == "closed"
+
+    with pytest.raises(anthropic.APIConnectionError):
+        call_with_retry(failing(*[connection_error() for _ in range(4)]), policy=POLICY, breaker=breaker)
+    assert breaker.state == "open"
+
+
+def test_empty_responses_are_retried_but_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    with pytest.raises(EmptyResponseError):
+        call_with_retry(failing(*[EmptyResponseError() for _ in range(4)]), policy=POLICY, breaker=breaker)
+
+    assert len(clock.sleeps) == 3
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_refuses_calls_until_the_cool_down_passed(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    with pytest.raises(anthropic.APIConnectionError):
+        call_with_retry(failing(connection_error()), policy=RetryPolicy(max_attempts=1), breaker=breaker)
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(failing(), policy=POLICY, breaker=breaker)
+
+    clock.now += 60.0
+    assert breaker.state == "half_open"
+    assert call_with_retry(failing(), policy=POLICY, breaker=breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_async_retries_of_one_call_count_as_one_failure(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    call = failing(*[connection_error() for _ in range(4)])
+
+    async def fn():
+        return call()
+
+    with pytest.raises(anthropic.APIConnectionError):
+        asyncio.run(call_with_retry_async(fn, policy=POLICY, breaker=breaker))
+
+    assert len(clock.sleeps) == 3
+    assert breaker.state == "closed"
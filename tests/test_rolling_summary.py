@@ -0,0 +1,74 @@
+from context_retrieval.rolling_summary import RollingSummary
+from context_retrieval.session_store import SessionStore
+
+
+def fake_compact(texts):
+    """Stands in for the model: a digest naming the number of compacted texts"""
+    return f"digest of {len(texts)}"
+
+
+def make_summary(store, compact=fake_compact):
+    return RollingSummary(store, recent_entries=3, compact_batch=2, max_digests=2,
+                          compact=compact, background=False)
+
+
+def test_entries_beyond_the_recent_tier_are_compacted(session_store):
+    summary = make_summary(session_store)
+
+    for index in range(4):
+        summary.add_entry(f"entry {index}")
+
+    assert summary.digests == ["digest of 2"]
+    assert [entry.text for entry in summary.entries] == ["entry 2", "entry 3"]
+    assert summary.prompt_view().startswith("digest of 2")
+
+
+def test_oldest_digests_are_merged_when_there_are_too_many(session_store):
+    summary = make_summary(session_store)
+
+    for index in range(8):
+        summary.add_entry(f"entry {index}")
+
+    # Three digests of two entries each; the two oldest are merged into one
+    assert summary.digests == ["digest of 2", "digest of 2"]
+    assert len(summary.entries) == 2
+
+
+def test_failed_compaction_keeps_the_entries(session_store):
+    summary = make_summary(session_store, compact=lambda texts: None)
+
+    for index in range(5):
+        summary.add_entry(f"entry {index}")
+
+    assert summary.digests == []
+    assert len(summary.entries) == 5
+
+
+def test_summary_is_rebuilt_from_the_store_when_reopened(tmp_path):
+    path = str(tmp_path / "session_store.db")
+    store = SessionStore(path, write_interval=0.01)
+    summary = make_summary(store)
+    for index in range(4):
+        summary.add_entry(f"entry {index}")
+    rendered = summary.render()
+    store.close()
+
+    reopened = SessionStore(path, write_interval=0.01)
+    try:
+        reloaded = make_summary(reopened)
+        assert reloaded.render() == rendered
+        assert reloaded.digests == ["digest of 2"]
+    finally:
+        reopened.close()
+
+
+def test_replace_and_clear(session_store):
+    summary = make_summary(session_store)
+    summary.add_entry("entry")
+
+    summary.replace("everything so far")
+    assert summary.prompt_view() == "everything so far"
+
+    summary.clear()
+    assert summary.is_empty()
+    assert make_summary(session_store).is_empty()
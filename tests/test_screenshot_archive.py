@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from context_retrieval.screenshot_archive import ScreenshotArchive, ScreenshotArchiveWriter
+
+
+BASE_TIME = 1_700_000_000.0
+
+
+def make_frames(count, size=(320, 192), seed=7):
+    """Frames where a small rectangle changes most of the time and the screen scrolls now and then"""
+    rng = random.Random(seed)
+    frame = Image.new("RGB", size, "white")
+    frames = []
+    for index in range(count):
+        frame = frame.copy()
+        draw = ImageDraw.Draw(frame)
+        if index % 10 == 9:
+            draw.rectangle((0, 0, *size), fill=(rng.randrange(256), 200, 200))
+        else:
+            x, y = rng.randrange(size[0] - 40), rng.randrange(size[1] - 20)
+            draw.rectangle((x, y, x + 40, y + 20), fill=(rng.randrange(256), 0, 0))
+        frames.append(frame)
+    return frames
+
+
+def same_pixels(a, b):
+    return a.size == b.size and ImageChops.difference(a, b).getbbox() is None
+
+
+@pytest.fixture
+def frames():
+    return make_frames(40)
+
+
+@pytest.fixture
+def archive_dir(tmp_path, frames):
+    closed = []
+    writer = ScreenshotArchiveWriter(str(tmp_path), keyframe_interval=8, segment_frames=15, tile_size=32,
+                                     on_segment_closed=closed.append)
+    for index, frame in enumerate(frames):
+        writer.append(frame, BASE_TIME + index)
+    writer.close()
+
+    assert writer.keyframes and writer.deltas
+    assert len(closed) == 3
+    return str(tmp_path)
+
+
+def test_sequential_reconstruction_matches_every_frame(archive_dir, frames):
+    archive = ScreenshotArchive(archive_dir)
+
+    assert len(archive) == len(frames)
+    for (timestamp, image), (index, frame) in zip(archive.frames(), enumerate(frames)):
+        assert timestamp == BASE_TIME + index
+        assert same_pixels(image, frame), index
+
+
+def test_random_access_matches_every_frame(archive_dir, frames):
+    archive = ScreenshotArchive(archive_dir)
+
+    for index in random.Random(1).sample(range(len(frames)), len(frames)):
+        assert same_pixels(archive.read(index), frames[index]), index
+
+
+def test_frame_at_returns_the_frame_on_screen_at_a_time(archive_dir, frames):
+    archive = ScreenshotArchive(archive_dir)
+
+    assert archive.frame_at(BASE_TIME - 1) is None
+    assert same_pixels(archive.frame_at(BASE_TIME + 20.5), frames[20])
+
+
+def test_time_range_yields_only_frames_inside_it(archive_dir):
+    archive = ScreenshotArchive(archive_dir)
+
+    timestamps = [timestamp for timestamp, _ in archive.frames(BASE_TIME + 5, BASE_TIME + 9)]
+
+    assert timestamps == [BASE_TIME + offset for offset in range(5, 10)]
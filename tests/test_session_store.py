@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pytest
+
+from context_retrieval import config, insights_generation
+from context_retrieval.api_usage import usage_tracker
+from context_retrieval.context_model import Context
+from context_retrieval.session_store import SessionStore
+
+
+OLD_TIME = "2000-01-01 00:00:00"
+
+
+def count(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_session_round_trips_through_a_reopened_store(session_store, tabs):
+    docs, video, _ = tabs
+    session_store.append("context", tabs=Context([docs]).to_dicts())
+    session_store.append("context", tabs=Context([docs, video]).to_dicts())
+    session_store.append("summary_entry", text="Read about dicts")
+    session_store.append("visited_url", url="https://a.example")
+    session_store.append("usage", call_site="analysis", input_tokens=100, output_tokens=20)
+    session_store.close()
+
+    reopened = SessionStore(session_store.path, write_interval=0.01)
+    try:
+        assert not reopened.created
+        assert reopened.session_id == session_store.session_id
+        assert [record["text"] for record in reopened.records_of("summary_entry")] == ["Read about dicts"]
+        assert reopened.visited_urls() == ["https://a.example"]
+        assert reopened.visited_pages() == [(docs.url, "Docs"), (video.url, "Video")]
+        assert reopened.usage_by_call_site()["analysis"] == {
+            "calls": 1, "input_tokens": 100, "output_tokens": 20,
+            "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+        }
+    finally:
+        reopened.close()
+
+
+def test_unchanged_tabs_are_stored_once(session_store, tabs):
+    docs, video, _ = tabs
+    session_store.append("context", tabs=Context([docs]).to_dicts())
+    session_store.append("context", tabs=Context([docs, video]).to_dicts())
+    session_store.sync()
+
+    assert count(session_store.path, "frames") == 2
+    assert count(session_store.path, "tabs") == 2
+
+
+def test_clear_starts_a_new_session(session_store):
+    session_store.append("summary_entry", text="first session")
+    first_session = session_store.session_id
+
+    session_store.clear()
+
+    assert session_store.session_id != first_session
+    assert session_store.records_of("summary_entry") == []
+
+
+def test_only_summary_records_can_be_read_back(session_store):
+    with pytest.raises(ValueError):
+        session_store.records_of("links")
+
+
+def test_old_frames_and_sessions_are_pruned(session_store, tabs):
+    docs, video, _ = tabs
+    session_store.append("context", time=OLD_TIME, tabs=Context([docs]).to_dicts())
+    session_store.append("summary_entry", time=OLD_TIME, text="old session")
+    session_store.clear()
+    session_store.append("context", tabs=Context([video]).to_dicts())
+    session_store.append("summary_entry", time=OLD_TIME, text="current session")
+    session_store.close()
+
+    pruned = SessionStore(session_store.path, write_interval=0.01, max_age=3600)
+    try:
+        assert pruned.visited_pages() == [(video.url, "Video")]
+        # The current session keeps its summary however old it is
+        assert [record["text"] for record in pruned.records_of("summary_entry")] == ["current session"]
+        assert count(pruned.path, "summaries") == 1
+        assert count(pruned.path, "tabs") == 1
+    finally:
+        pruned.close()
+
+
+def test_failed_batch_is_retried_once(session_store, monkeypatch):
+    insert = SessionStore._insert
+    failures = iter([True])
+
+    def flaky_insert(conn, session_id, record):
+        if next(failures, False):
+            raise RuntimeError("database is locked")
+        insert(conn, session_id, record)
+
+    monkeypatch.setattr(SessionStore, "_insert", staticmethod(flaky_insert))
+    session_store.append("visited_url", url="https://a.example")
+
+    assert session_store.visited_urls() == ["https://a.example"]
+
+
+def test_summary_history_is_imported_once_and_left_in_place(tmp_path, monkeypatch):
+    history = tmp_path / "summary_history.txt"
+    history.write_text("Read about dicts", encoding="utf-8")
+    monkeypatch.setattr(config, "SESSION_STORE_FILE", str(tmp_path / "session_store.db"))
+    monkeypatch.setattr(insights_generation, "_rolling_summaries", {})
+
+    assert insights_generation.import_summary_history(str(history))
+    assert "Read about dicts" in insights_generation.load_summary_history()
+    assert os.path.exists(history)
+    insights_generation.get_session_store().close()
+
+    # A store that already existed is never imported into
+    insights_generation._rolling_summaries.clear()
+    try:
+        assert not insights_generation.import_summary_history(str(history))
+    finally:
+        insights_generation.get_session_store().close()
+        usage_tracker.set_sink(None)
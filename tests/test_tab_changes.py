@@ -0,0 +1,33 @@
+from context_retrieval.context_model import Tab, apply_tab_changes
+
+
+def test_apply_tab_changes_adds_removes_and_modifies(tabs):
+    changes = {
+        "added": [{"name": "Search", "url": "https://search.example"}],
+        "removed": [1],
+        "modified": [{"id": 2, "text_content": "sets and frozensets"}],
+    }
+
+    merged = apply_tab_changes(tabs, changes)
+
+    assert [tab.name for tab in merged] == ["Docs", "Notes", "Search"]
+    # Only the given fields of a modified tab change
+    assert merged[1].text_content == "sets and frozensets"
+    assert merged[1].context == "Writing"
+    assert merged[0] is tabs[0]
+
+
+def test_apply_tab_changes_without_changes_keeps_tabs(tabs):
+    assert apply_tab_changes(tabs, {}) == tabs
+
+
+def test_apply_tab_changes_ignores_unknown_ids(tabs):
+    changes = {"removed": [7, "1"], "modified": [{"id": -1, "name": "x"}, {"name": "no id"}]}
+
+    assert apply_tab_changes(tabs, changes) == tabs
+
+
+def test_modified_tab_is_kept_even_if_also_removed(tabs):
+    merged = apply_tab_changes(tabs, {"removed": [0], "modified": [{"id": 0, "name": "Docs 3.13"}]})
+
+    assert [tab.name for tab in merged] == ["Docs 3.13", "Video", "Notes"]
@@ -0,0 +1,35 @@
+from PIL import Image
+
+from context_retrieval.claude_analyzer import ClaudeAnalyzer
+from context_retrieval.context_model import Context, RECORD_TABS_TOOL, Tab, split_tabs, tabs_from_tool_input
+
+
+def test_tool_input_is_parsed_into_tabs(tabs):
+    tool_input = {"tabs": [tab.to_dict() for tab in tabs] + ["not a tab"]}
+
+    assert tabs_from_tool_input(tool_input) == tabs
+    assert tabs_from_tool_input({}) == []
+
+
+def test_xml_round_trip_keeps_every_field(tabs):
+    tricky = Tab(name='Quote "<&>"', url="https://x.example/?a=1&b=2", text_content="a < b")
+    context = Context(tabs + [tricky])
+
+    assert Context.from_xml(context.xml).tabs == context.tabs
+
+
+def test_split_tabs_ignores_text_around_the_tabs_and_unclosed_tabs(tabs):
+    xml = f"Here you go:\n{tabs[0].to_xml()}\nand\n{tabs[1].to_xml()}\n<Tab><name>cut off"
+
+    assert split_tabs(xml) == [tabs[0].to_xml(), tabs[1].to_xml()]
+
+
+def test_analyzer_reads_tabs_from_the_forced_tool_call(fake_client, tabs):
+    fake_client.answer_tool(RECORD_TABS_TOOL["name"], {"tabs": [tab.to_dict() for tab in tabs]})
+    analyzer = ClaudeAnalyzer(api_key="test", model="model", max_tokens=100, prompt="Analyze")
+
+    context = analyzer.analyze_screenshot(Image.new("RGB", (64, 36)))
+
+    assert context.tabs == tuple(tabs)
+    request = fake_client.messages.requests[0]
+    assert request["tool_choice"] == {"type": "tool", "name": RECORD_TABS_TOOL["name"]}
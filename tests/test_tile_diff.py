@@ -0,0 +1,46 @@
+from PIL import Image, ImageDraw
+
+from context_retrieval.screenshot_capture import TileDiff
+
+
+def test_tile_diff_ignores_changes_below_the_pixel_threshold():
+    diff = TileDiff(grid_cols=4, grid_rows=4, pixel_threshold=24)
+    previous = Image.new("RGB", (400, 400), (100, 100, 100))
+    current = Image.new("RGB", (400, 400), (110, 110, 110))
+
+    assert diff.dirty_tiles(previous, current) == []
+    assert diff.changed_region(previous, current) is None
+
+
+def test_tile_diff_ignores_tiles_below_the_tile_threshold():
+    diff = TileDiff(grid_cols=4, grid_rows=4, tile_threshold=0.01)
+    previous = Image.new("RGB", (400, 400), "white")
+    current = previous.copy()
+    # 4 of the 10000 pixels of a tile
+    ImageDraw.Draw(current).rectangle((10, 10, 11, 11), fill="black")
+
+    assert diff.dirty_tiles(previous, current) == []
+
+
+def test_tile_diff_finds_the_changed_tile():
+    diff = TileDiff(grid_cols=4, grid_rows=4, padding=0)
+    previous = Image.new("RGB", (400, 400), "white")
+    current = previous.copy()
+    ImageDraw.Draw(current).rectangle((210, 110, 290, 190), fill="black")
+
+    assert diff.dirty_tiles(previous, current) == [(2, 1)]
+    assert diff.changed_region(previous, current) == (200, 100, 300, 200)
+
+
+def test_tile_diff_pads_and_clamps_the_region():
+    diff = TileDiff(grid_cols=4, grid_rows=4, padding=8)
+
+    assert diff.tiles_to_box([(0, 0), (3, 0)], (400, 400)) == (0, 0, 400, 108)
+
+
+def test_tile_diff_returns_full_frame_without_a_comparable_previous_frame():
+    diff = TileDiff()
+    current = Image.new("RGB", (400, 300))
+
+    assert diff.changed_region(None, current) == (0, 0, 400, 300)
+    assert diff.changed_region(Image.new("RGB", (200, 100)), current) == (0, 0, 400, 300)
@@ -0,0 +1,46 @@
+from PIL import Image
+
+from context_retrieval.context_model import Context, Tab
+from context_retrieval.triage import TriageRouter, content_hash
+
+
+CONTEXT = Context([Tab(name="Docs", url="https://docs.python.org", text_content="dictionaries")])
+
+
+def make_router():
+    return TriageRouter(model="small-model", escalate_distance=20)
+
+
+def test_large_frame_change_is_extracted_without_asking(fake_client):
+    router = make_router()
+
+    assert router.needs_extraction(Image.new("RGB", (64, 36)), 25, CONTEXT)
+    assert fake_client.messages.requests == []
+
+
+def test_small_model_can_skip_a_frame(fake_client):
+    fake_client.answer_text("NO")
+    router = make_router()
+
+    assert not router.needs_extraction(Image.new("RGB", (64, 36)), 5, CONTEXT)
+    assert router.get_stats()["frame"]["skipped"] == 1
+
+
+def test_first_summary_is_always_written(fake_client):
+    assert make_router().needs_summary_update("Learn Python", "", CONTEXT)
+    assert fake_client.messages.requests == []
+
+
+def test_content_is_only_skipped_once_its_summary_update_succeeded(fake_client):
+    fake_client.answer_text("YES")
+    router = make_router()
+
+    # The update for this decision failed, so the same content is triaged again
+    assert router.needs_summary_update("Learn Python", "Read about lists", CONTEXT)
+    fake_client.answer_text("YES")
+    assert router.needs_summary_update("Learn Python", "Read about lists", CONTEXT)
+    assert len(fake_client.messages.requests) == 2
+
+    router.mark_summarized(content_hash(CONTEXT))
+    assert not router.needs_summary_update("Learn Python", "Read about lists", CONTEXT.xml)
+    assert len(fake_client.messages.requests) == 2